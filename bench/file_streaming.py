@@ -0,0 +1,63 @@
+# Streams a generated log file through read_lines, once from an open text
+# File and once over a mapped file, and reports the peak traced memory.
+# The peak stays flat as the file grows, while the size of the file,
+# which reading it whole would hold in memory, grows with it.
+#
+# Runtime objects reference themselves, so dead lines linger until the
+# cyclic collector runs; it is made to run a full collection often so the
+# peak reflects live data rather than collector timing.
+#
+#   python bench/file_streaming.py [lines ...]
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cacti.runtime import *
+from cacti.builtin import initialize_builtins, make_main, make_string
+from cacti.parse import parse_string
+
+LINE = "2024-01-01T00:00:00 INFO request served in 12 ms by worker 7\n"
+
+SOURCES = {
+        'file': 'closure() { for line in read_lines(open(path, "r")) { line } }()',
+        'mmap': 'closure() { for line in read_lines(map_file(path)) { line } }()'
+    }
+
+def measure(source):
+    expr = parse_string(source)[0]
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    expr()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main(sizes):
+    gc.set_threshold(1000, 1, 1)
+    with tempfile.TemporaryDirectory() as directory, Interpreter():
+        initialize_builtins()
+        mainobj = make_main()
+        push_stack_frame(StackFrame(mainobj, mainobj.name))
+        scope = peek_stack_frame().symbol_stack.peek()
+        path = os.path.join(directory, 'log.txt')
+        scope.add_symbol('path', ConstantValueHolder(make_string(path)))
+
+        for size in sizes:
+            with open(path, 'w') as file:
+                file.write(LINE * size)
+            results = []
+            for mode in ('file', 'mmap'):
+                elapsed, peak = measure(SOURCES[mode])
+                results.append("{} {:8.3f}s {:8.1f} KiB peak".format(mode, elapsed, peak / 1024))
+            file_size = len(LINE) * size
+            print("{:>8} lines   {}   size {:8.1f} KiB".format(size, '   '.join(results), file_size / 1024))
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [500, 1000, 2000])
@@ -0,0 +1,90 @@
+# Measures the memory a parsed program keeps alive, with tracemalloc, for a
+# generated program of the given number of lines. The tree is the one the
+# parser builds, before any optimization pass. What is kept is split into
+# the nodes with their source lines and the literal objects they hold.
+# tracemalloc slows the parser down about tenfold: 50000 lines take hours.
+#
+#   python bench/parse_memory.py [lines]
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cacti.runtime import *
+from cacti.builtin import initialize_builtins
+from cacti.optimize import PassManager
+from cacti.parse import parse_file
+from pyparsing import ParserElement
+
+CHUNK = '''function f{0}(a, b) {{
+    val x = a * 2 + b
+    var s = "item {0}"
+    for j in range(0, b) {{
+        s = s + "!"
+    }}
+    return x
+}}
+print(f{0}(1, 2))
+
+'''
+
+CHUNK_LINES = CHUNK.count('\n')
+
+def write_program(file_name, lines):
+    with open(file_name, 'w') as f:
+        for i in range(max(1, lines // CHUNK_LINES)):
+            f.write(CHUNK.format(i))
+
+def count_nodes(node):
+    count = 0
+    def visit(child):
+        nonlocal count
+        count += 1
+        return child.transform_children(visit)
+    visit(node)
+    return count
+
+# Where the memory allocated by each file goes
+CATEGORIES = (
+        ('tree', ('ast.py', 'parse.py', 'source.py', 'util.py')),
+        ('literals', ('lang.py', 'runtime.py', 'builtin.py'))
+    )
+
+def category(file_name):
+    for name, files in CATEGORIES:
+        if os.path.basename(file_name) in files:
+            return name
+    return 'other'
+
+def main(lines=50000):
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'program.cacti')
+        write_program(file_name, lines)
+        with Interpreter():
+            initialize_builtins()
+            tracemalloc.start()
+            start = time.perf_counter()
+            program = parse_file(file_name, PassManager())
+            seconds = time.perf_counter() - start
+            ParserElement.reset_cache()
+            gc.collect()
+            current, peak = tracemalloc.get_traced_memory()
+            sizes = {}
+            for stat in tracemalloc.take_snapshot().statistics('filename'):
+                name = category(stat.traceback[0].filename)
+                sizes[name] = sizes.get(name, 0) + stat.size
+            tracemalloc.stop()
+            nodes = count_nodes(program)
+    print("{} lines, {} nodes parsed in {:.2f}s".format(lines, nodes, seconds))
+    print("retained {:10.2f} MiB".format(current / 2 ** 20))
+    for name in ('tree', 'literals', 'other'):
+        size = sizes.get(name, 0)
+        print("  {:8} {:8.2f} MiB   {:6.1f} bytes/node".format(name, size / 2 ** 20, size / nodes))
+    print("peak     {:10.2f} MiB".format(peak / 2 ** 20))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,48 @@
+# Times a script printing many numbers and Strings to a file through the
+# block buffered output sink, and through a sink writing and flushing every
+# piece as stdio line buffering would.
+#
+#   python bench/print_output.py [lines ...]
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cacti.runtime import *
+from cacti.builtin import initialize_builtins, make_integer, make_main
+from cacti.parse import parse_string
+
+SOURCE = """closure() {
+    for i in range(0, n) {
+        print(i)
+        print("line")
+    }
+}()"""
+
+def measure(interpreter, output):
+    expr = parse_string(SOURCE)[0]
+    interpreter.set_output(output)
+    start = time.perf_counter()
+    expr()
+    output.close()
+    return time.perf_counter() - start
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as directory, Interpreter() as interpreter:
+        initialize_builtins()
+        mainobj = make_main()
+        push_stack_frame(StackFrame(mainobj, mainobj.name))
+        scope = peek_stack_frame().symbol_stack.peek()
+        path = os.path.join(directory, 'out.txt')
+
+        for size in sizes:
+            scope.add_symbol('n', ConstantValueHolder(make_integer(size)))
+            buffered = measure(interpreter, OutputSink.to_file(path))
+            unbuffered = measure(interpreter, OutputSink.to_file(path, buffer_size=0))
+            print("{:>8} lines   buffered {:8.3f}s   unbuffered {:8.3f}s".format(size * 2, buffered, unbuffered))
+        interpreter.set_output(OutputSink())
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [500, 1000])
@@ -0,0 +1,57 @@
+# Measures, with tracemalloc, the memory kept alive by live runtime objects:
+# 'count' of each value holder, symbol table and stack frame, and 'objects'
+# Integer objects. Integers are measured apart, and fewer of them, as each
+# one carries its own symbol tables and hook methods; a million of them do
+# not fit in memory.
+#
+#   python bench/runtime_memory.py [count] [objects]
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cacti.runtime import *
+from cacti.builtin import initialize_builtins, make_integer, make_main
+
+def kinds():
+    value = make_integer(1)
+    table = SymbolTable()
+    stack = SymbolTableStack(table)
+    owner = make_main()
+    return (
+            ('ValueHolder', lambda i: ValueHolder(value)),
+            ('ConstantValueHolder', lambda i: ConstantValueHolder(value)),
+            ('SymbolTable', lambda i: SymbolTable()),
+            ('SymbolTableChain', lambda i: SymbolTableChain(table, table)),
+            ('SymbolTableStack', lambda i: SymbolTableStack(table)),
+            ('StackFrame', lambda i: StackFrame(owner, 'f', symbol_stack=stack))
+        )
+
+# The memory kept by 'count' objects made by 'make', and the seconds taken
+def measure(make, count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = [make(i) for i in range(count)]
+    seconds = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size, seconds
+
+def report(name, count, size, seconds):
+    print("{:20} {:8} {:10.2f} MiB {:8.1f} bytes/object {:8.2f}s".format(name, count, size / 2 ** 20, size / count, seconds))
+
+def main(count=1000000, objects=10000):
+    with Interpreter():
+        initialize_builtins()
+        for name, make in kinds():
+            report(name, count, *measure(make, count))
+        report('Integer', objects, *measure(make_integer, objects))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,57 @@
+# Times building a string from many pieces. The representation section
+# compares rope concatenation with copying the whole str on every step,
+# which is what the String '+' hook used to do; the script section runs
+# 's = s + piece' through the interpreter.
+#
+#   python bench/string_concat.py [pieces] [script-pieces]
+import operator
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cacti.runtime import *
+from cacti.lang import rope_concat
+from cacti.builtin import initialize_builtins, make_integer, make_main, make_string
+from cacti.parse import parse_string
+
+PIECE = 'piece of text '
+
+def build_flat(count):
+    s = ''
+    for i in range(count):
+        s = operator.add(s, PIECE)
+    return s
+
+def build_rope(count):
+    rope = ''
+    for i in range(count):
+        rope = rope_concat(rope, PIECE)
+    s = make_string()
+    s.set_rope(rope)
+    return s.primitive
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def main(pieces=10 ** 5, script_pieces=1000):
+    with Interpreter():
+        initialize_builtins()
+        mainobj = make_main()
+        push_stack_frame(StackFrame(mainobj, mainobj.name))
+
+        print("representation")
+        for count in (pieces // 4, pieces // 2, pieces):
+            print("{:>10} pieces   flat {:8.3f}s   rope {:8.3f}s".format(
+                count, timed(build_flat, count), timed(build_rope, count)))
+
+        print("script")
+        expr = parse_string('closure(n) { var s = ""; for i in range(0, n) { s = s + "piece of text " }; s.length }')[0]()
+        for count in (script_pieces // 4, script_pieces // 2, script_pieces):
+            print("{:>10} pieces   {:8.3f}s".format(count, timed(expr.call, make_integer(count))))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
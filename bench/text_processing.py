@@ -0,0 +1,60 @@
+# Text processing with the native String methods: splits a generated text
+# into lines and words, counts words in a Map and rebuilds the lines.
+# Also compares the memory held by slices taken as views with copies.
+#
+#   python bench/text_processing.py [lines] [slices]
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cacti.runtime import *
+from cacti.builtin import initialize_builtins, make_integer, make_main, make_string
+from cacti.parse import parse_string
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'Epsilon', 'zeta']
+
+WORD_COUNT_SOURCE = """closure(text) {
+    val counts = Map()
+    var lines = []
+    for line in text.split("\\n") {
+        for word in line.lower().split(" ") {
+            counts.put(word, 1)
+        }
+        lines.append(" ".join(line.replace("alpha", "ALPHA").split(" ")))
+    }
+    "\\n".join(lines).length
+}"""
+
+def make_text(lines):
+    return '\n'.join(' '.join(WORDS[(i + j) % len(WORDS)] for j in range(12)) for i in range(lines))
+
+def main(lines=200, slices=2000):
+    with Interpreter():
+        initialize_builtins()
+        mainobj = make_main()
+        push_stack_frame(StackFrame(mainobj, mainobj.name))
+
+        word_count = parse_string(WORD_COUNT_SOURCE)[0]()
+        for count in (lines // 4, lines // 2, lines):
+            text = make_string(make_text(count))
+            start = time.perf_counter()
+            word_count.call(text)
+            elapsed = time.perf_counter() - start
+            print("word count {:>6} lines {:8.3f}s".format(count, elapsed))
+
+        # Slices of a 1 MB string: views share the parent's characters
+        text = make_string('x' * 2 ** 20)
+        slice_method = text['slice']
+        for label, take in [('views', lambda i: slice_method(make_integer(i), make_integer(i + 2 ** 19))),
+                            ('copies', lambda i: make_string(text.primitive[i:i + 2 ** 19]))]:
+            tracemalloc.start()
+            kept = [take(i) for i in range(slices // 100)]
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("{:>4} half-size slices as {:<7} {:10.1f} KiB peak".format(len(kept), label, peak / 1024))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
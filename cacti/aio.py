@@ -0,0 +1,118 @@
+import asyncio
+import contextvars
+import inspect
+import threading
+from cacti.runtime import *
+from cacti.lang import Function, ObjectDefinition
+from cacti.builtin import add_builtin, initialize_builtins, make_float, make_integer, make_main, make_string
+
+__all__ = ['add_async_builtin', 'await_host', 'run_file', 'run_program']
+
+# Loop of the asyncio execution that is running the current program
+_event_loop = contextvars.ContextVar('cacti_event_loop', default=None)
+
+async def _await(awaitable):
+    return await awaitable
+
+# Blocks the evaluating thread, and only that thread, until the awaitable
+# completes on the event loop driving this program. Outside of an asyncio
+# execution the awaitable is run to completion on a private loop.
+def await_host(awaitable):
+    loop = _event_loop.get()
+    if loop is None:
+        return asyncio.run(_await(awaitable))
+    return asyncio.run_coroutine_threadsafe(_await(awaitable), loop).result()
+
+def _to_object(value):
+    if value is None or isinstance(value, ObjectDefinition):
+        return value
+    if isinstance(value, bool):
+        return get_interpreter().builtins['true' if value else 'false']
+    if isinstance(value, int):
+        return make_integer(value)
+    if isinstance(value, float):
+        return make_float(value)
+    if isinstance(value, str):
+        return make_string(value)
+    raise TypeError("Cannot convert '{}' to a cacti object".format(value.__class__.__name__))
+
+def add_async_builtin(name, coroutine_function, *param_names):
+    if not param_names:
+        param_names = tuple(inspect.signature(coroutine_function).parameters)
+
+    def content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        params = [symbol_stack[p] for p in param_names]
+        return _to_object(await_host(coroutine_function(*params)))
+
+    fn = Function(name, content, *param_names)
+    add_builtin(fn.name, fn)
+    return fn
+
+def _prepare_interpreter(interpreter, async_builtins):
+    if interpreter is None:
+        interpreter = Interpreter()
+        with interpreter:
+            initialize_builtins()
+    if async_builtins:
+        with interpreter:
+            for name, coroutine_function in async_builtins.items():
+                add_async_builtin(name, coroutine_function)
+    return interpreter
+
+def _settle(future, result, error):
+    if future.cancelled():
+        return
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(error)
+
+# Runs 'function' on a thread of its own and returns a future of its result
+def _run_in_thread(loop, function):
+    future = loop.create_future()
+
+    def target():
+        result, error = None, None
+        try:
+            result = function()
+        except BaseException as err:
+            error = err
+        loop.call_soon_threadsafe(_settle, future, result, error)
+
+    threading.Thread(target=target, name='cacti-program', daemon=True).start()
+    return future
+
+# Runs 'program' (called with the main stack frame pushed) off the event
+# loop so the loop stays free while cacti code evaluates. Every program
+# holds a thread for its whole run. By default each gets a thread of its
+# own. With an 'executor', at most as many programs as it has workers run
+# at once and the others queue; a host coroutine awaiting a program that
+# is queued behind the one it serves then never completes.
+async def run_program(program, *, interpreter=None, async_builtins=None, executor=None):
+    loop = asyncio.get_running_loop()
+    interpreter = _prepare_interpreter(interpreter, async_builtins)
+
+    def execute():
+        with interpreter:
+            token = _event_loop.set(loop)
+            try:
+                mainobj = make_main()
+                push_stack_frame(StackFrame(mainobj, mainobj.name))
+                return program()
+            finally:
+                _event_loop.reset(token)
+                clear_stack()
+
+    if executor is None:
+        return await _run_in_thread(loop, execute)
+    return await loop.run_in_executor(executor, execute)
+
+async def run_file(file_name, *, interpreter=None, async_builtins=None, executor=None):
+    from cacti.parse import parse_file
+    interpreter = _prepare_interpreter(interpreter, async_builtins)
+
+    def program():
+        return parse_file(file_name)()
+
+    return await run_program(program, interpreter=interpreter, executor=executor)
@@ -2,18 +2,48 @@ import logging
 import sys
 from cacti.debug import get_logger
 import cacti.exceptions as ce
+from cacti.source import SourceBuffer, SourceLocation
 from cacti.runtime import *
 from cacti.lang import *
-from cacti.builtin import get_builtin, make_class, make_object
+from cacti.builtin import get_builtin, iterate, make_class, make_iterator, make_list, make_object, make_string, primitive_operation_function
 
 __all__ = [
-    'Block', 'OperationExpression', 'PropertyExpression', 'ReferenceExpression', 'ValueExpression',
-    'AssignmentStatement', 'ClosureDeclarationStatement', 'MethodDefinitionDeclarationStatement',
-    'FunctionDeclarationStatement', 'ReturnStatement', 'ValDeclarationStatement', 'VarDeclarationStatement',
+    'Block', 'FormatExpression', 'ListExpression', 'OperationExpression', 'PrimitiveOperationExpression', 'PropertyExpression', 'ReferenceExpression', 'ValueExpression',
+    'AssignmentStatement', 'ClassDeclarationStatement', 'ClosureDeclarationStatement', 'HookDefinitionDeclarationStatement',
+    'MethodDefinitionDeclarationStatement',
+    'ForStatement', 'FunctionDeclarationStatement', 'GeneratorBody', 'ReturnStatement', 'YieldStatement', 'ValDeclarationStatement', 'VarDeclarationStatement',
     'PropertyFieldDeclaration', 'PropertyGetSetDeclaration', 'GetMethodDefinitionStatement', 'SetMethodDefinitionStatement'
     ]
 
+# The exception to raise for an error in evaluating a node of 'source',
+# found at 'location' when it is known
+def _fatal_error(error, source, location=None):
+    error_source = getattr(error, 'source', None)
+    if error_source is None:
+        error_source = source
+    elif not error_source:
+        # Leave it to the nearest enclosing node that has a source line
+        if not source:
+            return error
+        error_source = error.source = source.strip()
+    else:
+        location = None
+    return ce.FatalError(error, error_source, location)
+
+def _same(nodes, other_nodes):
+    return all(n is o for n, o in zip(nodes, other_nodes))
+
+# Nodes have fixed attributes. The source of a parsed node is the offset
+# of its token in the SourceBuffer of the text it was parsed from.
 class Evaluable:
+    __slots__ = ('__source_buffer', '__source_offset')
+    
+    # Statements that contain a 'yield' evaluate through iter_eval()
+    has_yield = False
+    
+    # Statements that can return from the function evaluating them
+    may_exit = False
+    
     def __call__(self):
         error = None
         try:
@@ -22,36 +52,90 @@ class Evaluable:
             error = err
         
         if error:
-            raise ce.FatalError(error, self.source)
+            raise self.fatal_error(error)
+            
+    # The exception to raise for an error in evaluating this node
+    def fatal_error(self, error):
+        return _fatal_error(error, self.source, self.source_location)
     
     def eval(self):
         pass
     
-    def __getattr__(self, name):
-        if name == 'source':
-            if name in self.__dict__:
-                return self.__dict__[name]
-            else:
-                return ''
-        else:
-            object.__getattribute__(self, name)
-    
-    #def __setattr__(self, name, value):
-    #    if name == 'source':
-    #        self.__dict__[name] = value
-    #    else:
-    #        super().__setattr__(name, value)
+    # A Python generator yielding what the evaluation yields and returning
+    # its value
+    def iter_eval(self):
+        return self()
+        yield
+        
+    # Returns the node with 'transform' applied to each child node. Nodes
+    # are immutable, so a node with a changed child is rebuilt.
+    def transform_children(self, transform):
+        return self
+        
+    # Builds a node of this class from 'args' carrying this node's source
+    def rebuild(self, *args):
+        return self.__class__(*args).copy_source(self)
+        
+    # The SourceLocation of the node, or None for a node that was not parsed
+    @property
+    def source_location(self):
+        try:
+            return SourceLocation(self.__source_buffer, self.__source_offset)
+        except AttributeError:
+            return None
+            
+    def set_source_location(self, buffer, offset):
+        self.__source_buffer = buffer
+        self.__source_offset = offset
+        
+    # Gives the node the source of 'node', if it has one, and returns it
+    def copy_source(self, node):
+        location = node.source_location
+        if location:
+            self.set_source_location(location.buffer, location.offset)
+        return self
+        
+    # The line the node was parsed from, or ''
+    @property
+    def source(self):
+        location = self.source_location
+        return location.line if location else ''
+        
+    @source.setter
+    def source(self, line):
+        self.set_source_location(SourceBuffer(line), 0)
     
 class OperationExpression(Evaluable):
+    __slots__ = ('__operand_expr', '__operation', '__operation_expr_params')
+    
     def __init__(self, operand_expr, operation, *operation_expr_params):
         self.__operand_expr = operand_expr
         self.__operation = operation
         self.__operation_expr_params = operation_expr_params
         
+    @property
+    def operand_expr(self):
+        return self.__operand_expr
+        
+    @property
+    def operation(self):
+        return self.__operation
+        
+    @property
+    def operation_expr_params(self):
+        return self.__operation_expr_params
+        
     def eval(self):
         target = self.__operand_expr()
         params = list(map(lambda e: e(), self.__operation_expr_params))
         return target.hook_table[self.__operation].call(*params)
+        
+    def transform_children(self, transform):
+        operand_expr = transform(self.__operand_expr)
+        params = tuple(map(transform, self.__operation_expr_params))
+        if operand_expr is self.__operand_expr and _same(params, self.__operation_expr_params):
+            return self
+        return self.rebuild(operand_expr, self.__operation, *params)
     
     def __repr__(self):
         return "{}({}, '{}', {})".format(
@@ -60,11 +144,65 @@ class OperationExpression(Evaluable):
                     self.__operation,
                     repr(self.__operation_expr_params))
                     
+# An operation whose operands were inferred to be builtin primitives of the
+# given types. While they are, the result is computed without calling the
+# hook; any other operands go through the hook as usual.
+class PrimitiveOperationExpression(OperationExpression):
+    __slots__ = ('__operand_type_name', '__param_type_name', '__function')
+    
+    def __init__(self, operand_expr, operation, param_expr, operand_type_name, param_type_name):
+        super().__init__(operand_expr, operation, param_expr)
+        self.__operand_type_name = operand_type_name
+        self.__param_type_name = param_type_name
+        self.__function = primitive_operation_function(operand_type_name, operation, param_type_name)
+        
+    @property
+    def operand_type_name(self):
+        return self.__operand_type_name
+        
+    @property
+    def param_type_name(self):
+        return self.__param_type_name
+        
+    def eval(self):
+        target = self.operand_expr()
+        param = self.operation_expr_params[0]()
+        builtins = get_interpreter().builtins
+        if target.typeobj is builtins[self.__operand_type_name] and param.typeobj is builtins[self.__param_type_name]:
+            return self.__function(target, param)
+        return target.hook_table[self.operation].call(param)
+        
+    def transform_children(self, transform):
+        operand_expr = transform(self.operand_expr)
+        param_expr = transform(self.operation_expr_params[0])
+        if operand_expr is self.operand_expr and param_expr is self.operation_expr_params[0]:
+            return self
+        return self.rebuild(operand_expr, self.operation, param_expr, self.__operand_type_name, self.__param_type_name)
+    
+    def __repr__(self):
+        return "{}({}, '{}', {}, {}, {})".format(
+                    self.__class__.__name__,
+                    repr(self.operand_expr),
+                    self.operation,
+                    repr(self.operation_expr_params[0]),
+                    self.__operand_type_name,
+                    self.__param_type_name)
+                    
 class PropertyExpression(Evaluable):
+    __slots__ = ('__obj_expr', '__prop_names')
+    
     def __init__(self, obj_expr, *prop_names):
         assert 0 == len(list(filter(lambda e: not isinstance(e, str), prop_names)))
         self.__obj_expr = obj_expr
         self.__prop_names = prop_names
+        
+    @property
+    def obj_expr(self):
+        return self.__obj_expr
+        
+    @property
+    def prop_names(self):
+        return self.__prop_names
     
     def eval(self):
         value = self.__obj_expr()
@@ -73,6 +211,12 @@ class PropertyExpression(Evaluable):
             
         return value
         
+    def transform_children(self, transform):
+        obj_expr = transform(self.__obj_expr)
+        if obj_expr is self.__obj_expr:
+            return self
+        return self.rebuild(obj_expr, *self.__prop_names)
+        
     def __repr__(self):
         return "{}({}, {})".format(
                     self.__class__.__name__,
@@ -80,8 +224,14 @@ class PropertyExpression(Evaluable):
                     repr(self.__prop_names))
         
 class ReferenceExpression(Evaluable):
+    __slots__ = ('__symbol',)
+    
     def __init__(self, symbol):
         self.__symbol = symbol
+        
+    @property
+    def symbol(self):
+        return self.__symbol
     
     def eval(self):
         return peek_stack_frame().symbol_stack[self.__symbol]
@@ -90,20 +240,75 @@ class ReferenceExpression(Evaluable):
         return "{}({})".format(self.__class__.__name__, repr(self.__symbol))
     
 class ValueExpression(Evaluable):
+    __slots__ = ('__value',)
+    
     def __init__(self, value):
         assert isinstance(value, ObjectDefinition)
         self.__value = value
         
+    @property
+    def value(self):
+        return self.__value
+        
     def eval(self):
         return self.__value
     
     def __repr__(self):
         return "{}({})".format(self.__class__.__name__, repr(self.__value))
         
+class ListExpression(Evaluable):
+    __slots__ = ('__item_exprs',)
+    
+    def __init__(self, *item_exprs):
+        self.__item_exprs = item_exprs
+        
+    @property
+    def item_exprs(self):
+        return self.__item_exprs
+        
+    def eval(self):
+        return make_list([e() for e in self.__item_exprs])
+        
+    def transform_children(self, transform):
+        item_exprs = tuple(map(transform, self.__item_exprs))
+        if _same(item_exprs, self.__item_exprs):
+            return self
+        return self.rebuild(*item_exprs)
+    
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, repr(self.__item_exprs))
+        
+# An interpolated string: literal str parts and expressions whose values
+# are converted as 'print' does, joined into one String
+class FormatExpression(Evaluable):
+    __slots__ = ('__parts',)
+    
+    def __init__(self, *parts):
+        self.__parts = parts
+        
+    @property
+    def parts(self):
+        return self.__parts
+        
+    def eval(self):
+        pieces = [part if isinstance(part, str) else part().to_string() for part in self.__parts]
+        return make_string(''.join(pieces))
+        
+    def transform_children(self, transform):
+        parts = tuple(part if isinstance(part, str) else transform(part) for part in self.__parts)
+        if _same(parts, self.__parts):
+            return self
+        return self.rebuild(*parts)
+    
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, repr(self.__parts))
+        
 class AssignmentStatement(Evaluable):
+    __slots__ = ('__target_expr', '__symbol', '__value_expr')
+    
+    logger = get_logger(__name__ + '.AssignmentStatement')
+    
     def __init__(self, symbol, value_expr, target_expr=None):
-        self.logger = get_logger(self)
-        
         self.__target_expr = target_expr
         self.__symbol = symbol
         self.__value_expr = value_expr
@@ -113,12 +318,31 @@ class AssignmentStatement(Evaluable):
         if self.__target_expr:
             target = self.__target_expr()
         else:
-            target = peek_stack_frame().symbol_stack.peek()
+            target = peek_stack_frame().symbol_stack
         self.logger.debug("{}[{}] contains the value {}".format(target.to_string(), repr(self.__symbol), target[self.__symbol]))
         self.logger.debug("Assign {}[{}] the value {}".format(target.to_string(), repr(self.__symbol), value.to_string()))
         target[self.__symbol] = value
         return value
         
+    @property
+    def symbol(self):
+        return self.__symbol
+        
+    @property
+    def value_expr(self):
+        return self.__value_expr
+        
+    @property
+    def target_expr(self):
+        return self.__target_expr
+        
+    def transform_children(self, transform):
+        value_expr = transform(self.__value_expr)
+        target_expr = transform(self.__target_expr) if self.__target_expr else None
+        if value_expr is self.__value_expr and target_expr is self.__target_expr:
+            return self
+        return self.rebuild(self.__symbol, value_expr, target_expr)
+        
     def __repr__(self):
         kwargs = {
             'class_name': self.__class__.__name__,
@@ -129,9 +353,11 @@ class AssignmentStatement(Evaluable):
         return "{class_name}('{symbol}', {value_expr}, {target_expr})".format(**kwargs)
     
 class ClassDeclarationStatement(Evaluable):
+    __slots__ = ('__name', '__superclass_name', '__parts')
+    
+    logger = get_logger(__name__ + '.ClassDeclarationStatement')
+    
     def __init__(self, name, superclass_name, *parts):
-        self.logger = get_logger(self)
-        
         self.__name = name
         self.__superclass_name = superclass_name
         self.__parts = parts
@@ -144,7 +370,9 @@ class ClassDeclarationStatement(Evaluable):
         self.logger.debug("Made class: " + str(klass))
         
         for p in self.__parts:
-            if isinstance(p, MethodDefinitionDeclarationStatement):
+            if isinstance(p, HookDefinitionDeclarationStatement):
+                klass.add_hook_definition(p())
+            elif isinstance(p, MethodDefinitionDeclarationStatement):
                 klass.add_method_definition(p())
             elif isinstance(p, PropertyFieldDeclaration):
                 klass.add_property_definition(p())
@@ -158,15 +386,49 @@ class ClassDeclarationStatement(Evaluable):
         table = peek_stack_frame().symbol_stack.peek()
         table.add_symbol(self.__name, ConstantValueHolder(klass))
         return klass
+        
+    @property
+    def name(self):
+        return self.__name
+        
+    @property
+    def superclass_name(self):
+        return self.__superclass_name
+        
+    @property
+    def parts(self):
+        return self.__parts
+        
+    def transform_children(self, transform):
+        parts = tuple(map(lambda p: _transform_class_part(p, transform), self.__parts))
+        if _same(parts, self.__parts):
+            return self
+        return self.rebuild(self.__name, self.__superclass_name, *parts)
     
     def __repr__(self):
         return "{}({}, {}, {})".format(self.__class__.__name__, repr(self.__name), repr(self.__superclass_name), repr(self.__parts))
 
+def _transform_class_part(part, transform):
+    if isinstance(part, (ValDefinition, VarDefinition)):
+        init_expr = transform(part.init_expr)
+        return part if init_expr is part.init_expr else part.__class__(part.name, init_expr)
+    return transform(part)
+
 class PropertyFieldDeclaration(Evaluable):
+    __slots__ = ('__property_name', '__field_name')
+    
     def __init__(self, property_name, field_name):
         self.__property_name = property_name
         self.__field_name = field_name
         
+    @property
+    def property_name(self):
+        return self.__property_name
+        
+    @property
+    def field_name(self):
+        return self.__field_name
+        
     def eval(self):
         field_name = self.__field_name
         def get_field_value():
@@ -186,73 +448,188 @@ class PropertyFieldDeclaration(Evaluable):
         return "{}({}, {})".format(self.__class__.__name__, repr(self.__property_name), repr(self.__field_name))
         
 class GetMethodDefinitionStatement(Evaluable):
+    __slots__ = ('__content',)
+    
     def __init__(self, content):
         self.__content = content
         
+    @property
+    def content(self):
+        return self.__content
+        
     def eval(self):
         return MethodDefinition('get', self.__content)
         
+    def transform_children(self, transform):
+        content = transform(self.__content)
+        if content is self.__content:
+            return self
+        return self.rebuild(content)
+        
     def __repr__(self):
         return "{}({})".format(self.__class__.__name__, repr(self.__content))
         
 class SetMethodDefinitionStatement(Evaluable):
+    __slots__ = ('__content', '__param')
+    
     def __init__(self, content, param):
         self.__content = content
         self.__param = param
         
+    @property
+    def content(self):
+        return self.__content
+        
+    @property
+    def param(self):
+        return self.__param
+        
     def eval(self):
         return MethodDefinition('set', self.__content, self.__param)
         
+    def transform_children(self, transform):
+        content = transform(self.__content)
+        if content is self.__content:
+            return self
+        return self.rebuild(content, self.__param)
+        
     def __repr__(self):
         return "{}({}, {})".format(self.__class__.__name__, repr(self.__content), repr(self.__param))
 
 class PropertyGetSetDeclaration(Evaluable):
+    __slots__ = ('__property_name', '__get_def', '__set_def')
+    
     def __init__(self, property_name, get_def, set_def):
         self.__property_name = property_name
         self.__get_def = get_def
         self.__set_def = set_def
         
+    @property
+    def property_name(self):
+        return self.__property_name
+        
+    @property
+    def get_def(self):
+        return self.__get_def
+        
+    @property
+    def set_def(self):
+        return self.__set_def
+        
     def eval(self):
         prop_def = PropertyDefinition(self.__property_name)
         prop_def.set_getter_method_def(self.__get_def())
         set_def = self.__set_def() if self.__set_def else None
         prop_def.set_setter_method_def(set_def)
         return prop_def
+        
+    def transform_children(self, transform):
+        get_def = transform(self.__get_def)
+        set_def = transform(self.__set_def) if self.__set_def else None
+        if get_def is self.__get_def and set_def is self.__set_def:
+            return self
+        return self.rebuild(self.__property_name, get_def, set_def)
 
     def __repr__(self):
         return "{}({}, {}, {})".format(self.__class__.__name__, repr(self.__property_name), repr(self.__get_def), repr(self.__set_def))
         
+# Bodies containing 'yield' return a generator instead of running
+def _callable_content(block):
+    return GeneratorBody(block) if block.has_yield else block
+
 class MethodDefinitionDeclarationStatement(Evaluable):
+    __slots__ = ('__name', '__block', '__content', '__params')
+    
     def __init__(self, name, content, *params):
         self.__name = name
-        self.__content = content
+        self.__block = content
+        self.__content = _callable_content(content)
         self.__params = params
         
+    @property
+    def name(self):
+        return self.__name
+        
+    @property
+    def block(self):
+        return self.__block
+        
+    @property
+    def params(self):
+        return self.__params
+        
     def eval(self):
         return MethodDefinition(self.__name, self.__content, *self.__params)
         
+    def transform_children(self, transform):
+        block = transform(self.__block)
+        if block is self.__block:
+            return self
+        return self.rebuild(self.__name, block, *self.__params)
+        
     def __repr__(self):
         return "{}({}, {}, {})".format(self.__class__.__name__, repr(self.__name), repr(self.__content), repr(self.__params))
 
+class HookDefinitionDeclarationStatement(MethodDefinitionDeclarationStatement):
+    __slots__ = ()
+
 class ClosureDeclarationStatement(Evaluable):
+    __slots__ = ('__block', '__expr', '__params')
+    
     def __init__(self, expr, *params):
-        self.__expr = expr
+        self.__block = expr
+        self.__expr = _callable_content(expr)
         self.__params = params
         
+    @property
+    def block(self):
+        return self.__block
+        
+    @property
+    def params(self):
+        return self.__params
+        
     def eval(self):
         stack_frame = peek_stack_frame()
         closure = Closure(stack_frame, self.__expr, *self.__params)
         return closure
         
+    def transform_children(self, transform):
+        block = transform(self.__block)
+        if block is self.__block:
+            return self
+        return self.rebuild(block, *self.__params)
+        
     def __repr__(self):
         return "{}({}, {})".format(self.__class__.__name__, repr(self.__expr), repr(self.__params))
 
 class FunctionDeclarationStatement(Evaluable):
+    __slots__ = ('__name', '__block', '__expr', '__params')
+    
     def __init__(self, name, expr, *params):
         self.__name = name
-        self.__expr = expr
+        self.__block = expr
+        self.__expr = _callable_content(expr)
         self.__params = params
         
+    @property
+    def name(self):
+        return self.__name
+        
+    @property
+    def block(self):
+        return self.__block
+        
+    @property
+    def params(self):
+        return self.__params
+        
+    def transform_children(self, transform):
+        block = transform(self.__block)
+        if block is self.__block:
+            return self
+        return self.rebuild(self.__name, block, *self.__params)
+        
     def eval(self):
         function = Function(self.__name, self.__expr, *self.__params)
         stack_frame = peek_stack_frame()
@@ -266,18 +643,34 @@ class FunctionDeclarationStatement(Evaluable):
         return "{}({}, {}, {})".format(self.__class__.__name__, repr(self.__name), repr(self.__expr), repr(self.__params))
         
 class ReturnStatement(Evaluable):
+    __slots__ = ('__value_expr',)
+    
+    may_exit = True
+    
     def __init__(self, value_expr):
         self.__value_expr = value_expr
         
+    @property
+    def value_expr(self):
+        return self.__value_expr
+        
     def eval(self):
         value = self.__value_expr()
         peek_stack_frame().mark_exit_flag()
         return value
         
+    def transform_children(self, transform):
+        value_expr = transform(self.__value_expr)
+        if value_expr is self.__value_expr:
+            return self
+        return self.rebuild(value_expr)
+        
     def __repr__(self):
         return "{}({})".format(self.__class__.__name__, repr(self.__value_expr))
 
 class ValDeclarationStatement(Evaluable):
+    __slots__ = ('__symbol', '__init_expr')
+    
     def __init__(self, symbol, init_expr):
         self.__symbol = symbol
         self.__init_expr = init_expr
@@ -289,10 +682,26 @@ class ValDeclarationStatement(Evaluable):
         table.add_symbol(self.__symbol, ConstantValueHolder(value))
         return value
         
+    @property
+    def symbol(self):
+        return self.__symbol
+        
+    @property
+    def init_expr(self):
+        return self.__init_expr
+        
+    def transform_children(self, transform):
+        init_expr = transform(self.__init_expr)
+        if init_expr is self.__init_expr:
+            return self
+        return self.rebuild(self.__symbol, init_expr)
+        
     def __repr__(self):
         return "{}({}, {})".format(self.__class__.__name__, repr(self.__symbol), repr(self.__init_expr))
 
 class VarDeclarationStatement(Evaluable):
+    __slots__ = ('__symbol', '__init_expr')
+    
     def __init__(self, symbol, init_expr):
         self.__symbol = symbol
         self.__init_expr = init_expr
@@ -304,23 +713,237 @@ class VarDeclarationStatement(Evaluable):
         table.add_symbol(self.__symbol, ValueHolder(value))
         return value
         
+    @property
+    def symbol(self):
+        return self.__symbol
+        
+    @property
+    def init_expr(self):
+        return self.__init_expr
+        
+    def transform_children(self, transform):
+        init_expr = transform(self.__init_expr)
+        if init_expr is self.__init_expr:
+            return self
+        return self.rebuild(self.__symbol, init_expr)
+        
     def __repr__(self):
         return "{}('{}', {})".format(self.__class__.__name__, self.__symbol, repr(self.__init_expr))
 
+# Runs an iter_eval() that must not yield
+def _complete(steps):
+    try:
+        next(steps)
+    except StopIteration as stop:
+        return stop.value
+    raise ce.YieldOutsideGeneratorError()
+
+class YieldStatement(Evaluable):
+    __slots__ = ('__value_expr',)
+    
+    has_yield = True
+    
+    def __init__(self, value_expr):
+        self.__value_expr = value_expr
+        
+    @property
+    def value_expr(self):
+        return self.__value_expr
+        
+    def eval(self):
+        raise ce.YieldOutsideGeneratorError()
+        
+    def iter_eval(self):
+        value = self.__value_expr()
+        yield value
+        return value
+        
+    def transform_children(self, transform):
+        value_expr = transform(self.__value_expr)
+        if value_expr is self.__value_expr:
+            return self
+        return self.rebuild(value_expr)
+        
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, repr(self.__value_expr))
+
+# Content of a function, closure or method whose body yields. Each call
+# returns an Iterator that evaluates the body on its own stack frame, over
+# the symbols of the call, and suspends it at every 'yield'.
+class GeneratorBody:
+    __slots__ = ('__block',)
+    
+    def __init__(self, block):
+        self.__block = block
+        
+    @property
+    def block(self):
+        return self.__block
+        
+    def __call__(self):
+        frame = peek_stack_frame()
+        generator_frame = StackFrame(frame.owner, frame.name, frame.selfobj, frame.symbol_stack.fork())
+        return make_iterator(self.__generate(generator_frame))
+        
+    # The Python generator evaluating the body
+    def steps(self):
+        return self.__block.iter_eval()
+        
+    def __generate(self, generator_frame):
+        steps = self.steps()
+        while True:
+            push_stack_frame(generator_frame)
+            try:
+                item = next(steps)
+            except StopIteration:
+                return
+            finally:
+                pop_stack_frame()
+            yield item
+            
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, repr(self.__block))
+
+class _LoopValueHolder(ConstantValueHolder):
+    __slots__ = ()
+    
+    def rebind(self, value):
+        ValueHolder.set_value(self, value)
+
+class ForStatement(Evaluable):
+    __slots__ = ('__symbol', '__iterable_expr', '__body')
+    
+    def __init__(self, symbol, iterable_expr, body):
+        self.__symbol = symbol
+        self.__iterable_expr = iterable_expr
+        self.__body = body
+        
+    @property
+    def symbol(self):
+        return self.__symbol
+        
+    @property
+    def iterable_expr(self):
+        return self.__iterable_expr
+        
+    @property
+    def body(self):
+        return self.__body
+        
+    @property
+    def has_yield(self):
+        return self.__body.has_yield
+        
+    @property
+    def may_exit(self):
+        return self.__body.may_exit
+        
+    def eval(self):
+        return _complete(self.iter_eval())
+        
+    # The loop variable and anything the body declares live in one table
+    # that is reused for every iteration
+    def iter_eval(self):
+        value = None
+        items = iterate(self.__iterable_expr())
+        stack_frame = peek_stack_frame()
+        symbol_stack = stack_frame.symbol_stack
+        
+        holder = _LoopValueHolder(get_builtin('nothing'))
+        table = SymbolTable()
+        table.add_symbol(self.__symbol, holder)
+        symbol_stack.push(table)
+        
+        body = self.__body
+        for item in items:
+            holder.rebind(item)
+            if body.has_yield:
+                value = yield from body.iter_eval()
+            else:
+                value = body()
+            if stack_frame.exit_flag:
+                break
+        
+        symbol_stack.pop()
+        return value
+        
+    def transform_children(self, transform):
+        iterable_expr = transform(self.__iterable_expr)
+        body = transform(self.__body)
+        if iterable_expr is self.__iterable_expr and body is self.__body:
+            return self
+        return self.rebuild(self.__symbol, iterable_expr, body)
+        
+    def __repr__(self):
+        return "{}({}, {}, {})".format(self.__class__.__name__, repr(self.__symbol), repr(self.__iterable_expr), repr(self.__body))
+
 class Block(Evaluable):
+    __slots__ = ('__exprs', '__has_yield', '__may_exit')
+    
     def __init__(self, *exprs):
         self.__exprs = exprs
+        self.__has_yield = any(getattr(e, 'has_yield', False) for e in exprs)
+        self.__may_exit = any(getattr(e, 'may_exit', False) for e in exprs)
+        
+    @property
+    def exprs(self):
+        return self.__exprs
+        
+    @property
+    def has_yield(self):
+        return self.__has_yield
+        
+    @property
+    def may_exit(self):
+        return self.__may_exit
 
     def eval(self):
         value = None
-        stack_frame = peek_stack_frame()
+        interpreter = get_interpreter()
+        stack_frame = interpreter.peek_stack_frame()
+        # Only a return inside this block can end it early
+        may_exit = self.__may_exit
         
         for e in self.__exprs:
-            value = e()
-            if stack_frame.exit_flag:
+            try:
+                interpreter.step()
+                value = e()
+            except ce.LimitExceededError as err:
+                if not err.source:
+                    err.source = getattr(e, 'source', '').strip()
+                raise
+            if may_exit and stack_frame.exit_flag:
+                break
+        
+        return value
+        
+    def iter_eval(self):
+        value = None
+        interpreter = get_interpreter()
+        stack_frame = interpreter.peek_stack_frame()
+        may_exit = self.__may_exit
+        
+        for e in self.__exprs:
+            try:
+                interpreter.step()
+                if getattr(e, 'has_yield', False):
+                    value = yield from e.iter_eval()
+                else:
+                    value = e()
+            except ce.LimitExceededError as err:
+                if not err.source:
+                    err.source = getattr(e, 'source', '').strip()
+                raise
+            if may_exit and stack_frame.exit_flag:
                 break
         
         return value
             
+    def transform_children(self, transform):
+        exprs = tuple(map(transform, self.__exprs))
+        if _same(exprs, self.__exprs):
+            return self
+        return self.rebuild(*exprs)
+        
     def __repr__(self):
         return "{}({})".format(self.__class__.__name__, repr(self.__exprs))
@@ -0,0 +1,107 @@
+import argparse
+import collections
+import glob
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from cacti.runtime import *
+from cacti.builtin import initialize_builtins, make_main
+from cacti.exceptions import FatalError
+
+__all__ = ['ScriptResult', 'expand_file_names', 'main', 'run_many', 'run_script']
+
+ScriptResult = collections.namedtuple('ScriptResult', ['file_name', 'output', 'wall_time', 'error'])
+
+# Each worker process keeps one interpreter with its builtins initialized
+# once and reuses it, together with the parse grammar, for every script.
+_worker_interpreter = None
+_worker_limits = None
+
+def _initialize_worker(limits=None):
+    global _worker_interpreter
+    global _worker_limits
+    import cacti.parse
+    _worker_limits = limits
+    _worker_interpreter = Interpreter()
+    with _worker_interpreter:
+        initialize_builtins()
+
+def _describe_error(err):
+    if isinstance(err, FatalError):
+        return str(err)
+    return "{}({})".format(err.__class__.__name__, str(err))
+
+def run_script(file_name):
+    from cacti.parse import parse_file
+    if _worker_interpreter is None:
+        _initialize_worker()
+
+    output = OutputSink.to_memory()
+    error = None
+    start = time.perf_counter()
+    with _worker_interpreter:
+        _worker_interpreter.set_output(output)
+        clear_stack()
+        mainobj = make_main()
+        push_stack_frame(StackFrame(mainobj, mainobj.name))
+        try:
+            block = parse_file(file_name)
+            if _worker_limits:
+                _worker_limits.attach(_worker_interpreter)
+            block()
+        except Exception as err:
+            error = _describe_error(err)
+        finally:
+            if _worker_limits:
+                _worker_limits.detach()
+            clear_stack()
+    wall_time = time.perf_counter() - start
+
+    return ScriptResult(file_name, output.getvalue(), wall_time, error)
+
+def expand_file_names(patterns):
+    file_names = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            file_names += sorted(glob.glob(pattern, recursive=True))
+        else:
+            file_names += [pattern]
+    return file_names
+
+def run_many(patterns, workers=None, limits=None):
+    file_names = expand_file_names(patterns)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker, initargs=(limits,)) as executor:
+        return list(executor.map(run_script, file_names))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='cacti run-many', description='Run many cacti scripts in parallel')
+    parser.add_argument('files', nargs='+', help='script files or glob patterns')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--max-steps', type=int, default=None, help='evaluation steps allowed per script')
+    parser.add_argument('--max-depth', type=int, default=None, help='stack depth allowed per script')
+    parser.add_argument('--max-objects', type=int, default=None, help='object allocations allowed per script')
+    parser.add_argument('--max-bytes', type=int, default=None, help='approximate primitive bytes allowed per script')
+    parser.add_argument('--timeout', type=float, default=None, help='wall-clock seconds allowed per script')
+    args = parser.parse_args(argv)
+
+    limits = None
+    limit_args = [args.max_steps, args.max_depth, args.max_objects, args.max_bytes, args.timeout]
+    if any(a is not None for a in limit_args):
+        limits = ExecutionLimits(max_steps=args.max_steps, max_depth=args.max_depth,
+                                 max_objects=args.max_objects, max_bytes=args.max_bytes, timeout=args.timeout)
+
+    results = run_many(args.files, args.jobs, limits)
+
+    failures = 0
+    for result in results:
+        sys.stdout.write(result.output)
+        if result.error:
+            failures += 1
+            status = 'FAILED: ' + result.error
+        else:
+            status = 'ok'
+        sys.stderr.write("{}: {:.3f}s {}\n".format(result.file_name, result.wall_time, status))
+
+    sys.stdout.flush()
+    sys.stderr.write("{} script(s), {} failed\n".format(len(results), failures))
+    return 1 if failures else 0
@@ -1,6 +1,16 @@
+import array
+import collections
+import functools
+import itertools
+import mmap
 import operator
-import types
+import re
+import sys
 import logging
+try:
+    import numpy
+except ImportError:
+    numpy = None
 from cacti.debug import get_logger
 from cacti.runtime import *
 from cacti.lang import *
@@ -8,17 +18,15 @@ from cacti.exceptions import *
 
 __all__ = [
     'get_type', 'get_builtin', 'get_builtin_table', 'get_method_superobj',
-    'initialize_builtins',
-    'make_class', 'make_float', 'make_integer', 'make_main', 'make_object', 'make_string'
+    'initialize_builtins', 'iterate',
+    'make_bytes', 'make_class', 'make_float', 'make_integer', 'make_iterator', 'make_list', 'make_main', 'make_numeric_array', 'make_object',
+    'make_string', 'primitive_operation_function'
 ]
 
-_POST_BOOTSTRAP_OBJECT_INIT = []
-_METHOD_SUPEROBJ = None
-
 def make_object():
     logger = get_logger(make_object)
     logger.debug('Start')
-    if 'Object' in _BUILTINS:
+    if 'Object' in get_builtin_table():
         obj = get_builtin('Object').hook_table['()'].call()
     else:
         obj = make_post_bootstrap_object()
@@ -29,16 +37,15 @@ def make_post_bootstrap_object():
     logger = get_logger(make_object)
     logger.debug('Start')
     obj = ObjectDefinition(None)
-    global _POST_BOOTSTRAP_OBJECT_INIT
-    _POST_BOOTSTRAP_OBJECT_INIT += [obj]
+    get_interpreter().post_bootstrap_objects.append(obj)
     logger.debug('Returning: ' + str(obj))
     return obj
     
 def get_method_superobj():
-    global _METHOD_SUPEROBJ
-    if not _METHOD_SUPEROBJ:
-        _METHOD_SUPEROBJ = make_post_bootstrap_object()
-    return _METHOD_SUPEROBJ
+    interpreter = get_interpreter()
+    if not interpreter.method_superobj:
+        interpreter.set_method_superobj(make_post_bootstrap_object())
+    return interpreter.method_superobj
 
 def make_class(name, superclass_name='Object', *, val_defs=None, var_defs=None, method_defs=None):
     logger = get_logger(make_class)
@@ -65,11 +72,16 @@ def make_main():
     main.set_typeobj(main_typedef)
     return main
 
+# repr() of the Strings, Floats and Integers made by the functions below
+# is the call making them again
+def _native_repr(obj):
+    return "make_{}({})".format(obj.typeobj.name.lower(), repr(obj.primitive))
+
 def make_string(value=''):
     assert isinstance(value, str)
     obj = get_builtin('String').hook_table['()'].call()
     obj.primitive = value
-    obj.to_native_repr = types.MethodType(lambda self: "make_string({})".format(repr(self.primitive)), obj)
+    obj.set_native_repr_function(_native_repr)
     return obj
 
 def make_float(value=float(0)):
@@ -77,14 +89,37 @@ def make_float(value=float(0)):
     value = float(value)
     obj = get_builtin('Float').hook_table['()'].call()
     obj.primitive = value
-    obj.to_native_repr = types.MethodType(lambda self: "make_float({})".format(repr(self.primitive)), obj)
+    obj.set_native_repr_function(_native_repr)
     return obj
 
 def make_integer(value=0):
     assert isinstance(value, int)
     obj = get_builtin('Integer').hook_table['()'].call()
     obj.primitive = value
-    obj.to_native_repr = types.MethodType(lambda self: "make_integer({})".format(repr(self.primitive)), obj)
+    obj.set_native_repr_function(_native_repr)
+    return obj
+
+def make_list(values=()):
+    obj = get_builtin('List').hook_table['()'].call()
+    for value in values:
+        _list_append(obj, value)
+    return obj
+
+# Wraps 'value' (bytes, bytearray or any buffer) without copying it, so
+# data passed by the host is shared with the script
+def make_bytes(value=b''):
+    obj = get_builtin('Bytes').hook_table['()'].call()
+    obj.primitive = _bytes_view(value)
+    return obj
+
+def make_iterator(items):
+    obj = get_builtin('Iterator').hook_table['()'].call()
+    obj.primitive = iter(items)
+    return obj
+
+def make_numeric_array(values=()):
+    obj = get_builtin('NumericArray').hook_table['()'].call()
+    obj.primitive = numpy.asarray(values)
     return obj
 
 class _StubCallable:
@@ -95,27 +130,17 @@ class _StubCallable:
         self.__content()
 
 ### HOOK NEW ###
-def _hook_new_callable_content():
+def _hook_new_callable_content(object_class=ObjectDefinition):
+    get_interpreter().count_object()
     class_def = peek_stack_frame().owner
     superclass_def = class_def.superclass
     superobj = superclass_def.hook_table['()'].call() if superclass_def else None
-    obj = ObjectDefinition(superobj, typeobj=class_def)
+    obj = object_class(superobj, typeobj=class_def)
     _init_object_def_from_class_def(obj, class_def)
     return obj
 
 def _make_hook_new_method_def():
-    def hook_new_body():
-        class_def = peek_stack_frame().owner
-        superclass_def = class_def.superclass
-        superobj = superclass_def.hook_table['()'].call() if superclass_def else None
-        obj = ObjectDefinition(superobj, typeobj=class_def)
-        _init_object_def_from_class_def(obj, class_def)
-        
-        return obj
-        
-    #hook_new_callable = Callable(_hook_new_callable_content)
-    
-    return MethodDefinition('()', hook_new_body)
+    return MethodDefinition('()', _hook_new_callable_content)
 
 ### HOOK ISA ###
 def _make_hook_isa_method_def():
@@ -140,6 +165,24 @@ def _make_hook_isa_method_def():
     return MethodDefinition('isa', hook_isa_body, 'kind')
         
 
+### HOOK EQUALS / HASH ###
+def _make_boolean_object(value):
+    return get_builtin('true' if value else 'false')
+
+# Objects are only equal to themselves unless their class defines '=='
+def _make_hook_equals_method_def():
+    def hook_equals_body():
+        symbol_stack = peek_stack_frame().symbol_stack
+        return _make_boolean_object(symbol_stack['self'] is symbol_stack['other'])
+    
+    return MethodDefinition('==', hook_equals_body, 'other')
+
+def _make_hook_hash_method_def():
+    def hook_hash_body():
+        return make_integer(id(peek_stack_frame().symbol_stack['self']))
+    
+    return MethodDefinition('hash', hook_hash_body)
+
 ### HOOK PROPERTY OF ###
 def _make_hook_property_of_method_def():
     def hook_property_of_body():
@@ -175,6 +218,8 @@ BUILTIN_INIT_DATA = {
                 'hook_defs': {
                         #_make_hook_property_of_method_def(),
                         _make_hook_isa_method_def(),
+                        _make_hook_equals_method_def(),
+                        _make_hook_hash_method_def(),
                         
                         _make_method_def_op_not_supported('()'),
                         _make_method_def_op_not_supported('[]'),
@@ -186,7 +231,14 @@ BUILTIN_INIT_DATA = {
                         _make_method_def_op_not_supported('*='),
                         _make_method_def_op_not_supported('/='),
                         _make_method_def_op_not_supported('+='),
-                        _make_method_def_op_not_supported('-=')
+                        _make_method_def_op_not_supported('-='),
+                        
+                        _make_method_def_op_not_supported('iter'),
+                        _make_method_def_op_not_supported('next'),
+                        
+                        _make_method_def_op_not_supported('<<-'),
+                        _make_method_def_op_not_supported('<<='),
+                        _make_method_def_op_not_supported('<--')
                     },
                     
                 'method_defs': {
@@ -244,28 +296,26 @@ def _init_object_def_from_class_def(object_def, class_def):
         
     object_def.set_typeobj(class_def)
 
-_TYPES = SymbolTable()
-_BUILTINS = SymbolTable()
-
 def add_type(symbol_name, object_instance):
-    _TYPES.add_symbol(symbol_name, ConstantValueHolder(object_instance))
+    get_interpreter().types.add_symbol(symbol_name, ConstantValueHolder(object_instance))
     
 def get_type(symbol_name):
-    if symbol_name not in _TYPES:
+    types = get_interpreter().types
+    if symbol_name not in types:
         t = _make_type(symbol_name)
         add_type(symbol_name, t)
         return t
     else:
-        return _TYPES[symbol_name]
+        return types[symbol_name]
 
 def add_builtin(symbol_name, object_instance):
-    _BUILTINS.add_symbol(symbol_name, ConstantValueHolder(object_instance))
+    get_interpreter().builtins.add_symbol(symbol_name, ConstantValueHolder(object_instance))
     
 def get_builtin(symbol_name):
-    return _BUILTINS[symbol_name]
+    return get_interpreter().builtins[symbol_name]
     
 def get_builtin_table():
-    return _BUILTINS
+    return get_interpreter().builtins
 
 def _bootstrap_basic_types():
     # Make the root of all types
@@ -299,20 +349,62 @@ _PRIMITIVE_OPERATION_FUNCTIONS = {
         '-': operator.sub
     }
 
+def _primitive_operation(operation, selfobj, other):
+    if _is_numeric_array(other):
+        return _numeric_array_operation(operation, selfobj, other)
+    result = _PRIMITIVE_OPERATION_FUNCTIONS[operation](selfobj.primitive, other.primitive)
+    get_interpreter().count_bytes(sys.getsizeof(result))
+    new_object = get_builtin(selfobj.typeobj.name).hook_table['()']()
+    new_object.primitive = result
+    return new_object
+
 def _make_primitive_op_method_def(operation):
     
     def callable_content():
         stack_frame = peek_stack_frame()
-        selfobj = stack_frame.symbol_stack['self']
-        other = stack_frame.symbol_stack['other']
-        result = _PRIMITIVE_OPERATION_FUNCTIONS[operation](selfobj.primitive, other.primitive)
-        new_object = get_builtin(selfobj.typeobj.name).hook_table['()']()
-        new_object.primitive = result
-        return new_object
+        return _primitive_operation(operation, stack_frame.symbol_stack['self'], stack_frame.symbol_stack['other'])
     
     return MethodDefinition(operation, callable_content, 'other')
         
 
+# Integers and Floats compare by value with each other, Strings with Strings
+_PRIMITIVE_KEY_KINDS = {
+        'Integer': 'number',
+        'Float': 'number',
+        'String': 'string',
+        'Bytes': 'bytes'
+    }
+
+def _primitive_key_kind(obj):
+    typeobj = getattr(obj, 'typeobj', None)
+    kind = _PRIMITIVE_KEY_KINDS.get(getattr(typeobj, 'name', None))
+    if kind and typeobj is get_builtin(typeobj.name):
+        return kind
+    return None
+
+def _primitive_equals(selfobj, other):
+    equal = _primitive_key_kind(selfobj) == _primitive_key_kind(other) and selfobj.primitive == other.primitive
+    return _make_boolean_object(equal)
+
+def _make_primitive_equals_method_def():
+    def callable_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        return _primitive_equals(symbol_stack['self'], symbol_stack['other'])
+    
+    return MethodDefinition('==', callable_content, 'other')
+
+# The hashable value of a builtin primitive. Bytes wrapping a mutable
+# buffer, such as a bytearray or a mapped file, hash as a copy.
+def _primitive_hash_key(obj):
+    primitive = obj.primitive
+    if isinstance(primitive, memoryview) and not isinstance(primitive.obj, bytes):
+        return primitive.tobytes()
+    return primitive
+
+def _make_primitive_hash_method_def():
+    callable_content = lambda: make_integer(hash(_primitive_hash_key(peek_stack_frame().symbol_stack['self'])))
+    return MethodDefinition('hash', callable_content)
+
 _PRIMITIVE_OPERATION_METHOD_DEFS = {
         '*': _make_primitive_op_method_def('*'),
         '/': _make_primitive_op_method_def('/'),
@@ -320,19 +412,143 @@ _PRIMITIVE_OPERATION_METHOD_DEFS = {
         '-': _make_primitive_op_method_def('-')
     }
 
+def _concat_strings(selfobj, other):
+    rope = rope_concat(selfobj.rope, other.rope)
+    get_interpreter().count_bytes(sys.getsizeof(rope) if isinstance(rope, str) else rope.__sizeof__())
+    return _make_string_from_rope(rope)
+
+_NUMBER_TYPE_NAMES = ('Integer', 'Float')
+
+# The function computing what the hook of a builtin Integer, Float or String
+# returns for 'operation' with an operand of another such builtin type, so
+# that it can be applied without calling the hook. None when the hook does
+# anything else.
+def primitive_operation_function(type_name, operation, other_type_name):
+    if operation == '==' and {type_name, other_type_name} <= {'Integer', 'Float', 'String'}:
+        return _primitive_equals
+    if operation in _PRIMITIVE_OPERATION_FUNCTIONS and type_name in _NUMBER_TYPE_NAMES and other_type_name in _NUMBER_TYPE_NAMES:
+        return functools.partial(_primitive_operation, operation)
+    if operation == '+' and type_name == other_type_name == 'String':
+        return _concat_strings
+    return None
+
+def _make_string_from_rope(rope):
+    obj = get_builtin('String').hook_table['()']()
+    obj.set_rope(rope)
+    return obj
+
+def _string_argument(obj, name):
+    if not isinstance(obj, StringObjectDefinition):
+        raise InvalidTypeError("String {} must be a 'String'".format(name))
+    return obj.primitive
+
+def _integer_argument(obj, name):
+    if _array_typecode_of(obj) != 'q':
+        raise InvalidTypeError("String {} must be an 'Integer'".format(name))
+    return obj.primitive
+
+# Methods operating on the primitive. Searches run over the text a view
+# points into, and slice and split return views rather than copies.
+def _make_string_method_defs():
+    def self_and_params(*param_names):
+        symbol_stack = peek_stack_frame().symbol_stack
+        return [symbol_stack['self']] + [symbol_stack[p] for p in param_names]
+    
+    def find_content():
+        selfobj, sub = self_and_params('sub')
+        text, start, stop = selfobj.text_bounds
+        position = text.find(_string_argument(sub, 'sub'), start, stop)
+        return make_integer(position - start if position >= 0 else -1)
+    
+    def startswith_content():
+        selfobj, prefix = self_and_params('prefix')
+        text, start, stop = selfobj.text_bounds
+        return _make_boolean_object(text.startswith(_string_argument(prefix, 'prefix'), start, stop))
+    
+    def slice_content():
+        selfobj, start, end = self_and_params('start', 'end')
+        return _make_string_from_rope(selfobj.view(_integer_argument(start, 'start'), _integer_argument(end, 'end')))
+    
+    def split_content():
+        selfobj, sep = self_and_params('sep')
+        separator = _string_argument(sep, 'sep')
+        if not separator:
+            raise InvalidValueError("String split separator must not be empty")
+        text, start, stop = selfobj.text_bounds
+        pieces = []
+        while True:
+            position = text.find(separator, start, stop)
+            if position < 0:
+                break
+            pieces.append(rope_slice(text, start, position))
+            start = position + len(separator)
+        pieces.append(rope_slice(text, start, stop))
+        return make_list([_make_string_from_rope(piece) for piece in pieces])
+    
+    def join_content():
+        selfobj, items = self_and_params('items')
+        return make_string(selfobj.primitive.join(_string_argument(item, 'item') for item in iterate(items)))
+    
+    def replace_content():
+        selfobj, old, new = self_and_params('old', 'new')
+        return make_string(selfobj.primitive.replace(_string_argument(old, 'old'), _string_argument(new, 'new')))
+    
+    def encode_content():
+        selfobj, encoding = self_and_params('encoding')
+        encoding = _string_argument(encoding, 'encoding')
+        try:
+            value = selfobj.primitive.encode(encoding)
+        except (LookupError, UnicodeError) as err:
+            raise InvalidValueError("Cannot encode String as '{}': {}".format(encoding, err))
+        get_interpreter().count_bytes(sys.getsizeof(value))
+        return make_bytes(value)
+    
+    upper_content = lambda: make_string(peek_stack_frame().symbol_stack['self'].primitive.upper())
+    lower_content = lambda: make_string(peek_stack_frame().symbol_stack['self'].primitive.lower())
+    
+    return [
+        MethodDefinition('encode', encode_content, 'encoding'),
+        MethodDefinition('find', find_content, 'sub'),
+        MethodDefinition('join', join_content, 'items'),
+        MethodDefinition('lower', lower_content),
+        MethodDefinition('replace', replace_content, 'old', 'new'),
+        MethodDefinition('slice', slice_content, 'start', 'end'),
+        MethodDefinition('split', split_content, 'sep'),
+        MethodDefinition('startswith', startswith_content, 'prefix'),
+        MethodDefinition('upper', upper_content)
+    ]
+
+def _string_to_string(obj):
+    return obj.primitive
+
 def _make_string_class():
     superclass = get_builtin('Object')
     classdef = ClassDefinition(None, 'String', superclass=superclass)
     
     def new_callable_content():
-        obj = _hook_new_callable_content()
-        obj.primitive = ''
-        obj.to_string = types.MethodType(lambda self: self.primitive, obj)
+        obj = _hook_new_callable_content(StringObjectDefinition)
+        obj.set_string_function(_string_to_string)
         return obj
         
     classdef.add_hook(MethodDefinition('()', new_callable_content))
     
-    classdef.add_hook_definition(_PRIMITIVE_OPERATION_METHOD_DEFS['+'])
+    def concat_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        selfobj = symbol_stack['self']
+        other = symbol_stack['other']
+        if not isinstance(other, StringObjectDefinition):
+            return _PRIMITIVE_OPERATION_METHOD_DEFS['+'].content()
+        return _concat_strings(selfobj, other)
+    classdef.add_hook_definition(MethodDefinition('+', concat_content, 'other'))
+    
+    for method_def in _make_string_method_defs():
+        classdef.add_method_definition(method_def)
+    classdef.add_hook_definition(_make_primitive_equals_method_def())
+    classdef.add_hook_definition(_make_primitive_hash_method_def())
+    
+    length_content = lambda: make_integer(rope_length(peek_stack_frame().symbol_stack['self'].rope))
+    length_prop_def = PropertyDefinition('length', getter_method_def=MethodDefinition('get', length_content))
+    classdef.add_property_definition(length_prop_def)
     
     string_callable_content = lambda: peek_stack_frame().symbol_stack['self']
     string_prop_def = PropertyDefinition('string', getter_method_def=MethodDefinition('get', string_callable_content))
@@ -340,20 +556,25 @@ def _make_string_class():
     
     add_builtin(classdef.name, classdef)
 
+def _number_to_string(obj):
+    return str(obj.primitive)
+
 def _make_numeric_class(class_name, converter):
     superclass = get_builtin('Object')
     classdef = ClassDefinition(None, class_name, superclass=superclass)
     
     def new_callable_content():
-        obj = _hook_new_callable_content()
+        obj = _hook_new_callable_content(PrimitiveObjectDefinition)
         obj.primitive = 0
-        obj.to_string = types.MethodType(lambda self: str(self.primitive), obj)
+        obj.set_string_function(_number_to_string)
         return obj
         
     classdef.add_hook(MethodDefinition('()', Callable(new_callable_content)))
     
     for operation in ['*', '/', '+', '-']:
         classdef.add_hook_definition(_PRIMITIVE_OPERATION_METHOD_DEFS[operation])
+    classdef.add_hook_definition(_make_primitive_equals_method_def())
+    classdef.add_hook_definition(_make_primitive_hash_method_def())
         
     string_callable_content = lambda: make_string(str(peek_stack_frame().symbol_stack['self'].primitive))
     string_prop_def = PropertyDefinition('string', getter_method_def=MethodDefinition('get', string_callable_content))
@@ -361,6 +582,993 @@ def _make_numeric_class(class_name, converter):
     
     add_builtin(classdef.name, classdef)
     
+### LIST ###
+# Lists whose items are all builtin Integers or Floats keep the unboxed
+# values in an array; any other item moves the list to boxed storage.
+_ARRAY_TYPECODES = {
+        'Integer': 'q',
+        'Float': 'd'
+    }
+
+_ARRAY_TYPE_NAMES = {
+        'q': 'Integer',
+        'd': 'Float'
+    }
+
+_ARRAY_BOXING = {
+        'q': lambda value: make_integer(value),
+        'd': lambda value: make_float(value)
+    }
+
+def _array_typecode_of(value):
+    typeobj = getattr(value, 'typeobj', None)
+    if typeobj is None or not hasattr(value, 'primitive'):
+        return None
+    typecode = _ARRAY_TYPECODES.get(typeobj.name)
+    if typecode and typeobj is get_builtin(typeobj.name):
+        return typecode
+    return None
+
+def _box_list_item(storage, item):
+    if isinstance(storage, array.array):
+        return _ARRAY_BOXING[storage.typecode](item)
+    return item
+
+def _iter_list_items(storage):
+    if isinstance(storage, array.array):
+        return map(_ARRAY_BOXING[storage.typecode], storage)
+    return iter(storage)
+
+def _boxed_list_items(storage):
+    return list(_iter_list_items(storage))
+
+def _array_or_boxed(type_name, values):
+    typecode = _ARRAY_TYPECODES[type_name]
+    try:
+        return array.array(typecode, values)
+    except OverflowError:
+        return [_ARRAY_BOXING[typecode](value) for value in values]
+
+def _list_append(obj, value):
+    storage = obj.primitive
+    if isinstance(storage, array.array):
+        if _array_typecode_of(value) == storage.typecode:
+            try:
+                storage.append(value.primitive)
+                return
+            except OverflowError:
+                pass
+        storage = obj.primitive = _boxed_list_items(storage)
+    elif not storage:
+        typecode = _array_typecode_of(value)
+        if typecode:
+            try:
+                obj.primitive = array.array(typecode, [value.primitive])
+                return
+            except OverflowError:
+                pass
+    storage.append(value)
+
+def _list_index(storage, index):
+    if _array_typecode_of(index) != 'q':
+        raise InvalidTypeError("List index must be an 'Integer'")
+    position = index.primitive
+    length = len(storage)
+    if position < 0:
+        position += length
+    if position < 0 or position >= length:
+        raise IndexOutOfRangeError(index.primitive, length)
+    return position
+
+def _make_list_from_storage(storage):
+    obj = get_builtin('List').hook_table['()'].call()
+    obj.primitive = storage
+    return obj
+
+### MAP / FILTER / REDUCE ###
+# Callbacks that compile to a kernel run as one loop over the unboxed
+# storage; anything else is called once per item through its '()' hook.
+def _list_map(storage, callback):
+    from cacti.vectorize import compile_kernel
+    if isinstance(storage, array.array):
+        kernel = compile_kernel(callback, _ARRAY_TYPE_NAMES[storage.typecode])
+        if kernel and kernel.type_name in _ARRAY_TYPECODES:
+            return _array_or_boxed(kernel.type_name, list(map(kernel.function, storage)))
+    call = callback.hook_table['()'].call
+    result = make_list()
+    for item in _iter_list_items(storage):
+        _list_append(result, call(item))
+    return result.primitive
+
+def _filter_verdict(verdict):
+    if verdict is get_builtin('true'):
+        return True
+    if verdict is not get_builtin('false'):
+        raise InvalidTypeError("Filter callback must return a 'Boolean'")
+    return False
+
+def _reduce_items(items, callback):
+    call = callback.hook_table['()'].call
+    items = iter(items)
+    accumulator = next(items, None)
+    if accumulator is None:
+        return get_builtin('nothing')
+    for item in items:
+        accumulator = call(accumulator, item)
+    return accumulator
+
+def _list_filter(storage, callback):
+    from cacti.vectorize import compile_kernel
+    if isinstance(storage, array.array):
+        kernel = compile_kernel(callback, _ARRAY_TYPE_NAMES[storage.typecode])
+        if kernel and kernel.type_name == 'Boolean':
+            return array.array(storage.typecode, itertools.compress(storage, map(kernel.function, storage)))
+    call = callback.hook_table['()'].call
+    if isinstance(storage, array.array):
+        box = _ARRAY_BOXING[storage.typecode]
+        result = array.array(storage.typecode)
+        items = zip(storage, map(box, storage))
+    else:
+        result = []
+        items = zip(storage, storage)
+    for item, boxed_item in items:
+        if _filter_verdict(call(boxed_item)):
+            result.append(item)
+    return result
+
+def _list_reduce(storage, callback):
+    from cacti.vectorize import compile_kernel
+    if not len(storage):
+        return get_builtin('nothing')
+    if isinstance(storage, array.array):
+        type_name = _ARRAY_TYPE_NAMES[storage.typecode]
+        kernel = compile_kernel(callback, type_name, type_name)
+        if kernel and kernel.type_name == type_name:
+            return _ARRAY_BOXING[storage.typecode](functools.reduce(kernel.function, storage))
+    return _reduce_items(_iter_list_items(storage), callback)
+
+def _make_list_callback_hook_def(operation, apply_callback, returns_storage=True):
+    def hook_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        result = apply_callback(symbol_stack['self'].primitive, symbol_stack['callback'])
+        return _make_list_from_storage(result) if returns_storage else result
+    return MethodDefinition(operation, hook_content, 'callback')
+
+def _list_to_string(obj):
+    items = _boxed_list_items(obj.primitive)
+    return '[' + ', '.join(item.to_string() for item in items) + ']'
+
+def _make_list_class():
+    superclass = get_builtin('Object')
+    classdef = ClassDefinition(None, 'List', superclass=superclass)
+    
+    def new_callable_content():
+        obj = _hook_new_callable_content(PrimitiveObjectDefinition)
+        obj.primitive = []
+        obj.set_string_function(_list_to_string)
+        return obj
+        
+    classdef.add_hook(MethodDefinition('()', new_callable_content))
+    
+    def index_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        storage = symbol_stack['self'].primitive
+        return _box_list_item(storage, storage[_list_index(storage, symbol_stack['index'])])
+    classdef.add_hook_definition(MethodDefinition('[]', index_content, 'index'))
+    
+    def append_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        _list_append(symbol_stack['self'], symbol_stack['value'])
+    classdef.add_method_definition(MethodDefinition('append', append_content, 'value'))
+    
+    def set_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        selfobj = symbol_stack['self']
+        value = symbol_stack['value']
+        position = _list_index(selfobj.primitive, symbol_stack['index'])
+        storage = selfobj.primitive
+        if isinstance(storage, array.array):
+            if _array_typecode_of(value) == storage.typecode:
+                try:
+                    storage[position] = value.primitive
+                    return
+                except OverflowError:
+                    pass
+            storage = selfobj.primitive = _boxed_list_items(storage)
+        storage[position] = value
+    classdef.add_method_definition(MethodDefinition('set', set_content, 'index', 'value'))
+    
+    def slice_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        storage = symbol_stack['self'].primitive
+        start = symbol_stack['start']
+        end = symbol_stack['end']
+        if _array_typecode_of(start) != 'q' or _array_typecode_of(end) != 'q':
+            raise InvalidTypeError("List slice bounds must be 'Integer'")
+        return _make_list_from_storage(storage[start.primitive:end.primitive])
+    classdef.add_method_definition(MethodDefinition('slice', slice_content, 'start', 'end'))
+    
+    classdef.add_hook_definition(_make_iter_method_def(lambda selfobj: _iter_list_items(selfobj.primitive)))
+    
+    classdef.add_hook_definition(_make_list_callback_hook_def('<<-', _list_map))
+    classdef.add_hook_definition(_make_list_callback_hook_def('<<=', _list_filter))
+    classdef.add_hook_definition(_make_list_callback_hook_def('<--', _list_reduce, returns_storage=False))
+    
+    length_content = lambda: make_integer(len(peek_stack_frame().symbol_stack['self'].primitive))
+    length_prop_def = PropertyDefinition('length', getter_method_def=MethodDefinition('get', length_content))
+    classdef.add_property_definition(length_prop_def)
+    
+    string_callable_content = lambda: make_string(peek_stack_frame().symbol_stack['self'].to_string())
+    string_prop_def = PropertyDefinition('string', getter_method_def=MethodDefinition('get', string_callable_content))
+    classdef.add_property_definition(string_prop_def)
+    
+    add_builtin(classdef.name, classdef)
+
+### NUMERIC ARRAY ###
+# Fixed-length Integer or Float arrays held in a NumPy ndarray; the
+# arithmetic hooks run elementwise over the whole array at once. Only
+# available when NumPy is installed.
+_NUMERIC_ARRAY_DTYPES = {
+        'q': 'int64',
+        'd': 'float64'
+    }
+
+def _is_numeric_array(obj):
+    return numpy is not None and isinstance(getattr(obj, 'primitive', None), numpy.ndarray)
+
+def _make_numeric_array_from(values):
+    get_interpreter().count_bytes(values.nbytes)
+    return make_numeric_array(values)
+
+def _box_numeric_scalar(value):
+    if isinstance(value, numpy.integer):
+        return make_integer(int(value))
+    return make_float(float(value))
+
+def _numeric_operand(obj):
+    if _is_numeric_array(obj):
+        return obj.primitive
+    if _array_typecode_of(obj):
+        return obj.primitive
+    raise InvalidTypeError("NumericArray operand must be a 'NumericArray', 'Integer' or 'Float'")
+
+_INT64_MIN = -2 ** 63
+
+# Where the int64 'result' of 'operation' wrapped around. NumPy wraps integer
+# arrays silently, even under numpy.errstate, so this is worked out from the
+# signs of the operands and the result.
+def _numeric_array_overflows(operation, left, right, result):
+    if operation == '+':
+        return ((left ^ result) & (right ^ result)) < 0
+    if operation == '-':
+        return ((left ^ right) & (left ^ result)) < 0
+    if operation == '*':
+        divisor = numpy.where(left == 0, 1, left)
+        return (left != 0) & ((result // divisor != right) | ((left == -1) & (right == _INT64_MIN)))
+    return (left == _INT64_MIN) & (right == -1)
+
+# Applies 'operation' with the same semantics as the scalar hooks ('/' floors
+# and rejects zero divisors), except that Integer elements are int64 and
+# raise instead of growing past it
+def _numeric_array_operation(operation, left, right):
+    left_values = _numeric_operand(left)
+    right_values = _numeric_operand(right)
+    if _is_numeric_array(left) and _is_numeric_array(right) and len(left_values) != len(right_values):
+        raise ShapeMismatchError(len(left_values), len(right_values))
+    if operation == '/' and not numpy.all(right_values):
+        raise InvalidValueError("NumericArray division by zero")
+    try:
+        with numpy.errstate(over='ignore'):
+            result = _PRIMITIVE_OPERATION_FUNCTIONS[operation](left_values, right_values)
+            overflows = result.dtype.kind == 'i' and numpy.any(_numeric_array_overflows(operation, left_values, right_values, result))
+    except OverflowError:
+        overflows = True
+    if overflows:
+        raise InvalidValueError("NumericArray Integer overflow in '{}'".format(operation))
+    return _make_numeric_array_from(result)
+
+def _numeric_array_values(value):
+    if _is_numeric_array(value):
+        return value.primitive.copy()
+    if getattr(value, 'typeobj', None) is get_builtin('List'):
+        storage = value.primitive
+        if isinstance(storage, array.array):
+            return numpy.array(storage, dtype=_NUMERIC_ARRAY_DTYPES[storage.typecode])
+        if not storage:
+            return numpy.array([], dtype=_NUMERIC_ARRAY_DTYPES['q'])
+    raise InvalidTypeError("NumericArray requires a 'List' of only Integers or only Floats")
+
+def _numeric_array_to_string(obj):
+    return '[' + ', '.join(str(value) for value in obj.primitive.tolist()) + ']'
+
+def _make_numeric_array_reduction_def(name, reduce_values, empty_result):
+    def reduction_content():
+        values = peek_stack_frame().symbol_stack['self'].primitive
+        if not len(values):
+            return empty_result()
+        return _box_numeric_scalar(reduce_values(values))
+    return MethodDefinition(name, reduction_content)
+
+def _make_numeric_array_class():
+    superclass = get_builtin('Object')
+    classdef = ClassDefinition(None, 'NumericArray', superclass=superclass)
+    
+    def new_callable_content():
+        obj = _hook_new_callable_content(PrimitiveObjectDefinition)
+        obj.primitive = numpy.array([], dtype=_NUMERIC_ARRAY_DTYPES['q'])
+        obj.set_string_function(_numeric_array_to_string)
+        return obj
+        
+    classdef.add_hook(MethodDefinition('()', new_callable_content))
+    
+    def make_operation_def(operation):
+        def operation_content():
+            symbol_stack = peek_stack_frame().symbol_stack
+            return _numeric_array_operation(operation, symbol_stack['self'], symbol_stack['other'])
+        return MethodDefinition(operation, operation_content, 'other')
+    
+    for operation in ['*', '/', '+', '-']:
+        classdef.add_hook_definition(make_operation_def(operation))
+    
+    def index_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        values = symbol_stack['self'].primitive
+        return _box_numeric_scalar(values[_list_index(values, symbol_stack['index'])])
+    classdef.add_hook_definition(MethodDefinition('[]', index_content, 'index'))
+    
+    classdef.add_hook_definition(_make_iter_method_def(lambda selfobj: map(_box_numeric_scalar, selfobj.primitive)))
+    
+    # Slices are views sharing the memory of the original array
+    def slice_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        start = symbol_stack['start']
+        end = symbol_stack['end']
+        if _array_typecode_of(start) != 'q' or _array_typecode_of(end) != 'q':
+            raise InvalidTypeError("NumericArray slice bounds must be 'Integer'")
+        return make_numeric_array(symbol_stack['self'].primitive[start.primitive:end.primitive])
+    classdef.add_method_definition(MethodDefinition('slice', slice_content, 'start', 'end'))
+    
+    nothing = lambda: get_builtin('nothing')
+    classdef.add_method_definition(_make_numeric_array_reduction_def('sum', numpy.sum, lambda: make_integer(0)))
+    classdef.add_method_definition(_make_numeric_array_reduction_def('min', numpy.min, nothing))
+    classdef.add_method_definition(_make_numeric_array_reduction_def('max', numpy.max, nothing))
+    classdef.add_method_definition(_make_numeric_array_reduction_def('mean', numpy.mean, nothing))
+    
+    length_content = lambda: make_integer(len(peek_stack_frame().symbol_stack['self'].primitive))
+    length_prop_def = PropertyDefinition('length', getter_method_def=MethodDefinition('get', length_content))
+    classdef.add_property_definition(length_prop_def)
+    
+    string_callable_content = lambda: make_string(peek_stack_frame().symbol_stack['self'].to_string())
+    string_prop_def = PropertyDefinition('string', getter_method_def=MethodDefinition('get', string_callable_content))
+    classdef.add_property_definition(string_prop_def)
+    
+    add_builtin(classdef.name, classdef)
+
+### ITERATION ###
+# Objects are iterable through their 'iter' hook, which returns an iterator
+# whose 'next' hook yields items until it returns 'done'. Builtin iterators
+# wrap a Python iterator and are consumed directly.
+def iterate(obj):
+    iterator = obj.hook_table['iter']()
+    if iterator.typeobj is get_builtin('Iterator'):
+        return iterator.primitive
+    return _iterate_next_hook(iterator)
+
+def _iterate_next_hook(iterator):
+    next_hook = iterator.hook_table['next']
+    done = get_builtin('done')
+    while True:
+        item = next_hook()
+        if item is done:
+            return
+        yield item
+
+# Map and filter over an iterable make a lazy Iterator; reduce consumes it
+def _lazy_map(items, callback):
+    return make_iterator(map(callback.hook_table['()'].call, items))
+
+def _lazy_filter(items, callback):
+    call = callback.hook_table['()'].call
+    return make_iterator(item for item in items if _filter_verdict(call(item)))
+
+def _make_lazy_callback_hook_def(operation, apply_callback):
+    def hook_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        return apply_callback(iterate(symbol_stack['self']), symbol_stack['callback'])
+    return MethodDefinition(operation, hook_content, 'callback')
+
+def _add_lazy_callback_hook_defs(classdef):
+    classdef.add_hook_definition(_make_lazy_callback_hook_def('<<-', _lazy_map))
+    classdef.add_hook_definition(_make_lazy_callback_hook_def('<<=', _lazy_filter))
+    classdef.add_hook_definition(_make_lazy_callback_hook_def('<--', _reduce_items))
+
+def _make_iter_method_def(make_items):
+    iter_content = lambda: make_iterator(make_items(peek_stack_frame().symbol_stack['self']))
+    return MethodDefinition('iter', iter_content)
+
+def _make_iterator_class():
+    superclass = get_builtin('Object')
+    classdef = ClassDefinition(None, 'Iterator', superclass=superclass)
+    
+    def new_callable_content():
+        obj = _hook_new_callable_content(PrimitiveObjectDefinition)
+        obj.primitive = iter(())
+        return obj
+        
+    classdef.add_hook(MethodDefinition('()', new_callable_content))
+    
+    classdef.add_hook_definition(MethodDefinition('iter', lambda: peek_stack_frame().symbol_stack['self']))
+    
+    next_content = lambda: next(peek_stack_frame().symbol_stack['self'].primitive, get_builtin('done'))
+    classdef.add_hook_definition(MethodDefinition('next', next_content))
+    
+    _add_lazy_callback_hook_defs(classdef)
+    
+    add_builtin(classdef.name, classdef)
+
+def _make_done():
+    typedef_superobj = make_object()
+    typedef = TypeDefinition(typedef_superobj, 'Done')
+    typedef.set_typeobj(get_type('Type'))
+    superobj = make_object()
+    done_obj = ObjectDefinition(superobj, name='done')
+    done_obj.set_typeobj(typedef)
+    add_builtin(done_obj.name, done_obj)
+
+### RANGE ###
+# Ranges hold a Python range, so items are only made while iterating
+def _range_bound(obj, name):
+    if _array_typecode_of(obj) != 'q':
+        raise InvalidTypeError("Range {} must be an 'Integer'".format(name))
+    return obj.primitive
+
+def _range_to_string(obj):
+    return "range({}, {})".format(obj.primitive.start, obj.primitive.stop)
+
+def _make_range_class():
+    superclass = get_builtin('Object')
+    classdef = ClassDefinition(None, 'Range', superclass=superclass)
+    
+    def new_callable_content():
+        obj = _hook_new_callable_content(PrimitiveObjectDefinition)
+        obj.primitive = range(0)
+        obj.set_string_function(_range_to_string)
+        return obj
+        
+    classdef.add_hook(MethodDefinition('()', new_callable_content))
+    
+    classdef.add_hook_definition(_make_iter_method_def(lambda selfobj: map(make_integer, selfobj.primitive)))
+    _add_lazy_callback_hook_defs(classdef)
+    
+    def index_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        values = symbol_stack['self'].primitive
+        return make_integer(values[_list_index(values, symbol_stack['index'])])
+    classdef.add_hook_definition(MethodDefinition('[]', index_content, 'index'))
+    
+    length_content = lambda: make_integer(len(peek_stack_frame().symbol_stack['self'].primitive))
+    length_prop_def = PropertyDefinition('length', getter_method_def=MethodDefinition('get', length_content))
+    classdef.add_property_definition(length_prop_def)
+    
+    add_builtin(classdef.name, classdef)
+
+### MAP ###
+# Keys are hashed and compared through their 'hash' and '==' hooks, except
+# builtin Integers, Floats and Strings which use their primitives directly.
+def _map_key_hash(key):
+    if _primitive_key_kind(key):
+        return hash(_primitive_hash_key(key))
+    key_hash = key.hook_table['hash']()
+    if _array_typecode_of(key_hash) != 'q':
+        raise InvalidTypeError("'hash' must return an 'Integer'")
+    return hash(key_hash.primitive)
+
+def _map_keys_equal(key, other):
+    if key is other:
+        return True
+    kind = _primitive_key_kind(key)
+    if kind:
+        return kind == _primitive_key_kind(other) and key.primitive == other.primitive
+    return key.hook_table['=='](other) is get_builtin('true')
+
+_MAP_FREE = -1
+_MAP_DUMMY = -2
+_MAP_MIN_SIZE = 8
+
+def _map_index_typecode(size):
+    for typecode in ('b', 'h', 'l', 'q'):
+        if size <= 2 ** (8 * array.array(typecode).itemsize - 1):
+            return typecode
+    return 'q'
+
+# Open-addressing table in the layout of CPython's compact dict: a sparse
+# array of small integers indexes dense entry arrays kept in insertion
+# order. Deleted entries leave a hole that is dropped on the next resize.
+class _MapStorage:
+    def __init__(self):
+        self.__hashes = []
+        self.__keys = []
+        self.__values = []
+        self.__length = 0
+        self.__reset_indices(_MAP_MIN_SIZE)
+        
+    def __reset_indices(self, size):
+        self.__indices = array.array(_map_index_typecode(size), [_MAP_FREE]) * size
+        
+    def __len__(self):
+        return self.__length
+        
+    # Returns the entry of 'key', or None, and the slot for inserting it
+    def __lookup(self, key, key_hash):
+        indices = self.__indices
+        mask = len(indices) - 1
+        perturb = key_hash & 0xFFFFFFFFFFFFFFFF
+        slot = key_hash & mask
+        free_slot = None
+        while True:
+            entry = indices[slot]
+            if entry == _MAP_FREE:
+                return None, slot if free_slot is None else free_slot
+            if entry == _MAP_DUMMY:
+                if free_slot is None:
+                    free_slot = slot
+            elif self.__hashes[entry] == key_hash and _map_keys_equal(self.__keys[entry], key):
+                return entry, slot
+            perturb >>= 5
+            slot = (slot * 5 + perturb + 1) & mask
+            
+    def __resize(self):
+        live = [i for i, key in enumerate(self.__keys) if key is not None]
+        self.__hashes = [self.__hashes[i] for i in live]
+        self.__keys = [self.__keys[i] for i in live]
+        self.__values = [self.__values[i] for i in live]
+        size = _MAP_MIN_SIZE
+        while size * 2 <= self.__length * 3:
+            size *= 2
+        self.__reset_indices(size)
+        indices = self.__indices
+        mask = size - 1
+        for entry, key_hash in enumerate(self.__hashes):
+            perturb = key_hash & 0xFFFFFFFFFFFFFFFF
+            slot = key_hash & mask
+            while indices[slot] != _MAP_FREE:
+                perturb >>= 5
+                slot = (slot * 5 + perturb + 1) & mask
+            indices[slot] = entry
+        
+    def get(self, key, default=None):
+        entry, slot = self.__lookup(key, _map_key_hash(key))
+        return default if entry is None else self.__values[entry]
+        
+    def __contains__(self, key):
+        return self.__lookup(key, _map_key_hash(key))[0] is not None
+        
+    def put(self, key, value):
+        key_hash = _map_key_hash(key)
+        entry, slot = self.__lookup(key, key_hash)
+        if entry is not None:
+            self.__values[entry] = value
+            return
+        self.__indices[slot] = len(self.__keys)
+        self.__hashes.append(key_hash)
+        self.__keys.append(key)
+        self.__values.append(value)
+        self.__length += 1
+        # Deleted entries stay in the entry arrays until the table is
+        # rebuilt, so it is the entries, not the used slots, that fill it.
+        # Entry numbers then stay below the table size and fit its index
+        # typecode.
+        if len(self.__keys) * 3 >= len(self.__indices) * 2:
+            self.__resize()
+            
+    def delete(self, key):
+        entry, slot = self.__lookup(key, _map_key_hash(key))
+        if entry is None:
+            return False
+        self.__indices[slot] = _MAP_DUMMY
+        self.__keys[entry] = None
+        self.__values[entry] = None
+        self.__length -= 1
+        return True
+        
+    def keys(self):
+        return [key for key in self.__keys if key is not None]
+        
+    def values(self):
+        return [value for key, value in zip(self.__keys, self.__values) if key is not None]
+        
+    def items(self):
+        return [(key, value) for key, value in zip(self.__keys, self.__values) if key is not None]
+
+def _map_to_string(obj):
+    items = obj.primitive.items()
+    return '{' + ', '.join("{}: {}".format(key.to_string(), value.to_string()) for key, value in items) + '}'
+
+def _make_map_class():
+    superclass = get_builtin('Object')
+    classdef = ClassDefinition(None, 'Map', superclass=superclass)
+    
+    def new_callable_content():
+        obj = _hook_new_callable_content(PrimitiveObjectDefinition)
+        obj.primitive = _MapStorage()
+        obj.set_string_function(_map_to_string)
+        return obj
+        
+    classdef.add_hook(MethodDefinition('()', new_callable_content))
+    
+    def index_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        key = symbol_stack['key']
+        value = symbol_stack['self'].primitive.get(key)
+        if value is None:
+            raise KeyNotFoundError(key.to_string())
+        return value
+    classdef.add_hook_definition(MethodDefinition('[]', index_content, 'key'))
+    
+    # Iterates over the keys
+    classdef.add_hook_definition(_make_iter_method_def(lambda selfobj: selfobj.primitive.keys()))
+    
+    def get_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        return symbol_stack['self'].primitive.get(symbol_stack['key'], get_builtin('nothing'))
+    classdef.add_method_definition(MethodDefinition('get', get_content, 'key'))
+    
+    def put_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        symbol_stack['self'].primitive.put(symbol_stack['key'], symbol_stack['value'])
+    classdef.add_method_definition(MethodDefinition('put', put_content, 'key', 'value'))
+    
+    def delete_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        return _make_boolean_object(symbol_stack['self'].primitive.delete(symbol_stack['key']))
+    classdef.add_method_definition(MethodDefinition('delete', delete_content, 'key'))
+    
+    def contains_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        return _make_boolean_object(symbol_stack['key'] in symbol_stack['self'].primitive)
+    classdef.add_method_definition(MethodDefinition('contains', contains_content, 'key'))
+    
+    keys_content = lambda: make_list(peek_stack_frame().symbol_stack['self'].primitive.keys())
+    classdef.add_method_definition(MethodDefinition('keys', keys_content))
+    
+    values_content = lambda: make_list(peek_stack_frame().symbol_stack['self'].primitive.values())
+    classdef.add_method_definition(MethodDefinition('values', values_content))
+    
+    length_content = lambda: make_integer(len(peek_stack_frame().symbol_stack['self'].primitive))
+    length_prop_def = PropertyDefinition('length', getter_method_def=MethodDefinition('get', length_content))
+    classdef.add_property_definition(length_prop_def)
+    
+    string_callable_content = lambda: make_string(peek_stack_frame().symbol_stack['self'].to_string())
+    string_prop_def = PropertyDefinition('string', getter_method_def=MethodDefinition('get', string_callable_content))
+    classdef.add_property_definition(string_prop_def)
+    
+    add_builtin(classdef.name, classdef)
+
+### BYTES ###
+# Bytes hold a read-only memoryview of unsigned bytes; indexing, slicing
+# and decoding read through the view, and slices are views of the same
+# memory. Buffers accumulate bytes in a growable bytearray.
+def _bytes_view(value):
+    view = memoryview(value)
+    if view.format != 'B' or view.ndim != 1:
+        view = view.cast('B')
+    return view.toreadonly()
+
+def _bytes_argument(obj, name):
+    typeobj = getattr(obj, 'typeobj', None)
+    if typeobj is None or typeobj is not get_builtin('Bytes'):
+        raise InvalidTypeError("Bytes {} must be a 'Bytes'".format(name))
+    return obj.primitive
+
+def _byte_argument(obj, name):
+    if _array_typecode_of(obj) != 'q':
+        raise InvalidTypeError("Bytes {} must be an 'Integer'".format(name))
+    if not 0 <= obj.primitive < 256:
+        raise InvalidValueError("Bytes {} must be in range(0, 256)".format(name))
+    return obj.primitive
+
+def _bytes_to_string(obj):
+    return repr(obj.primitive.tobytes())
+
+def _make_bytes_class():
+    superclass = get_builtin('Object')
+    classdef = ClassDefinition(None, 'Bytes', superclass=superclass)
+    
+    def new_callable_content():
+        obj = _hook_new_callable_content(PrimitiveObjectDefinition)
+        obj.primitive = _bytes_view(b'')
+        obj.set_string_function(_bytes_to_string)
+        return obj
+        
+    classdef.add_hook(MethodDefinition('()', new_callable_content))
+    
+    def index_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        view = symbol_stack['self'].primitive
+        return make_integer(view[_list_index(view, symbol_stack['index'])])
+    classdef.add_hook_definition(MethodDefinition('[]', index_content, 'index'))
+    
+    # Copies both operands once into new, immutable bytes
+    def concat_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        value = b''.join((symbol_stack['self'].primitive, _bytes_argument(symbol_stack['other'], 'operand')))
+        get_interpreter().count_bytes(sys.getsizeof(value))
+        return make_bytes(value)
+    classdef.add_hook_definition(MethodDefinition('+', concat_content, 'other'))
+    
+    classdef.add_hook_definition(_make_iter_method_def(lambda selfobj: map(make_integer, selfobj.primitive)))
+    classdef.add_hook_definition(_make_primitive_equals_method_def())
+    classdef.add_hook_definition(_make_primitive_hash_method_def())
+    
+    def slice_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        start = symbol_stack['start']
+        end = symbol_stack['end']
+        if _array_typecode_of(start) != 'q' or _array_typecode_of(end) != 'q':
+            raise InvalidTypeError("Bytes slice bounds must be 'Integer'")
+        return make_bytes(symbol_stack['self'].primitive[start.primitive:end.primitive])
+    classdef.add_method_definition(MethodDefinition('slice', slice_content, 'start', 'end'))
+    
+    def decode_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        encoding = _string_argument(symbol_stack['encoding'], 'encoding')
+        try:
+            value = str(symbol_stack['self'].primitive, encoding)
+        except (LookupError, UnicodeError) as err:
+            raise InvalidValueError("Cannot decode Bytes as '{}': {}".format(encoding, err))
+        get_interpreter().count_bytes(sys.getsizeof(value))
+        return make_string(value)
+    classdef.add_method_definition(MethodDefinition('decode', decode_content, 'encoding'))
+    
+    length_content = lambda: make_integer(len(peek_stack_frame().symbol_stack['self'].primitive))
+    length_prop_def = PropertyDefinition('length', getter_method_def=MethodDefinition('get', length_content))
+    classdef.add_property_definition(length_prop_def)
+    
+    string_callable_content = lambda: make_string(peek_stack_frame().symbol_stack['self'].to_string())
+    string_prop_def = PropertyDefinition('string', getter_method_def=MethodDefinition('get', string_callable_content))
+    classdef.add_property_definition(string_prop_def)
+    
+    add_builtin(classdef.name, classdef)
+
+def _buffer_to_string(obj):
+    return repr(bytes(obj.primitive))
+
+def _make_buffer_class():
+    superclass = get_builtin('Object')
+    classdef = ClassDefinition(None, 'Buffer', superclass=superclass)
+    
+    def new_callable_content():
+        obj = _hook_new_callable_content(PrimitiveObjectDefinition)
+        obj.primitive = bytearray()
+        obj.set_string_function(_buffer_to_string)
+        return obj
+        
+    classdef.add_hook(MethodDefinition('()', new_callable_content))
+    
+    # Appends a Bytes or a single byte given as an Integer
+    def append_content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        selfobj = symbol_stack['self']
+        value = symbol_stack['value']
+        if _array_typecode_of(value) == 'q':
+            selfobj.primitive.append(_byte_argument(value, 'value'))
+            get_interpreter().count_bytes(1)
+        else:
+            view = _bytes_argument(value, 'value')
+            selfobj.primitive += view
+            get_interpreter().count_bytes(len(view))
+        return selfobj
+    classdef.add_method_definition(MethodDefinition('append', append_content, 'value'))
+    
+    # A snapshot of the contents; the buffer can keep growing afterwards
+    bytes_content = lambda: make_bytes(bytes(peek_stack_frame().symbol_stack['self'].primitive))
+    bytes_prop_def = PropertyDefinition('bytes', getter_method_def=MethodDefinition('get', bytes_content))
+    classdef.add_property_definition(bytes_prop_def)
+    
+    length_content = lambda: make_integer(len(peek_stack_frame().symbol_stack['self'].primitive))
+    length_prop_def = PropertyDefinition('length', getter_method_def=MethodDefinition('get', length_content))
+    classdef.add_property_definition(length_prop_def)
+    
+    add_builtin(classdef.name, classdef)
+
+### FILES ###
+# Files wrap a buffered Python file object. Lines are read lazily one at a
+# time without their line terminator, as Strings in text modes and as Bytes
+# in binary modes. Mapped files are Bytes views over an mmap whose lines
+# are views of the mapping, so nothing is copied until decoded.
+_FILE_MODES = ('r', 'w', 'a', 'rb', 'wb', 'ab')
+
+_BYTES_LINE_END = re.compile(b'\n')
+
+def _open_file(path, mode):
+    try:
+        if 'b' in mode:
+            return open(path, mode)
+        return open(path, mode, encoding='utf-8', newline=None)
+    except OSError as err:
+        raise FileAccessError(path, err.strerror or str(err))
+
+def _text_lines(lines):
+    for line in lines:
+        get_interpreter().count_bytes(sys.getsizeof(line))
+        yield make_string(line[:-1] if line.endswith('\n') else line)
+
+def _binary_lines(lines):
+    for line in lines:
+        get_interpreter().count_bytes(sys.getsizeof(line))
+        if line.endswith(b'\n'):
+            line = line[:-2] if line.endswith(b'\r\n') else line[:-1]
+        yield make_bytes(line)
+
+# Errors of the file while reading, including it being closed between two
+# lines, are raised as cacti errors
+def _file_lines(file):
+    lines = _binary_lines(file) if 'b' in file.mode else _text_lines(file)
+    try:
+        yield from lines
+    except UnicodeDecodeError as err:
+        raise InvalidValueError("File '{}' is not valid UTF-8: {}".format(file.name, err.reason))
+    except OSError as err:
+        raise FileAccessError(file.name, err.strerror or str(err))
+    except ValueError:
+        raise InvalidValueError("File '{}' was closed while reading".format(file.name))
+
+def _path_lines(path):
+    with _open_file(path, 'r') as file:
+        yield from _file_lines(file)
+
+def _bytes_lines(view):
+    start = 0
+    for match in _BYTES_LINE_END.finditer(view):
+        end = match.start()
+        yield make_bytes(view[start:end - 1 if end > start and view[end - 1] == 13 else end])
+        start = match.end()
+    if start < len(view):
+        yield make_bytes(view[start:])
+
+def _is_file(obj):
+    return getattr(obj, 'typeobj', None) is get_builtin('File')
+
+# 'access' is 'read' or 'write' when the file must be open for it
+def _file_argument(obj, name, access=None):
+    if not _is_file(obj):
+        raise InvalidTypeError("{} must be a 'File'".format(name))
+    file = obj.primitive
+    if file.closed:
+        raise InvalidValueError("{} is closed".format(name))
+    if (access == 'read' and not file.readable()) or (access == 'write' and not file.writable()):
+        raise InvalidValueError("{} is not open for {}ing".format(name, access))
+    return file
+
+def _map_file(path):
+    with _open_file(path, 'rb') as file:
+        try:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return make_bytes(b'')
+        except OSError as err:
+            raise FileAccessError(path, err.strerror or str(err))
+    return make_bytes(mapping)
+
+def _file_to_string(obj):
+    return "File<{}>".format(obj.primitive.name)
+
+def _make_file_class():
+    superclass = get_builtin('Object')
+    classdef = ClassDefinition(None, 'File', superclass=superclass)
+    
+    def new_callable_content():
+        obj = _hook_new_callable_content(PrimitiveObjectDefinition)
+        obj.set_string_function(_file_to_string)
+        return obj
+        
+    classdef.add_hook(MethodDefinition('()', new_callable_content))
+    
+    classdef.add_hook_definition(_make_iter_method_def(lambda selfobj: _file_lines(_file_argument(selfobj, 'File', 'read'))))
+    
+    def close_content():
+        peek_stack_frame().symbol_stack['self'].primitive.close()
+    classdef.add_method_definition(MethodDefinition('close', close_content))
+    
+    path_content = lambda: make_string(peek_stack_frame().symbol_stack['self'].primitive.name)
+    path_prop_def = PropertyDefinition('path', getter_method_def=MethodDefinition('get', path_content))
+    classdef.add_property_definition(path_prop_def)
+    
+    string_callable_content = lambda: make_string(peek_stack_frame().symbol_stack['self'].to_string())
+    string_prop_def = PropertyDefinition('string', getter_method_def=MethodDefinition('get', string_callable_content))
+    classdef.add_property_definition(string_prop_def)
+    
+    add_builtin(classdef.name, classdef)
+
+### MEMOIZE ###
+# Results of a memoized callback are cached by the values of its arguments.
+# Builtin primitives are keyed by type and primitive, so 1 and 1.0 stay
+# apart; other objects by their 'hash' and '==' hooks, which are identity
+# unless the class defines them. The least recently used result is evicted
+# once the cache holds 'capacity' results.
+class _MemoObjectKey:
+    __slots__ = ('obj', 'hash')
+    
+    def __init__(self, obj):
+        self.obj = obj
+        self.hash = _map_key_hash(obj)
+        
+    def __hash__(self):
+        return self.hash
+        
+    def __eq__(self, other):
+        return isinstance(other, _MemoObjectKey) and _map_keys_equal(self.obj, other.obj)
+
+def _memo_key(obj):
+    if _primitive_key_kind(obj):
+        return (obj.typeobj.name, _primitive_hash_key(obj))
+    return _MemoObjectKey(obj)
+
+class _MemoCache:
+    def __init__(self, callback, capacity):
+        self.__callback = callback
+        self.__capacity = capacity
+        self.__results = collections.OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        
+    @property
+    def capacity(self):
+        return self.__capacity
+        
+    @property
+    def size(self):
+        return len(self.__results)
+        
+    @property
+    def hits(self):
+        return self.__hits
+        
+    @property
+    def misses(self):
+        return self.__misses
+        
+    @property
+    def evictions(self):
+        return self.__evictions
+        
+    def call(self, *params):
+        key = tuple(_memo_key(param) for param in params)
+        results = self.__results
+        if key in results:
+            self.__hits += 1
+            results.move_to_end(key)
+            return results[key]
+        self.__misses += 1
+        result = self.__callback(*params)
+        results[key] = result
+        if len(results) > self.__capacity:
+            results.popitem(last=False)
+            self.__evictions += 1
+        return result
+
+def _memoize(callback, capacity):
+    if type(callback) not in (Function, Closure):
+        raise InvalidTypeError("memoize requires a 'Function' or 'Closure'")
+    if _array_typecode_of(capacity) != 'q':
+        raise InvalidTypeError("memoize capacity must be an 'Integer'")
+    if capacity.primitive < 1:
+        raise InvalidValueError("memoize capacity must be positive")
+    
+    cache = _MemoCache(callback, capacity.primitive)
+    param_names = callback.param_names
+    
+    def content():
+        symbol_stack = peek_stack_frame().symbol_stack
+        return cache.call(*[symbol_stack[p] for p in param_names])
+    
+    fn = Function(callback.name, content, *param_names)
+    for stat in ['capacity', 'evictions', 'hits', 'misses', 'size']:
+        getter = functools.partial(lambda stat: make_integer(getattr(cache, stat)), stat)
+        fn.property_table.add_symbol(stat, PropertyGetValueHolder(getter))
+    return fn
+
 def _make_nothing():
     typedef_superobj = make_object()
     typedef = TypeDefinition(typedef_superobj, 'Nothing')
@@ -390,10 +1598,23 @@ def _make_true():
     true_obj.set_typeobj(typedef)
     add_builtin(true_obj.name, true_obj)
 
+# Builtin numbers and Strings are written from their primitives, a String
+# rope piece by piece, without making a String of the text first. Other
+# objects are converted as the 'string' builtin converts them.
+def _write_value(output, value):
+    if isinstance(value, StringObjectDefinition) and value.typeobj is get_builtin('String'):
+        for piece in rope_pieces(value.rope):
+            output.write(piece)
+    elif _array_typecode_of(value):
+        output.write(str(value.primitive))
+    else:
+        output.write(value.to_lang_string().primitive)
+
 def _make_function_print():
     def fn_print():
-        value = peek_stack_frame().symbol_stack['value'].to_lang_string()
-        print(value.primitive)
+        output = get_interpreter().output
+        _write_value(output, peek_stack_frame().symbol_stack['value'])
+        output.write('\n')
     
     fn = Function('print', fn_print, 'value')
     add_builtin(fn.name, fn)
@@ -406,10 +1627,91 @@ def _make_function_string():
     fn = Function('string', fn_string, 'value')
     add_builtin(fn.name, fn)
     
+def _make_function_hash():
+    def fn_hash():
+        return make_integer(_map_key_hash(peek_stack_frame().symbol_stack['value']))
+    
+    fn = Function('hash', fn_hash, 'value')
+    add_builtin(fn.name, fn)
+    
+def _make_function_range():
+    def fn_range():
+        symbol_stack = peek_stack_frame().symbol_stack
+        obj = get_builtin('Range').hook_table['()'].call()
+        obj.primitive = range(_range_bound(symbol_stack['start'], 'start'), _range_bound(symbol_stack['stop'], 'stop'))
+        return obj
+    
+    fn = Function('range', fn_range, 'start', 'stop')
+    add_builtin(fn.name, fn)
+    
+def _make_function_numeric_array():
+    def fn_numeric_array():
+        return _make_numeric_array_from(_numeric_array_values(peek_stack_frame().symbol_stack['values']))
+    
+    fn = Function('numeric_array', fn_numeric_array, 'values')
+    add_builtin(fn.name, fn)
+    
+def _make_function_open():
+    def fn_open():
+        symbol_stack = peek_stack_frame().symbol_stack
+        path = _string_argument(symbol_stack['path'], 'path')
+        mode = _string_argument(symbol_stack['mode'], 'mode')
+        if mode not in _FILE_MODES:
+            raise InvalidValueError("File mode must be one of {}".format(', '.join(_FILE_MODES)))
+        obj = get_builtin('File').hook_table['()'].call()
+        obj.primitive = _open_file(path, mode)
+        return obj
+    
+    fn = Function('open', fn_open, 'path', 'mode')
+    add_builtin(fn.name, fn)
+    
+# Lazily reads the lines of an open File, of the file at a String path, or
+# of a Bytes such as a mapped file
+def _make_function_read_lines():
+    def fn_read_lines():
+        source = peek_stack_frame().symbol_stack['source']
+        if _is_file(source):
+            return make_iterator(_file_lines(_file_argument(source, 'File', 'read')))
+        if isinstance(source, StringObjectDefinition):
+            return make_iterator(_path_lines(source.primitive))
+        return make_iterator(_bytes_lines(_bytes_argument(source, 'source')))
+    
+    fn = Function('read_lines', fn_read_lines, 'source')
+    add_builtin(fn.name, fn)
+    
+def _make_function_write():
+    def fn_write():
+        symbol_stack = peek_stack_frame().symbol_stack
+        file = _file_argument(symbol_stack['file'], 'File', 'write')
+        value = symbol_stack['value']
+        value = _bytes_argument(value, 'value') if 'b' in file.mode else _string_argument(value, 'value')
+        try:
+            file.write(value)
+        except OSError as err:
+            raise FileAccessError(file.name, err.strerror or str(err))
+    
+    fn = Function('write', fn_write, 'file', 'value')
+    add_builtin(fn.name, fn)
+    
+def _make_function_map_file():
+    def fn_map_file():
+        return _map_file(_string_argument(peek_stack_frame().symbol_stack['path'], 'path'))
+    
+    fn = Function('map_file', fn_map_file, 'path')
+    add_builtin(fn.name, fn)
+    
+def _make_function_memoize():
+    def fn_memoize():
+        symbol_stack = peek_stack_frame().symbol_stack
+        return _memoize(symbol_stack['fn'], symbol_stack['capacity'])
+    
+    fn = Function('memoize', fn_memoize, 'fn', 'capacity')
+    add_builtin(fn.name, fn)
+    
 def _make_function_log_debug():
     import logging
     def fn():
-        print("Setting to DEBUG")
+        get_interpreter().output.write("Setting to DEBUG\n")
         logging.getLogger().setLevel(logging.DEBUG)
     
     fn_callable = Callable(fn)
@@ -420,7 +1722,7 @@ def _make_function_log_debug():
 def _make_function_log_info():
     import logging
     def fn():
-        print("Setting to INFO")
+        get_interpreter().output.write("Setting to INFO\n")
         logging.getLogger().setLevel(logging.INFO)
     
     fn_callable = Callable(fn)
@@ -443,4 +1745,22 @@ def initialize_builtins():
     _make_function_log_info()
     _make_numeric_class('Integer', int)
     _make_numeric_class('Float', float)
+    _make_function_hash()
+    _make_done()
+    _make_iterator_class()
+    _make_range_class()
+    _make_function_range()
+    _make_list_class()
+    _make_map_class()
+    _make_bytes_class()
+    _make_buffer_class()
+    _make_file_class()
+    _make_function_open()
+    _make_function_read_lines()
+    _make_function_write()
+    _make_function_map_file()
+    _make_function_memoize()
+    if numpy is not None:
+        _make_numeric_array_class()
+        _make_function_numeric_array()
     
@@ -0,0 +1,167 @@
+from cacti.ast import *
+from cacti.ast import _LoopValueHolder, _fatal_error
+from cacti.runtime import *
+from cacti.exceptions import ExecutionError
+from cacti.builtin import get_builtin, iterate
+
+__all__ = ['RUNTIME_NAMES', 'CodeWriter', 'get_property', 'hook_call']
+
+def hook_call(target, operation, *params):
+    return target.hook_table[operation].call(*params)
+
+# Property lookup as ObjectDefinition.__getitem__ does it, with the owner of
+# the frame looked up once per call
+def get_property(value, owner, prop_names):
+    for p in prop_names:
+        value = (value.private_table if value is owner else value.public_table)[p]
+    return value
+
+# The names the code written by a CodeWriter refers to
+RUNTIME_NAMES = {
+        'ConstantValueHolder': ConstantValueHolder, 'ExecutionError': ExecutionError, 'SymbolTable': SymbolTable,
+        'ValueHolder': ValueHolder, 'LoopValueHolder': _LoopValueHolder, 'fatal_error': _fatal_error,
+        'get_builtin': get_builtin, 'get_interpreter': get_interpreter, 'get_property': get_property,
+        'hook_call': hook_call, 'iterate': iterate
+    }
+
+# The source line of a node, or of the first node in it that has one
+def _source_of(node):
+    found = []
+    def visit(child):
+        if not found and child.source:
+            found.append(child.source)
+        return child if found else child.transform_children(visit)
+    visit(node)
+    return found[0] if found else ''
+
+# Writes the source of a Python function evaluating a body as the generic
+# evaluator does: statement by statement, with the same steps counted,
+# exit flags checked and errors raised. Subclasses write the values and
+# the nodes it has no code for.
+class CodeWriter:
+    # The expression of an object whose count_iterations() is called with
+    # the iterations of every loop
+    iteration_counter = None
+
+    def __init__(self):
+        self.__lines = []
+        self.__loops = 0
+
+    @property
+    def source(self):
+        return '\n'.join(self.__lines) + '\n'
+
+    def emit(self, depth, line):
+        self.__lines.append('    ' * depth + line)
+
+    def function(self, name, body):
+        self.emit(0, 'def {}():'.format(name))
+        self.emit(1, 'interpreter = get_interpreter()')
+        self.emit(1, 'frame = interpreter.peek_stack_frame()')
+        self.emit(1, 'symbols = frame.symbol_stack')
+        self.emit(1, 'owner = frame.owner')
+        self.emit(1, 'value = None')
+        if isinstance(body, Block):
+            self.block(body, 1, 'return value')
+        else:
+            self.statement(body, 1, step=False)
+        self.emit(1, 'return value')
+
+    # 'exit' is the line leaving the block once a return marked the frame
+    def block(self, block, depth, exit):
+        for expr in block.exprs:
+            if isinstance(expr, Block):
+                self.block(expr, depth, exit)
+                continue
+            self.statement(expr, depth)
+            if block.may_exit and expr.may_exit:
+                self.emit(depth, 'if frame.exit_flag:')
+                self.emit(depth + 1, exit)
+
+    def statement(self, expr, depth, step=True):
+        self.emit(depth, 'error = None')
+        self.emit(depth, 'try:')
+        if step:
+            self.emit(depth + 1, 'interpreter.step()')
+        self.statement_body(expr, depth + 1)
+        self.emit(depth, 'except ExecutionError as err:')
+        self.emit(depth + 1, 'error = err')
+        self.emit(depth, 'if error:')
+        self.emit(depth + 1, 'raise fatal_error(error, {})'.format(repr(_source_of(expr))))
+
+    def statement_body(self, expr, depth):
+        if isinstance(expr, ReturnStatement):
+            self.emit(depth, 'value = {}'.format(self.expression(expr.value_expr)))
+            self.emit(depth, 'frame.mark_exit_flag()')
+        elif isinstance(expr, YieldStatement):
+            self.emit(depth, 'value = {}'.format(self.expression(expr.value_expr)))
+            self.emit(depth, 'yield value')
+        elif isinstance(expr, (ValDeclarationStatement, VarDeclarationStatement)):
+            holder = 'ConstantValueHolder' if isinstance(expr, ValDeclarationStatement) else 'ValueHolder'
+            self.emit(depth, 'value = {}'.format(self.expression(expr.init_expr)))
+            self.emit(depth, 'symbols.peek().add_symbol({}, {}(value))'.format(repr(expr.symbol), holder))
+        elif isinstance(expr, AssignmentStatement):
+            self.emit(depth, 'value = {}'.format(self.expression(expr.value_expr)))
+            target = self.expression(expr.target_expr) if expr.target_expr else 'symbols'
+            self.emit(depth, '{}[{}] = value'.format(target, repr(expr.symbol)))
+        elif isinstance(expr, ForStatement):
+            self.loop(expr, depth)
+        else:
+            self.emit(depth, 'value = {}'.format(self.expression(expr)))
+
+    # As ForStatement.iter_eval()
+    def loop(self, expr, depth):
+        n = self.__loops
+        self.__loops += 1
+        counter = self.iteration_counter
+        self.emit(depth, 'items{} = iterate({})'.format(n, self.expression(expr.iterable_expr)))
+        self.emit(depth, "holder{} = LoopValueHolder(get_builtin('nothing'))".format(n))
+        self.emit(depth, 'table = SymbolTable()')
+        self.emit(depth, 'table.add_symbol({}, holder{})'.format(repr(expr.symbol), n))
+        self.emit(depth, 'symbols.push(table)')
+        self.emit(depth, 'loop_value{} = None'.format(n))
+        if counter:
+            self.emit(depth, 'iterations{} = 0'.format(n))
+        self.emit(depth, 'for item in items{}:'.format(n))
+        self.emit(depth + 1, 'holder{}.rebind(item)'.format(n))
+        if counter:
+            self.emit(depth + 1, 'iterations{} += 1'.format(n))
+        if isinstance(expr.body, Block):
+            if not expr.body.exprs:
+                self.emit(depth + 1, 'value = None')
+            self.block(expr.body, depth + 1, 'loop_value{} = value; break'.format(n))
+            self.emit(depth + 1, 'loop_value{} = value'.format(n))
+        else:
+            self.statement(expr.body, depth + 1, step=False)
+            self.emit(depth + 1, 'loop_value{} = value'.format(n))
+        self.emit(depth + 1, 'if frame.exit_flag:')
+        self.emit(depth + 2, 'break')
+        if counter:
+            self.emit(depth, '{}.count_iterations(iterations{})'.format(counter, n))
+        self.emit(depth, 'symbols.pop()')
+        self.emit(depth, 'value = loop_value{}'.format(n))
+
+    def expression(self, expr):
+        if isinstance(expr, ValueExpression):
+            return self.value(expr.value)
+        if isinstance(expr, ReferenceExpression):
+            return 'symbols[{}]'.format(repr(expr.symbol))
+        if isinstance(expr, PropertyExpression):
+            return 'get_property({}, owner, {})'.format(self.expression(expr.obj_expr), repr(expr.prop_names))
+        if isinstance(expr, OperationExpression):
+            operands = [self.expression(expr.operand_expr)]
+            operands += map(self.expression, expr.operation_expr_params)
+            return self.operation(expr, operands)
+        return self.node(expr)
+
+    # An operation dispatched through the hook of its operand
+    def operation(self, expr, operands):
+        return 'hook_call({})'.format(', '.join([operands[0], repr(expr.operation)] + operands[1:]))
+
+    # The source of an expression evaluating to the object 'value'
+    def value(self, value):
+        raise NotImplementedError()
+
+    # The source of an expression evaluating any other node
+    def node(self, expr):
+        raise NotImplementedError()
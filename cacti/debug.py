@@ -13,7 +13,10 @@ def configure_logging():
         from cacti.runtime import peek_stack_frame
         record = old_factory(*args, **kwargs)
         stack_frame = peek_stack_frame()
-        env_info = "{}('{}')".format(stack_frame.owner.to_repr(), stack_frame.name)
+        if stack_frame:
+            env_info = "{}('{}')".format(stack_frame.owner.to_repr(), stack_frame.name)
+        else:
+            env_info = ''
         record.env_info = env_info
         record.file_line = record.filename + ':' + str(record.lineno)
         record.name_fun = "{}:{}".format(record.name, record.funcName)
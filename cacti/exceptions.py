@@ -1,8 +1,9 @@
 __all__ = [
         # Exceptions
-        'ArityError', 'ConstantValueError', 'InvalidTypeError', 'OperationNotSupportedError',
-        'ExecutionError', 'FatalError',
-        'SymbolContentError', 'SymbolError', 'SymbolUnknownError', 'SyntaxError'
+        'ArityError', 'ConstantValueError', 'FileAccessError', 'IndexOutOfRangeError', 'InvalidTypeError', 'InvalidValueError', 'KeyNotFoundError', 'OperationNotSupportedError',
+        'ShapeMismatchError',
+        'ExecutionError', 'FatalError', 'LimitExceededError',
+        'SymbolContentError', 'SymbolError', 'SymbolUnknownError', 'SyntaxError', 'TaskCancelledError', 'YieldOutsideGeneratorError'
     ]
     
 class ExecutionError(Exception): pass
@@ -13,6 +14,28 @@ class ConstantValueError(ExecutionError): pass
 
 class InvalidTypeError(ExecutionError): pass
 
+class InvalidValueError(ExecutionError): pass
+
+class IndexOutOfRangeError(ExecutionError):
+    def __init__(self, index, length):
+        super().__init__("Index {} out of range for length {}".format(index, length))
+
+class ShapeMismatchError(ExecutionError):
+    def __init__(self, left_length, right_length):
+        super().__init__("Length {} does not match length {}".format(left_length, right_length))
+
+class KeyNotFoundError(ExecutionError):
+    def __init__(self, key):
+        super().__init__("Key '{}' not found".format(key))
+
+class FileAccessError(ExecutionError):
+    def __init__(self, path, reason):
+        super().__init__("Cannot access '{}': {}".format(path, reason))
+
+class YieldOutsideGeneratorError(ExecutionError):
+    def __init__(self):
+        super().__init__("'yield' outside of a function, closure or method")
+
 class UnsupportedMethodError(ExecutionError): pass
 
 class UnknownPropertyError(ExecutionError): pass
@@ -21,16 +44,43 @@ class OperationNotSupportedError(ExecutionError):
     def __init__(self, name, operation):
         super().__init__("Operation '{}' not supported for '{}'".format(operation, name))
         
+class LimitExceededError(ExecutionError):
+    def __init__(self, limit, value, maximum):
+        super().__init__("{} limit of {} exceeded: {}".format(limit, maximum, value))
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+        self.source = ''
+        
+# 'location' is the SourceLocation of the source line, when it is known. Its
+# line and column are only worked out when asked for.
 class FatalError(Exception):
-    def __init__(self, cause, source):
+    def __init__(self, cause, source, location=None):
         cause_class_name = cause.__class__.__name__
         source_ref = source.strip()
+        self.cause = cause
+        self.source = source_ref
+        self.location = location
         cause_message = str(cause)
         if 0 == len(cause_message):
             error_message = "{} at: {}".format(cause_class_name, source_ref)
         else:
             error_message = "{}({}) at: {}".format(cause_class_name, cause_message, source_ref)
         super().__init__(error_message)
+        
+    @property
+    def lineno(self):
+        return self.location.lineno if self.location else None
+        
+    @property
+    def column(self):
+        return self.location.column if self.location else None
+
+# Ends a scheduled task that was cancelled. It is not an ExecutionError, so
+# the evaluator lets it through as it is.
+class TaskCancelledError(Exception):
+    def __init__(self, name):
+        super().__init__("Task '{}' was cancelled".format(name))
 
 class SymbolError(ExecutionError): pass
 
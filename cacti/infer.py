@@ -0,0 +1,220 @@
+import collections
+from cacti.ast import *
+from cacti.lang import ValDefinition, VarDefinition
+from cacti.builtin import get_builtin, primitive_operation_function
+
+__all__ = ['BOTTOM', 'TOP', 'TypeInference', 'infer_types', 'specialize_operations']
+
+# The types inferred form a flat lattice: BOTTOM, for no value seen yet,
+# below the name of each builtin type, below TOP, for a value of any type.
+BOTTOM = None
+TOP = '*'
+
+_LITERAL_TYPE_NAMES = ('Integer', 'Float', 'String')
+
+_SPECIALIZED_OPERATIONS = ('*', '/', '+', '-', '==')
+
+def _join(a, b):
+    if a is BOTTOM:
+        return b
+    if b is BOTTOM or a == b:
+        return a
+    return TOP
+
+def _join_all(types):
+    result = BOTTOM
+    for t in types:
+        result = _join(result, t)
+    return result
+
+def _is_call(node):
+    return type(node) is OperationExpression and node.operation == '()'
+
+# Infers the builtin type of the values that each symbol of a program is
+# bound to, and from them the type of expressions. Symbols are told apart
+# by name only, and every binding of a name, anywhere in the program,
+# counts: val and var initializers, assignments, loop variables and
+# parameters. The parameters of a closure or function that is only ever
+# called by name, or called where it is declared, take the types of the
+# arguments at its call sites; other parameters can be bound to anything.
+class TypeInference:
+    def __init__(self, node):
+        self.__bindings = collections.defaultdict(list)
+        self.__declaration_names = collections.defaultdict(list)
+        self.__calls = collections.defaultdict(list)
+        self.__immediate = set()
+        self.__callees = set()
+        self.__escaped = set()
+        self.__types = {}
+        _walk_tree_with_parts(node, self.__collect)
+        self.__solve()
+
+    # The inferred type of each symbol bound in the program
+    @property
+    def types(self):
+        return self.__types
+
+    def type_of(self, expr):
+        if isinstance(expr, ValueExpression):
+            type_name = getattr(expr.value.typeobj, 'name', None)
+            if type_name in _LITERAL_TYPE_NAMES and expr.value.typeobj is get_builtin(type_name):
+                return type_name
+            return TOP
+        if isinstance(expr, ReferenceExpression):
+            return self.__types.get(expr.symbol, TOP)
+        if isinstance(expr, FormatExpression):
+            return 'String'
+        if isinstance(expr, OperationExpression) and len(expr.operation_expr_params) == 1:
+            return self.__operation_type(expr)
+        return TOP
+
+    def operand_types(self, expr):
+        return self.type_of(expr.operand_expr), self.type_of(expr.operation_expr_params[0])
+
+    def __operation_type(self, expr):
+        if expr.operation not in _SPECIALIZED_OPERATIONS:
+            return TOP
+        left, right = self.operand_types(expr)
+        if BOTTOM in (left, right):
+            return BOTTOM
+        if primitive_operation_function(left, expr.operation, right) is None:
+            return TOP
+        if expr.operation == '==':
+            return 'Boolean'
+        # The hooks box the result in the type of the left operand
+        return left
+
+    def __bind(self, symbol, type_of):
+        self.__bindings[symbol].append(type_of)
+
+    def __bind_top(self, symbol):
+        self.__bind(symbol, lambda: TOP)
+
+    def __bind_expr(self, symbol, expr):
+        self.__bind(symbol, lambda: self.type_of(expr))
+        if isinstance(expr, (ClosureDeclarationStatement, FunctionDeclarationStatement)):
+            self.__declaration_names[expr].append(symbol)
+
+    def __bind_params(self, declaration):
+        for i, param in enumerate(declaration.params):
+            self.__bind(param, lambda i=i: self.__param_type(declaration, i))
+
+    def __collect(self, node):
+        if _is_call(node):
+            operand = node.operand_expr
+            if isinstance(operand, ReferenceExpression):
+                self.__callees.add(operand)
+                self.__calls[operand.symbol].append(node.operation_expr_params)
+            elif isinstance(operand, ClosureDeclarationStatement):
+                self.__immediate.add(operand)
+                self.__calls[operand].append(node.operation_expr_params)
+        elif isinstance(node, ReferenceExpression):
+            if node not in self.__callees:
+                self.__escaped.add(node.symbol)
+        elif isinstance(node, (ValDeclarationStatement, VarDeclarationStatement)):
+            self.__bind_expr(node.symbol, node.init_expr)
+        elif isinstance(node, AssignmentStatement):
+            if node.target_expr is None:
+                self.__bind_expr(node.symbol, node.value_expr)
+        elif isinstance(node, ForStatement):
+            self.__bind(node.symbol, lambda: self.__iteration_type(node.iterable_expr))
+        elif isinstance(node, FunctionDeclarationStatement):
+            if node.name:
+                self.__bind_top(node.name)
+                self.__declaration_names[node].append(node.name)
+            self.__bind_params(node)
+        elif isinstance(node, ClosureDeclarationStatement):
+            self.__bind_params(node)
+        elif isinstance(node, MethodDefinitionDeclarationStatement):
+            self.__bind_top(node.name)
+            for param in node.params:
+                self.__bind_top(param)
+        elif isinstance(node, SetMethodDefinitionStatement):
+            self.__bind_top(node.param)
+        elif isinstance(node, ClassDeclarationStatement):
+            self.__bind_top(node.name)
+        elif isinstance(node, (ValDefinition, VarDefinition)):
+            self.__bind_top(node.name)
+        elif isinstance(node, (PropertyFieldDeclaration, PropertyGetSetDeclaration)):
+            self.__bind_top(node.property_name)
+
+    # Only the builtin range yields Integers for certain
+    def __iteration_type(self, iterable_expr):
+        if _is_call(iterable_expr) and isinstance(iterable_expr.operand_expr, ReferenceExpression):
+            if iterable_expr.operand_expr.symbol == 'range' and 'range' not in self.__bindings:
+                return 'Integer'
+        return TOP
+
+    # The calls made to the declaration, or None when it can be called in
+    # ways that cannot be seen
+    def __calls_of(self, declaration):
+        if declaration in self.__immediate:
+            return self.__calls[declaration]
+        names = self.__declaration_names[declaration]
+        if not names:
+            return None
+        calls = []
+        for name in names:
+            if name in self.__escaped or len(self.__bindings[name]) != 1:
+                return None
+            calls += self.__calls[name]
+        return calls
+
+    def __param_type(self, declaration, i):
+        calls = self.__calls_of(declaration)
+        if calls is None or any(len(args) != len(declaration.params) for args in calls):
+            return TOP
+        return _join_all(self.type_of(args[i]) for args in calls)
+
+    def __solve(self):
+        self.__types = {symbol: BOTTOM for symbol in self.__bindings}
+        changed = True
+        while changed:
+            changed = False
+            for symbol, bindings in self.__bindings.items():
+                t = _join_all(type_of() for type_of in bindings)
+                if t != self.__types[symbol]:
+                    self.__types[symbol] = t
+                    changed = True
+
+# Visits the val and var definitions of classes too, which are not nodes
+# of their own
+def _walk_tree_with_parts(node, visit):
+    def walk(child):
+        visit(child)
+        if isinstance(child, ClassDeclarationStatement):
+            for part in child.parts:
+                if isinstance(part, (ValDefinition, VarDefinition)):
+                    visit(part)
+        return child.transform_children(walk)
+    walk(node)
+
+# The builtin type of each symbol of the program that is only ever bound
+# to values of that type
+def infer_types(node):
+    types = TypeInference(node).types
+    return {symbol: t for symbol, t in types.items() if t not in (BOTTOM, TOP)}
+
+# Replaces the operations whose operands are inferred to be builtin
+# numbers or strings with operations computing the result of the builtin
+# hook directly. These check the operand types on evaluation and call the
+# hook when they do not match, so an imprecise inference only costs the
+# check.
+def specialize_operations(node):
+    inference = TypeInference(node)
+    specialized = 0
+    def rewrite(node):
+        nonlocal specialized
+        if type(node) is not OperationExpression or len(node.operation_expr_params) != 1:
+            return node
+        if node.operation not in _SPECIALIZED_OPERATIONS:
+            return node
+        left, right = inference.operand_types(node)
+        if primitive_operation_function(left, node.operation, right) is None:
+            return node
+        specialized += 1
+        return PrimitiveOperationExpression(node.operand_expr, node.operation, node.operation_expr_params[0], left, right).copy_source(node)
+
+    def visit(child):
+        return rewrite(child.transform_children(visit))
+    return visit(node), specialized
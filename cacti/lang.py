@@ -6,19 +6,28 @@ from cacti.exceptions import *
 
 __all__ = [
     'ClassDefinition', 'Closure', 'Function', 'Method',
-    'MethodDefinition', 'ObjectDefinition', 'PropertyDefinition', 'TypeDefinition',
-    'ValDefinition', 'VarDefinition'
+    'MethodDefinition', 'ObjectDefinition', 'PrimitiveObjectDefinition', 'PropertyDefinition', 'StringObjectDefinition',
+    'TypeDefinition',
+    'ValDefinition', 'VarDefinition',
+    'rope_concat', 'rope_length', 'rope_pieces', 'rope_slice'
 ]
 
 class _Call:
+    __slots__ = ()
+    
     def __call__(self, *params):
         return self.call(*params)
 
 # All ObjectDefinition Instances Have This
 class ObjectDefinition:
+    __slots__ = (
+            '__typeobj', '__name', '__selfobj', '__superobj', '__internal_table', '__field_table',
+            '__hook_table', '__property_table', '__public_table', '__private_table'
+        )
+    
+    logger = get_logger(__name__ + '.ObjectDefinition')
+    
     def __init__(self, superobj, *, typeobj=None, name=''):
-        self.logger = get_logger(self)
-        
         self.logger.debug("superobj={}, typeobj={}, name={}".format(str(superobj), str(typeobj), name))
         
         self.__typeobj = typeobj
@@ -188,26 +197,162 @@ class ObjectDefinition:
         return ret_val
     
 class TypeDefinition(ObjectDefinition):
+    __slots__ = ()
+    
+    logger = get_logger(__name__ + '.TypeDefinition')
+    
     def __init__(self, superobj, name, *, typeobj=None):
         super().__init__(superobj, typeobj=typeobj, name=name)
         
         from cacti.builtin import make_string
         self.property_table.add_symbol('name', PropertyGetValueHolder(lambda: make_string(self.name)))
 
+# The objects of the builtin types, holding a Python value as their
+# primitive. How one is shown is a function of the object, set by the hook
+# making it and shared by every object of its type.
 class PrimitiveObjectDefinition(ObjectDefinition):
+    __slots__ = ('primitive', '__string_function', '__native_repr_function')
+    
+    logger = get_logger(__name__ + '.PrimitiveObjectDefinition')
+    
+    def __init__(self, superobj, *, typeobj=None, name=''):
+        self.__string_function = None
+        self.__native_repr_function = None
+        super().__init__(superobj, typeobj=typeobj, name=name)
+        
+    def set_string_function(self, function):
+        self.__string_function = function
+        
+    def set_native_repr_function(self, function):
+        self.__native_repr_function = function
+        
+    def to_string(self):
+        if self.__string_function is None:
+            return super().to_string()
+        return self.__string_function(self)
+        
+    def to_native_repr(self):
+        if self.__native_repr_function is None:
+            return super().to_native_repr()
+        return self.__native_repr_function(self)
+
+# A rope is either a str or a node joining two ropes
+class _RopeNode:
+    __slots__ = ('left', 'right', 'length')
+    
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.length = rope_length(left) + rope_length(right)
+
+# A view of text[start:stop] that is only copied when flattened
+class _RopeSlice:
+    __slots__ = ('text', 'start', 'stop', 'length')
+    
+    def __init__(self, text, start, stop):
+        self.text = text
+        self.start = start
+        self.stop = stop
+        self.length = stop - start
+
+def rope_length(rope):
+    return len(rope) if isinstance(rope, str) else rope.length
+
+def rope_concat(left, right):
+    if not rope_length(right):
+        return left
+    if not rope_length(left):
+        return right
+    return _RopeNode(left, right)
+
+# Slices a str or a slice rope with the semantics of Python slicing
+def rope_slice(rope, start, stop):
+    if isinstance(rope, _RopeSlice):
+        text, offset = rope.text, rope.start
+    else:
+        text, offset = rope, 0
+    bounds = range(rope_length(rope))[start:stop]
+    if bounds.start >= bounds.stop:
+        return ''
+    if bounds.start == 0 and bounds.stop == len(text) and offset == 0:
+        return text
+    return _RopeSlice(text, offset + bounds.start, offset + bounds.stop)
+
+# Yields the str pieces of the rope in order. Iterative, as ropes built by
+# repeated concatenation are as deep as they are long.
+def rope_pieces(rope):
+    pending = [rope]
+    while pending:
+        rope = pending.pop()
+        if isinstance(rope, str):
+            yield rope
+        elif isinstance(rope, _RopeSlice):
+            yield rope.text[rope.start:rope.stop]
+        else:
+            pending.append(rope.right)
+            pending.append(rope.left)
+
+def _flatten_rope(rope):
+    return ''.join(rope_pieces(rope))
+
+# Strings concatenate into a rope and only build the str when the primitive
+# is read
+class StringObjectDefinition(PrimitiveObjectDefinition):
+    __slots__ = ('__rope',)
+    
+    logger = get_logger(__name__ + '.StringObjectDefinition')
+    
     def __init__(self, superobj, *, typeobj=None, name=''):
         super().__init__(superobj, typeobj=typeobj, name=name)
+        self.__rope = ''
+        
+    @property
+    def rope(self):
+        return self.__rope
+        
+    def set_rope(self, rope):
+        self.__rope = rope
+        
+    # The str holding the characters of this String, and where they lie in
+    # it, without copying a view
+    @property
+    def text_bounds(self):
+        rope = self.__rope
+        if isinstance(rope, _RopeSlice):
+            return rope.text, rope.start, rope.stop
+        text = self.primitive
+        return text, 0, len(text)
+        
+    def view(self, start, stop):
+        rope = self.__rope
+        if isinstance(rope, _RopeNode):
+            rope = self.primitive
+        return rope_slice(rope, start, stop)
+        
+    @property
+    def primitive(self):
+        if not isinstance(self.__rope, str):
+            self.__rope = _flatten_rope(self.__rope)
+        return self.__rope
+        
+    @primitive.setter
+    def primitive(self, value):
+        self.__rope = value
 
 class Closure(TypeDefinition, _Call):
+    __slots__ = ('__stack_frame', '__content', '__param_names', '__callable')
+    
+    logger = get_logger(__name__ + '.Closure')
+    
     def __init__(self, stack_frame, content, *param_names):
         assert isinstance(stack_frame, StackFrame)
         
-        self.logger = get_logger(self)
-        
         self.__stack_frame = copy.copy(stack_frame)
         self.__content = content
         self.__param_names = param_names
         
+        self.__callable = Callable(self.__content, *self.__param_names)
+        
         from cacti.builtin import get_type
         type_type = get_type('Type')
         closure_type = get_type('Closure')
@@ -215,18 +360,30 @@ class Closure(TypeDefinition, _Call):
         
         self.hook_table.add_symbol('()', ConstantValueHolder(self))
         
+    @property
+    def content(self):
+        return self.__content
+        
+    @property
+    def param_names(self):
+        return self.__param_names
+        
     def call(self, *params):
-        push_stack_frame(self.__stack_frame)
-        return_value = self.__content(*params)
+        # Each call gets its own frame (and exit flag) over the captured symbols
+        captured = self.__stack_frame
+        push_stack_frame(StackFrame(captured.owner, captured.name, captured.selfobj, captured.symbol_stack))
+        return_value = self.__callable(*params)
         pop_stack_frame()
         return return_value
         
 class Function(TypeDefinition, _Call):
+    __slots__ = ('__name', '__content', '__param_names', '__callable')
+    
+    logger = get_logger(__name__ + '.Function')
+    
     def __init__(self, name, content, *param_names):
         #assert isinstance(function_callable, Callable)
         
-        self.logger = get_logger(self)
-        
         self.__name = name
         self.__content = content
         self.__param_names = param_names
@@ -240,6 +397,14 @@ class Function(TypeDefinition, _Call):
         
         self.hook_table.add_symbol('()', ConstantValueHolder(self))
         
+    @property
+    def content(self):
+        return self.__content
+        
+    @property
+    def param_names(self):
+        return self.__param_names
+        
     def call(self, *params):
         push_stack_frame(StackFrame(self, self.__name))
         return_value = self.__callable(*params)
@@ -247,11 +412,13 @@ class Function(TypeDefinition, _Call):
         return return_value
         
 class Method(TypeDefinition, _Call):
+    __slots__ = ('__owner', '__name', '__content', '__param_names', '__callable')
+    
+    logger = get_logger(__name__ + '.Method')
+    
     def __init__(self, owner, name, content, *param_names):
         assert isinstance(owner, ObjectDefinition)
         
-        self.logger = get_logger(self)
-        
         self.__owner = owner
         self.__name = name
         self.__content = content
@@ -310,6 +477,10 @@ class Method(TypeDefinition, _Call):
         return return_value
     
 class ClassDefinition(TypeDefinition):
+    __slots__ = ('__superclass', '__hook_defs', '__val_defs', '__var_defs', '__method_defs', '__property_defs')
+    
+    logger = get_logger(__name__ + '.ClassDefinition')
+    
     def __init__(self, superobj, name, *, superclass=None):
         from cacti.builtin import get_type
         typeobj = get_type('Class')
@@ -412,6 +583,8 @@ class PropertyDefinition:
         self.__setter_method_def = method_def
         
 class ValDefinition:
+    __slots__ = ('__val_name', '__val_init_expr')
+    
     def __init__(self, val_name, val_init_expr):
         self.__val_name = val_name
         self.__val_init_expr = val_init_expr
@@ -428,6 +601,8 @@ class ValDefinition:
         return "{}({}, {})".format(self.__class__.__name__, repr(self.__val_name), repr(self.__val_init_expr))
 
 class VarDefinition:
+    __slots__ = ('__val_name', '__val_init_expr')
+    
     def __init__(self, val_name, val_init_expr):
         self.__val_name = val_name
         self.__val_init_expr = val_init_expr
@@ -18,7 +18,23 @@ def set_up_main_stack_frame():
     stack_frame = StackFrame(mainobj, mainobj.name)
     push_stack_frame(stack_frame)
 
+def run_file(file_name, limits=None):
+    with Interpreter() as interpreter:
+        initialize_builtins()
+        set_up_main_stack_frame()
+        block = parse_file(file_name)
+        if limits:
+            limits.attach(interpreter)
+        block()
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'run-many':
+        from cacti.batch import main as run_many_main
+        sys.exit(run_many_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'compile':
+        from cacti.transpile import main as compile_main
+        sys.exit(compile_main(sys.argv[2:]))
+    
     initialize_builtins()
     set_up_main_stack_frame()
     
@@ -30,7 +46,11 @@ def main():
     #ast = parse_file('/Users/ryan/Dropbox/repositories/cacti/examples/class.cacti')
     logging.debug('finished parse()')
     #print(ast)
-    ast()
+    # Output written before an error is shown ahead of its traceback
+    try:
+        ast()
+    finally:
+        get_interpreter().output.flush()
     #logging.debug('finished exec()')
     #i = make_integer(7)
     #print('=======')
@@ -0,0 +1,277 @@
+import collections
+import os
+import time
+from cacti.ast import *
+from cacti.builtin import _PRIMITIVE_OPERATION_FUNCTIONS, _primitive_key_kind, get_builtin, make_string
+from cacti.debug import get_logger
+from cacti.infer import specialize_operations
+from cacti.tier import tier_callables
+
+__all__ = [
+    'ConstantFolding', 'PassManager', 'PassTiming',
+    'eliminate_dead_code', 'flatten_blocks', 'fold_constants', 'remove_unused_vals'
+]
+
+# The rewritten tree, the number of operations replaced by their value and
+# the number of literals replaced by an equal, shared one
+ConstantFolding = collections.namedtuple('ConstantFolding', ['node', 'folded', 'interned'])
+
+_LITERAL_TYPE_NAMES = ('Integer', 'Float', 'String')
+
+def _literal(expr):
+    if not isinstance(expr, ValueExpression):
+        return None
+    value = expr.value
+    type_name = getattr(value.typeobj, 'name', None)
+    if type_name in _LITERAL_TYPE_NAMES and value.typeobj is get_builtin(type_name):
+        return value
+    return None
+
+def _is_number(value):
+    return value.typeobj.name != 'String'
+
+# repr() tells 1 from 1.0 and 0.0 from -0.0, which compare equal
+def _intern_key(value):
+    return value.typeobj.name, repr(value.primitive)
+
+class _ConstantFolder:
+    def __init__(self):
+        self.__literals = {}
+        self.folded = 0
+        self.interned = 0
+        
+    def __call__(self, node):
+        node = node.transform_children(self)
+        if isinstance(node, OperationExpression):
+            return self.__fold(node)
+        if isinstance(node, ValueExpression):
+            return self.__intern(node)
+        return node
+        
+    def __intern(self, expr):
+        value = _literal(expr)
+        if value is None:
+            return expr
+        shared = self.__literals.setdefault(_intern_key(value), value)
+        if shared is value:
+            return expr
+        self.interned += 1
+        return self.__value_expression(expr, shared)
+        
+    def __fold(self, expr):
+        if len(expr.operation_expr_params) != 1:
+            return expr
+        left = _literal(expr.operand_expr)
+        right = _literal(expr.operation_expr_params[0])
+        if left is None or right is None:
+            return expr
+        value = self.__evaluate(expr.operation, left, right)
+        if value is None:
+            return expr
+        self.folded += 1
+        return self.__intern(self.__value_expression(expr, value))
+        
+    # The value the builtin hook would return, or None when the operation
+    # must be left to fail or be dispatched at run time
+    def __evaluate(self, operation, left, right):
+        if operation == '==':
+            equal = _primitive_key_kind(left) == _primitive_key_kind(right) and left.primitive == right.primitive
+            return get_builtin('true' if equal else 'false')
+        if operation not in _PRIMITIVE_OPERATION_FUNCTIONS:
+            return None
+        if not _is_number(left) or not _is_number(right):
+            if operation == '+' and not _is_number(left) and not _is_number(right):
+                return make_string(left.primitive + right.primitive)
+            return None
+        try:
+            result = _PRIMITIVE_OPERATION_FUNCTIONS[operation](left.primitive, right.primitive)
+        except ArithmeticError:
+            return None
+        # Boxed in the type of the left operand, as the hooks box it
+        value = get_builtin(left.typeobj.name).hook_table['()']()
+        value.primitive = result
+        return value
+        
+    def __value_expression(self, expr, value):
+        return ValueExpression(value).copy_source(expr)
+
+# Replaces operations between Integer, Float and String literals with their
+# result, as computed by the builtin hooks, and makes equal literals share
+# one object
+def fold_constants(node):
+    folder = _ConstantFolder()
+    node = folder(node)
+    return ConstantFolding(node, folder.folded, folder.interned)
+
+# Applies 'rewrite' to every node of the tree, children first
+def _rewrite_tree(node, rewrite):
+    def visit(child):
+        return rewrite(child.transform_children(visit))
+    return visit(node)
+
+def _walk_tree(node, visit):
+    def walk(child):
+        visit(child)
+        return child.transform_children(walk)
+    walk(node)
+
+# Drops the statements of a block that follow a return
+def eliminate_dead_code(node):
+    removed = 0
+    def rewrite(node):
+        nonlocal removed
+        if not isinstance(node, Block):
+            return node
+        for i, expr in enumerate(node.exprs):
+            if isinstance(expr, ReturnStatement):
+                dead = len(node.exprs) - i - 1
+                if not dead:
+                    break
+                removed += dead
+                return node.rebuild(*node.exprs[:i + 1])
+        return node
+    return _rewrite_tree(node, rewrite), removed
+
+_CALLABLE_DECLARATIONS = (
+        ClosureDeclarationStatement, FunctionDeclarationStatement, MethodDefinitionDeclarationStatement,
+        GetMethodDefinitionStatement, SetMethodDefinitionStatement
+    )
+
+# Splices blocks nested in blocks into them, and evaluates a body of one
+# statement directly, without a Block around it. Loop bodies stay blocks,
+# as their blocks count the steps that execution limits check.
+def flatten_blocks(node):
+    flattened = 0
+    def unwrap_body(body):
+        nonlocal flattened
+        if not isinstance(body, Block) or len(body.exprs) != 1 or body.has_yield:
+            return body
+        flattened += 1
+        expr = body.exprs[0]
+        # The exit flag is of no use to the last statement of a body
+        return expr.value_expr if isinstance(expr, ReturnStatement) else expr
+    
+    def rewrite(node):
+        nonlocal flattened
+        if isinstance(node, _CALLABLE_DECLARATIONS):
+            return node.transform_children(unwrap_body)
+        if isinstance(node, Block) and any(isinstance(e, Block) for e in node.exprs):
+            exprs = []
+            for expr in node.exprs:
+                if isinstance(expr, Block):
+                    flattened += 1
+                    exprs += expr.exprs
+                else:
+                    exprs.append(expr)
+            return node.rebuild(*exprs)
+        return node
+    return _rewrite_tree(node, rewrite), flattened
+
+def _symbols_used(node):
+    symbols = set()
+    def visit(node):
+        if isinstance(node, (ReferenceExpression, AssignmentStatement)):
+            symbols.add(node.symbol)
+        elif isinstance(node, ClassDeclarationStatement):
+            symbols.add(node.superclass_name)
+    _walk_tree(node, visit)
+    return symbols
+
+# Removes 'val' declarations of symbols that no part of the program refers
+# to. An initializer that may have effects, or whose value ends the block,
+# is kept as a statement of its own.
+def remove_unused_vals(node):
+    removed = 0
+    used = _symbols_used(node)
+    def rewrite(node):
+        nonlocal removed
+        if not isinstance(node, Block):
+            return node
+        exprs = []
+        last = len(node.exprs) - 1
+        for i, expr in enumerate(node.exprs):
+            if isinstance(expr, ValDeclarationStatement) and expr.symbol not in used:
+                removed += 1
+                pure = isinstance(expr.init_expr, (ValueExpression, ClosureDeclarationStatement))
+                if pure and i != last:
+                    continue
+                expr = expr.init_expr
+            exprs.append(expr)
+        if len(exprs) == len(node.exprs) and all(map(lambda a, b: a is b, exprs, node.exprs)):
+            return node
+        return node.rebuild(*exprs)
+    return _rewrite_tree(node, rewrite), removed
+
+def _fold_constants_pass(node):
+    result = fold_constants(node)
+    return result.node, result.folded + result.interned
+
+# How long a pass took on its last run and how many nodes it changed
+PassTiming = collections.namedtuple('PassTiming', ['name', 'seconds', 'changes'])
+
+# Runs a pipeline of passes over a parsed program. A pass is a function
+# taking a tree and returning the rewritten tree and its number of changes.
+# Passes can be disabled by name, and for the default pipeline by listing
+# them, separated by commas, in the CACTI_DISABLE_PASSES environment
+# variable.
+class PassManager:
+    DEFAULT_PASSES = (
+            ('fold_constants', _fold_constants_pass),
+            ('eliminate_dead_code', eliminate_dead_code),
+            ('remove_unused_vals', remove_unused_vals),
+            ('specialize_operations', specialize_operations),
+            ('flatten_blocks', flatten_blocks),
+            ('tier_callables', tier_callables)
+        )
+    
+    def __init__(self, passes=()):
+        self.logger = get_logger(self)
+        self.__passes = collections.OrderedDict(passes)
+        self.__disabled = set()
+        self.__timings = []
+        
+    @classmethod
+    def default(cls):
+        manager = cls(cls.DEFAULT_PASSES)
+        for name in os.environ.get('CACTI_DISABLE_PASSES', '').split(','):
+            if name.strip():
+                manager.disable(name.strip())
+        return manager
+        
+    @property
+    def pass_names(self):
+        return list(self.__passes)
+        
+    @property
+    def timings(self):
+        return self.__timings
+        
+    def add_pass(self, name, function):
+        self.__passes[name] = function
+        
+    def __check_name(self, name):
+        if name not in self.__passes:
+            raise ValueError("Unknown pass '{}'".format(name))
+            
+    def disable(self, name):
+        self.__check_name(name)
+        self.__disabled.add(name)
+        
+    def enable(self, name):
+        self.__check_name(name)
+        self.__disabled.discard(name)
+        
+    def is_enabled(self, name):
+        return name not in self.__disabled
+        
+    def run(self, node):
+        self.__timings = []
+        for name, function in self.__passes.items():
+            if name in self.__disabled:
+                continue
+            start = time.perf_counter()
+            node, changes = function(node)
+            timing = PassTiming(name, time.perf_counter() - start, changes)
+            self.__timings.append(timing)
+            self.logger.debug("{}: {} change(s) in {:.6f}s".format(*timing))
+        return node
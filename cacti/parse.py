@@ -2,12 +2,18 @@ from pyparsing import *
 
 ParserElement.enablePackrat()
 
+import contextlib
+import re
+import sys
+import threading
 from functools import reduce
 import cacti.runtime as rntm
 import cacti.lang as lang
 import cacti.builtin as bltn
 import cacti.ast as ast
 import cacti.exceptions as excp
+from cacti.source import SourceBuffer
+from cacti.optimize import PassManager
 
 __all__ = ['parse_file', 'parse_string']
 
@@ -15,6 +21,7 @@ _reserved_keywords_ = [
     'and',
     'block',
     'class', 'closure',
+    'done',
     'else',
     'false', 'for', 'function',
     'get',
@@ -26,7 +33,8 @@ _reserved_keywords_ = [
     'return',
     'self', 'set', 'super',
     'trait', 'true', 'type',
-    'var', 'val'
+    'var', 'val',
+    'yield'
     ]
 
 _operators_ = [
@@ -43,14 +51,25 @@ _operators_ = [
 def _get_source_info(s, loc):
     return '{}:{}: {}'.format(str(lineno(loc, s)), str(col(loc, s)), line(loc, s).strip())
 
+# The buffer of the text being parsed, shared by the nodes parsed from it.
+# The expressions of format strings are parsed with the rest of the text, so
+# their locations are lines and columns of the file too.
+_source_buffer = None
+_source_name = ''
+
 def _add_source_line(s, loc, expr):
-    expr.source = line(loc, s)
+    global _source_buffer
+    if _source_buffer is None or _source_buffer.text is not s:
+        _source_buffer = SourceBuffer(s, _source_name)
+    expr.set_source_location(_source_buffer, loc)
     return expr
 
 def _process_prop_call_expr(operands):
     def list_reduction(a, b):
         if isinstance(b, str):
             return ast.PropertyExpression(a, b)
+        elif len(b) and (b[0] == '['):
+            return ast.OperationExpression(a, '[]', b[1])
         else:
             return ast.OperationExpression(a, '()', *b)
     return reduce(list_reduction, operands)
@@ -75,6 +94,8 @@ open_curl = Literal("{").suppress()
 close_curl = Literal("}").suppress()
 open_paren = Literal("(").suppress()
 close_paren = Literal(")").suppress()
+open_square = Literal("[").suppress()
+close_square = Literal("]").suppress()
 optional_param_names = Group(Optional(delimitedList(object_identifier)))
 def optional_param_names_action(s, loc, toks):
     param_names = list(toks[0])
@@ -88,17 +109,22 @@ optional_param_values = Group(Optional(delimitedList(value)))
 
 keyword_class = Keyword('class').suppress()
 keyword_closure = Keyword('closure').suppress()
+keyword_for = Keyword('for').suppress()
 keyword_function = Keyword('function').suppress()
 keyword_get = Keyword('get').suppress()
+keyword_in = Keyword('in').suppress()
 keyword_method = Keyword('method').suppress()
+keyword_operation = Keyword('operation').suppress()
 keyword_property = Keyword('property').suppress()
 keyword_return = Keyword('return').suppress()
 keyword_set = Keyword('set').suppress()
 keyword_super = Keyword('super')
 keyword_var = Keyword('var').suppress()
 keyword_val = Keyword('val').suppress()
+keyword_yield = Keyword('yield').suppress()
 assignment_operator = Literal("=").suppress()
 call_operator = open_paren + optional_param_values + close_paren
+index_operator = Group(Literal('[') + value + close_square)
 property_operator = Literal('.').suppress() + identifier
 comment = (Literal('#') + restOfLine).suppress()
 statement_end = (LineEnd().suppress() | Literal(";").suppress() | StringEnd().suppress() | comment | FollowedBy(Literal('}')))
@@ -128,6 +154,50 @@ def string_action(s, loc, toks):
     return _add_source_line(s, loc, ast.ValueExpression(bltn.make_string(str(toks.value))))
 string.setParseAction(string_action)
 
+# Backslash escapes as QuotedString reads them
+_ESCAPED_WHITESPACE = {'t': '\t', 'n': '\n', 'f': '\f', 'r': '\r'}
+_BACKSLASH_ESCAPE = re.compile(r'\\(.)')
+_FORMAT_TEXT_ESCAPE = re.compile(r'\\(.)|([{}])\2')
+
+def _unescape(match):
+    if match.group(1) is None:
+        return match.group(2)
+    return _ESCAPED_WHITESPACE.get(match.group(1), match.group(1))
+
+# \"text\" is a string only in the expressions of format strings, so that
+# strings can be written inside them
+escaped_string = Regex(r'\\"((?:[^"\\]|\\[^"])*)\\"')
+def escaped_string_action(s, loc, toks):
+    return _add_source_line(s, loc, ast.ValueExpression(bltn.make_string(_BACKSLASH_ESCAPE.sub(_unescape, toks[0][2:-2]))))
+escaped_string.setParseAction(escaped_string_action)
+
+# f"text {expr} text": '{{' and '}}' are literal braces
+format_text = Regex(r'(?:[^"\\{}]|\\.|\{\{|\}\})+').leaveWhitespace()
+def format_text_action(s, loc, toks):
+    return _FORMAT_TEXT_ESCAPE.sub(_unescape, toks[0])
+format_text.setParseAction(format_text_action)
+
+interpolation_value = Forward()
+format_interpolation = Literal('{').leaveWhitespace().suppress() + interpolation_value + close_curl
+
+# A format string must end where its text and expressions do. This is
+# checked while alternatives are tried too, or backtracking would hide it.
+format_end = Literal('"').leaveWhitespace().suppress() | Empty()
+def format_end_action(s, loc, toks):
+    if not s.startswith('"', loc):
+        raise SyntaxError("Invalid format string: {}".format(_get_source_info(s, loc)))
+format_end.setParseAction(format_end_action, callDuringTry=True)
+
+format_string = Literal('f"').suppress() + ZeroOrMore(format_text | format_interpolation) + format_end
+def format_string_action(s, loc, toks):
+    return _add_source_line(s, loc, ast.FormatExpression(*toks))
+format_string.setParseAction(format_string_action)
+
+list_literal = open_square + Optional(delimitedList(value)) + close_square
+def list_literal_action(s, loc, toks):
+    return _add_source_line(s, loc, ast.ListExpression(*toks))
+list_literal.setParseAction(list_literal_action)
+
 
 
 def binary_operation_action(s, loc, toks):
@@ -136,21 +206,31 @@ def binary_operation_action(s, loc, toks):
     expr = reduce(lambda o1, o2: ast.OperationExpression(o1, operation, o2), operands)
     return _add_source_line(s, loc, expr)
 
+def mixed_binary_operation_action(s, loc, toks):
+    tokens = toks[0]
+    expr = tokens[0]
+    for i in range(1, len(tokens), 2):
+        expr = ast.OperationExpression(expr, tokens[i], tokens[i + 1])
+    return _add_source_line(s, loc, expr)
+
 def call_property_operation_action(s, loc, toks):
     return _add_source_line(s, loc, _process_prop_call_expr(toks[0]))
     
 operators = [
-    ((property_operator ^ call_operator), 1, opAssoc.LEFT, call_property_operation_action),
+    ((property_operator ^ call_operator ^ index_operator), 1, opAssoc.LEFT, call_property_operation_action),
     ('isa', 2, opAssoc.LEFT, binary_operation_action),
     ('*',   2, opAssoc.LEFT, binary_operation_action),
     ('/',   2, opAssoc.LEFT, binary_operation_action),
     ('+',   2, opAssoc.LEFT, binary_operation_action),
-    ('-',   2, opAssoc.LEFT, binary_operation_action)
+    ('-',   2, opAssoc.LEFT, binary_operation_action),
+    ('==',  2, opAssoc.LEFT, binary_operation_action),
+    (oneOf('<<- <<= <--'), 2, opAssoc.LEFT, mixed_binary_operation_action)
 ]
 
-operand = (super | reference | integer | string)
+operand = (super | closure | format_string | reference | integer | string | list_literal)
 
 value <<= (infixNotation(operand, operators) ^ closure ^ function ^ klass)
+interpolation_value <<= (infixNotation(operand | escaped_string, operators) ^ closure ^ function ^ klass)
 
 value_statement = value + statement_end
 
@@ -283,6 +363,17 @@ method.setParseAction(method_action)
 
 method_statment = method + statement_end
 
+hook_name = oneOf('isa hash iter next () [] * / + - *= /= += -= == <<- <<= <--')
+
+hook = keyword_operation + hook_name + \
+                open_paren + optional_param_names + close_paren + \
+                open_curl + callable_block + close_curl
+def hook_action(s, loc, toks):
+    return _add_source_line(s, loc, ast.HookDefinitionDeclarationStatement(toks[0], toks[2], *toks[1]))
+hook.setParseAction(hook_action)
+
+hook_statement = hook + statement_end
+
 klass_val_statement = val_statement.copy()
 def klass_val_statement_action(s, loc, toks):
     return lang.ValDefinition(toks[0], toks[1])
@@ -297,7 +388,7 @@ def klass_var_statement_action(s, loc, toks):
         return lang.VarDefinition(symbol, ast.ReferenceExpression('nothing'))
 klass_var_statement.setParseAction(klass_var_statement_action)
 
-klass_content_statement = (method_statment | klass_val_statement | klass_var_statement | property_statement | comment)
+klass_content_statement = (method_statment | hook_statement | klass_val_statement | klass_var_statement | property_statement | comment)
 
 klass_extend = Optional(Literal(':').suppress() + identifier, default='Object')
 klass <<= keyword_class + object_identifier + klass_extend + open_curl + Group(ZeroOrMore(klass_content_statement)) + close_curl
@@ -306,9 +397,17 @@ def klass_action(s, loc, toks):
 klass.setParseAction(klass_action)
 klass_statement = klass + statement_end
 
+### FOR
+
+for_statement = keyword_for + object_identifier + keyword_in + value + \
+                open_curl + callable_block + close_curl + statement_end
+def for_statement_action(s, loc, toks):
+    return _add_source_line(s, loc, ast.ForStatement(toks[0], toks[1], toks[2]))
+for_statement.setParseAction(for_statement_action)
+
 ### STATEMENT
 
-statement = (val_statement | var_statement | value_statement | assignment_statement | comment)
+statement = (for_statement | val_statement | var_statement | value_statement | assignment_statement | comment)
 
 ### RETURN STATEMENT
 
@@ -322,9 +421,16 @@ def return_statement_action(s, loc, toks):
     return ast.ReturnStatement(value_expr)
 return_statement.setParseAction(return_statement_action)
 
+### YIELD STATEMENT
+
+yield_statement = keyword_yield + value + statement_end
+def yield_statement_action(s, loc, toks):
+    return _add_source_line(s, loc, ast.YieldStatement(toks[0]))
+yield_statement.setParseAction(yield_statement_action)
+
 ### CALLABLE BLOCK
 
-callable_block <<= ZeroOrMore(return_statement | statement)
+callable_block <<= ZeroOrMore(return_statement | yield_statement | statement)
 def callable_block_action(s, loc, tok):
     return ast.Block(*tok)
 callable_block.setParseAction(callable_block_action)
@@ -336,9 +442,40 @@ def block_action(s, loc, tok):
     return ast.Block(*tok)
 block.setParseAction(block_action)
 
-def parse_string(string):
-    return value.parseString(string, parseAll=True)
+# The grammar and its packrat cache are shared by every interpreter.
+# Parse actions create literal objects in the current interpreter, so
+# parses must not interleave.
+_parse_lock = threading.Lock()
+
+# Every precedence level of the expression grammar costs a few Python
+# frames for each level of nested calls and parentheses
+_PARSE_RECURSION_LIMIT = 20000
+
+@contextlib.contextmanager
+def _parsing(name=''):
+    global _source_buffer
+    global _source_name
+    with _parse_lock:
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(recursion_limit, _PARSE_RECURSION_LIMIT))
+        _source_name = name
+        try:
+            yield
+        finally:
+            _source_buffer = None
+            _source_name = ''
+            sys.setrecursionlimit(recursion_limit)
 
-def parse_file(file):
-    return block.parseFile(file, parseAll=True)[0]
+def parse_string(string):
+    with _parsing():
+        return value.parseString(string, parseAll=True)
+
+# Returns the program after running it through the optimization passes of
+# 'pass_manager', by default of PassManager.default()
+def parse_file(file, pass_manager=None):
+    with _parsing(file if isinstance(file, str) else getattr(file, 'name', '')):
+        program = block.parseFile(file, parseAll=True)[0]
+    if pass_manager is None:
+        pass_manager = PassManager.default()
+    return pass_manager.run(program)
 
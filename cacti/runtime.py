@@ -1,27 +1,37 @@
 import re
+import atexit
 import collections
+import contextvars
 import copy
+import io
 import logging
+import sys
+import time
 from cacti.exceptions import *
 from cacti.debug import get_logger
 
 __all__ = [
     # Functions
-    'isvalidhook', 'isvalidsymbol', 'clear_stack', 'peek_stack_frame', 'pop_stack_frame', 'push_stack_frame',
+    'isvalidhook', 'isvalidsymbol', 'clear_stack', 'get_interpreter', 'peek_stack_frame', 'pop_stack_frame',
+    'push_stack_frame',
     
     # Classes
-    'StackFrame', 'Callable', 'ConstantValueHolder', 'PropertyGetValueHolder', 'PropertyGetSetValueHolder',
+    'ExecutionLimits', 'Interpreter', 'OutputSink', 'StackFrame', 'Callable', 'ConstantValueHolder', 'PropertyGetValueHolder', 'PropertyGetSetValueHolder',
     'SymbolTable', 'SymbolTableChain', 'SymbolTableStack', 'ValueHolder',
 ]
 
 class _Call:
+    __slots__ = ()
+    
     def __call__(self, *params):
         return self.call(*params)
     
 class Callable(_Call):
+    __slots__ = ('__params', '__content')
+    
+    logger = get_logger(__name__ + '.Callable')
     
     def __init__(self, content, *params):
-        self.logger = get_logger(self)
         self.__params = params
         self.__content = content
         
@@ -58,17 +68,13 @@ class Callable(_Call):
         self.logger.debug("Returning: {}".format(str(return_value)))
         return return_value
         
-STACK = collections.deque()
-
 __debug_stack = False
 
 def __stack_info(prefix, stack_frame):
     owner = stack_frame.owner
-    global lvl_str
-    global lvl
     #selfobj = stack_frame.symbol_stack['self'] if 'self' in stack_frame.symbol_stack else ''
     #superobj = stack_frame.symbol_stack['super'] if 'super' in stack_frame.symbol_stack else ''
-    print((lvl_str * lvl) + "{} {} {} {} {} SELF: {} SUPER: {}".format(
+    print((lvl_str * len(get_interpreter().stack)) + "{} {} {} {} {} SELF: {} SUPER: {}".format(
         prefix,
         str(id(owner)),
         str(owner),
@@ -79,39 +85,32 @@ def __stack_info(prefix, stack_frame):
         ))
     
 lvl_str = '\t'
-lvl = 0
 
 def clear_stack():
-    global STACK
-    STACK = collections.deque()
+    get_interpreter().clear_stack()
 
 def push_stack_frame(stack_frame):
-    global lvl_str
-    global lvl
+    interpreter = get_interpreter()
     if __debug_stack:
-        __stack_info("::->PUSH({}): ".format(lvl), stack_frame)
-    lvl += 1
-    STACK.appendleft(stack_frame)
+        __stack_info("::->PUSH({}): ".format(len(interpreter.stack)), stack_frame)
+    interpreter.push_stack_frame(stack_frame)
     
 def peek_stack_frame(pos=0):
-    if len(STACK) < (pos + 1):
-        return None
-    stack_frame = STACK[pos]
-    if __debug_stack:
-        __stack_info("::-PEEK({}): ".format(lvl-1), stack_frame)
+    stack_frame = get_interpreter().peek_stack_frame(pos)
+    if __debug_stack and stack_frame:
+        __stack_info("::-PEEK({}): ".format(len(get_interpreter().stack) - 1), stack_frame)
     return stack_frame
     
 def pop_stack_frame():
-    popped = STACK.popleft()
-    global lvl_str
-    global lvl
-    lvl -= 1
+    popped = get_interpreter().pop_stack_frame()
     if __debug_stack:
-        __stack_info("::<-POPPED({}): ".format(lvl), popped)
+        __stack_info("::<-POPPED({}): ".format(len(get_interpreter().stack)), popped)
     return popped
 
 class StackFrame:
-    def __init__(self, owner, name, selfobj=None):
+    __slots__ = ('__owner', '__name', '__selfobj', '__exit_flag', '__symbol_stack')
+    
+    def __init__(self, owner, name, selfobj=None, symbol_stack=None):
         from cacti.builtin import get_builtin_table
         from cacti.lang import ObjectDefinition
         assert isinstance(owner, ObjectDefinition)
@@ -119,9 +118,11 @@ class StackFrame:
         self.__name = name
         self.__selfobj = selfobj
         self.__exit_flag = False
-        self.__symbol_stack = SymbolTableStack()
-        self.__symbol_stack.push(get_builtin_table())
-        self.__symbol_stack.push(SymbolTable())
+        if symbol_stack is None:
+            symbol_stack = SymbolTableStack()
+            symbol_stack.push(get_builtin_table())
+            symbol_stack.push(SymbolTable())
+        self.__symbol_stack = symbol_stack
     
     @property
     def owner(self):
@@ -165,9 +166,11 @@ class StackFrame:
         return "{class_name} {owner_class_name}({id})<{name}>({stack})".format(**kwargs)
 
 class ValueHolder:
+    __slots__ = ('__value',)
+    
+    logger = get_logger(__name__ + '.ValueHolder')
+    
     def __init__(self, value):
-        self.logger = get_logger(self)
-        
         self.__value = value
         
     def get_value(self):
@@ -193,10 +196,12 @@ class ValueHolder:
 
 
 class ConstantValueHolder(ValueHolder):
+    __slots__ = ()
+    
+    logger = get_logger(__name__ + '.ConstantValueHolder')
+    
     def __init__(self, value):
         super().__init__(value)
-        
-        self.logger = get_logger(self)
         self.logger.debug("Create with value: {}".format(value))
     
     def set_value(self, value):
@@ -206,8 +211,11 @@ class ConstantValueHolder(ValueHolder):
     value = property(ValueHolder.get_value, set_value)
 
 class PropertyGetSetValueHolder(ValueHolder):
+    __slots__ = ('__get', '__set')
+    
+    logger = get_logger(__name__ + '.PropertyGetSetValueHolder')
+    
     def __init__(self, getter, setter):
-        self.logger = get_logger(self)
         self.logger.debug('Create')
         
         self.__get = getter
@@ -228,9 +236,12 @@ class PropertyGetSetValueHolder(ValueHolder):
     value = property(get_value, set_value)
 
 class PropertyGetValueHolder(ConstantValueHolder):
+    __slots__ = ('__get',)
+    
+    logger = get_logger(__name__ + '.PropertyGetValueHolder')
+    
     def __init__(self, getter):
         super().__init__(getter)
-        self.logger = get_logger(self)
         self.logger.debug('Create')
         self.__get = getter
     
@@ -247,10 +258,12 @@ class PropertyGetValueHolder(ConstantValueHolder):
 __VALID_SYMBOL_PATTERN__ = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
 
 __HOOKS__ = [
-        r'isa',
+        r'isa', r'hash', r'iter', r'next',
         r'\(\)', r'\[\]', r'\.',
         r'\*', r'\/', r'\+', r'\-',
         r'\*\=', r'\/\=', r'\+\=', r'\-\=',
+        r'\=\=',
+        r'\<\<\-', r'\<\<\=', r'\<\-\-',
     ]
 
 __VALID_HOOK_PATTERN__ =  re.compile(r'^' + r'|'.join(__HOOKS__) + r'$')
@@ -262,9 +275,11 @@ def isvalidhook(symbol):
     return True if isinstance(symbol, str) and __VALID_HOOK_PATTERN__.match(symbol) else False
 
 class SymbolTable:
+    __slots__ = ('__symbol_validator', '__table', '__parent_table')
+    
+    logger = get_logger(__name__ + '.SymbolTable')
+    
     def __init__(self, from_dict={}, parent_table=None, symbol_validator=isvalidsymbol):
-        self.logger = get_logger(self)
-        
         if not isinstance(from_dict, dict):
             raise TypeError("from_map must be a 'dict'")
         
@@ -343,9 +358,11 @@ class SymbolTable:
 
 
 class SymbolTableChain:
+    __slots__ = ('__chain',)
+    
+    logger = get_logger(__name__ + '.SymbolTableChain')
+    
     def __init__(self, *context_chain):
-        self.logger = get_logger(self)
-        
         for t in context_chain:
             if not isinstance(t, SymbolTable) and not isinstance(t, SymbolTableChain):
                 raise TypeError("All elements in the chain must be a 'SymbolTable'")
@@ -392,33 +409,35 @@ class SymbolTableChain:
         return str(self)
             
 
+# The tables are kept in a list, bottom first: a deque allocates a whole
+# block for even a single table
 class SymbolTableStack:
+    __slots__ = ('__stack',)
+    
+    logger = get_logger(__name__ + '.SymbolTableStack')
+    
     def __init__(self, *symbol_tables):
-        self.logger = get_logger(self)
-        self.__stack = collections.deque()
-        
-        for s in symbol_tables:
-            self.push(s)
+        self.__stack = list(symbol_tables)
         
     def push(self, table):
-        self.__stack.appendleft(table)
+        self.__stack.append(table)
         
     def peek(self):
-        return self.__stack[0]
+        return self.__stack[-1]
         
     def pop(self):
-        return self.__stack.popleft()
+        return self.__stack.pop()
     
+    # A new stack over the same tables, so that pushes and pops on one do
+    # not affect the other
+    def fork(self):
+        return self.__class__(*self.__stack)
+        
     def __copy__(self):
-        inst_copy =  self.__class__()
-        stack_copy = collections.deque()
-        for s in self.__stack:
-            stack_copy.append(copy.copy(s))
-        inst_copy.__stack = stack_copy
-        return inst_copy
+        return self.__class__(*[copy.copy(s) for s in self.__stack])
         
     def __contains__(self, symbol_name):
-        for table in self.__stack:
+        for table in reversed(self.__stack):
             if symbol_name in table:
                 return True
             
@@ -426,7 +445,7 @@ class SymbolTableStack:
         
     def __getitem__(self, symbol_name):
         self.logger.debug("Searching stack for symbol '{}'".format(symbol_name))
-        for table in self.__stack:
+        for table in reversed(self.__stack):
             if symbol_name in table:
                 return_value = table[symbol_name]
                 self.logger.debug("For symbol '{}' in stack found: '{}'".format(symbol_name, str(return_value)))
@@ -435,7 +454,7 @@ class SymbolTableStack:
         raise SymbolUnknownError(symbol_name)
     
     def __setitem__(self, symbol_name, symbol_value):
-        for table in self.__stack:
+        for table in reversed(self.__stack):
             if symbol_name in table:
                 self.logger.debug("Set symbol '{}' in stack to: '{}'".format(symbol_name, str(symbol_value)))
                 table[symbol_name] = symbol_value
@@ -447,7 +466,257 @@ class SymbolTableStack:
         return str(self)
     
     def __str__(self):
-        return self.__class__.__name__ + "(" + str(self.__stack) + ")"
+        return self.__class__.__name__ + "(" + str(self.__stack[::-1]) + ")"
         
     def to_string(self):
         return str(self)
+
+# Collects program output and writes it to the destination stream in blocks
+# of at least 'buffer_size' characters, on flush() and when the interpreter
+# that owns it is exited. Without a stream it writes to whatever sys.stdout
+# is at the time of the flush.
+class OutputSink:
+    DEFAULT_BUFFER_SIZE = 8192
+    
+    def __init__(self, stream=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.__stream = stream
+        self.__buffer_size = buffer_size
+        self.__pieces = []
+        self.__size = 0
+        self.__closed = False
+        
+    # Output kept in memory, read back with getvalue()
+    @classmethod
+    def to_memory(cls):
+        return cls(io.StringIO(), buffer_size=0)
+        
+    @classmethod
+    def to_file(cls, file_name, buffer_size=DEFAULT_BUFFER_SIZE):
+        return cls(open(file_name, 'w', encoding='utf-8'), buffer_size)
+        
+    @classmethod
+    def to_socket(cls, sock, buffer_size=DEFAULT_BUFFER_SIZE):
+        return cls(sock.makefile('w', encoding='utf-8', newline=''), buffer_size)
+        
+    @property
+    def stream(self):
+        return self.__stream if self.__stream is not None else sys.stdout
+        
+    @property
+    def buffer_size(self):
+        return self.__buffer_size
+        
+    def write(self, text):
+        self.__pieces.append(text)
+        self.__size += len(text)
+        if self.__size >= self.__buffer_size:
+            self.flush()
+            
+    # Does nothing once the sink is closed
+    def flush(self):
+        if self.__closed:
+            return
+        if self.__pieces:
+            text = ''.join(self.__pieces)
+            self.__pieces = []
+            self.__size = 0
+            self.stream.write(text)
+        self.stream.flush()
+        
+    # Only for sinks writing to a StringIO, such as those made by to_memory()
+    def getvalue(self):
+        if not isinstance(self.stream, io.StringIO):
+            raise TypeError("getvalue() requires an OutputSink writing to memory")
+        self.flush()
+        return self.stream.getvalue()
+        
+    def close(self):
+        self.flush()
+        self.__closed = True
+        if self.__stream is not None:
+            self.__stream.close()
+
+# Owns the call stack and the builtin world of one running program
+class Interpreter:
+    def __init__(self):
+        self.__stack = collections.deque()
+        self.__types = SymbolTable()
+        self.__builtins = SymbolTable()
+        self.__post_bootstrap_objects = []
+        self.__method_superobj = None
+        self.__context_tokens = []
+        self.__steps = 0
+        self.__step_hooks = []
+        self.__objects_allocated = 0
+        self.__bytes_allocated = 0
+        self.__output = OutputSink()
+        
+    @property
+    def stack(self):
+        return self.__stack
+        
+    @property
+    def types(self):
+        return self.__types
+        
+    @property
+    def builtins(self):
+        return self.__builtins
+        
+    @property
+    def post_bootstrap_objects(self):
+        return self.__post_bootstrap_objects
+        
+    @property
+    def method_superobj(self):
+        return self.__method_superobj
+        
+    def set_method_superobj(self, superobj):
+        self.__method_superobj = superobj
+        
+    @property
+    def steps(self):
+        return self.__steps
+        
+    @property
+    def objects_allocated(self):
+        return self.__objects_allocated
+        
+    @property
+    def bytes_allocated(self):
+        return self.__bytes_allocated
+        
+    @property
+    def output(self):
+        return self.__output
+        
+    # Flushes the current sink before replacing it
+    def set_output(self, output):
+        self.__output.flush()
+        self.__output = output
+        
+    def count_object(self):
+        self.__objects_allocated += 1
+        
+    def count_bytes(self, nbytes):
+        self.__bytes_allocated += nbytes
+        
+    def add_step_hook(self, hook):
+        self.__step_hooks.append(hook)
+        
+    def remove_step_hook(self, hook):
+        self.__step_hooks.remove(hook)
+        
+    # Counted for every statement of a Block and every pushed stack frame
+    def step(self):
+        self.__steps += 1
+        for hook in self.__step_hooks:
+            hook(self)
+        
+    def clear_stack(self):
+        self.__stack = collections.deque()
+        
+    def push_stack_frame(self, stack_frame):
+        self.__stack.appendleft(stack_frame)
+        self.step()
+        
+    def peek_stack_frame(self, pos=0):
+        if len(self.__stack) < (pos + 1):
+            return None
+        return self.__stack[pos]
+        
+    def pop_stack_frame(self):
+        return self.__stack.popleft()
+        
+    def __enter__(self):
+        self.__context_tokens.append(_CURRENT_INTERPRETER.set(self))
+        return self
+        
+    def __exit__(self, exc_type, exc_value, traceback):
+        _CURRENT_INTERPRETER.reset(self.__context_tokens.pop())
+        self.__output.flush()
+        return False
+        
+    def __repr__(self):
+        return str(self)
+        
+    def __str__(self):
+        return "{}({})".format(self.__class__.__name__, id(self))
+
+# Step hook enforcing resource limits on an interpreter. Objects and bytes
+# are counted when allocated rather than while live, which keeps the
+# checks to a few comparisons per step. The clock is only read every
+# DEADLINE_CHECK_INTERVAL steps.
+class ExecutionLimits:
+    DEADLINE_CHECK_INTERVAL = 256
+    
+    def __init__(self, *, max_steps=None, max_depth=None, max_objects=None, max_bytes=None, timeout=None):
+        self.__max_steps = max_steps
+        self.__max_depth = max_depth
+        self.__max_objects = max_objects
+        self.__max_bytes = max_bytes
+        self.__timeout = timeout
+        self.__interpreter = None
+        
+    @property
+    def max_steps(self):
+        return self.__max_steps
+        
+    @property
+    def max_depth(self):
+        return self.__max_depth
+        
+    @property
+    def max_objects(self):
+        return self.__max_objects
+        
+    @property
+    def max_bytes(self):
+        return self.__max_bytes
+        
+    @property
+    def timeout(self):
+        return self.__timeout
+        
+    def attach(self, interpreter):
+        self.__interpreter = interpreter
+        self.__start_steps = interpreter.steps
+        self.__start_objects = interpreter.objects_allocated
+        self.__start_bytes = interpreter.bytes_allocated
+        self.__deadline = None if self.__timeout is None else time.monotonic() + self.__timeout
+        interpreter.add_step_hook(self)
+        return self
+        
+    def detach(self):
+        self.__interpreter.remove_step_hook(self)
+        self.__interpreter = None
+        
+    def __call__(self, interpreter):
+        steps = interpreter.steps - self.__start_steps
+        if self.__max_steps is not None and steps > self.__max_steps:
+            raise LimitExceededError('Step', steps, self.__max_steps)
+        if self.__max_depth is not None and len(interpreter.stack) > self.__max_depth:
+            raise LimitExceededError('Stack depth', len(interpreter.stack), self.__max_depth)
+        if self.__max_objects is not None:
+            objects = interpreter.objects_allocated - self.__start_objects
+            if objects > self.__max_objects:
+                raise LimitExceededError('Object', objects, self.__max_objects)
+        if self.__max_bytes is not None:
+            nbytes = interpreter.bytes_allocated - self.__start_bytes
+            if nbytes > self.__max_bytes:
+                raise LimitExceededError('Memory', nbytes, self.__max_bytes)
+        if self.__deadline is not None and 0 == (steps % self.DEADLINE_CHECK_INTERVAL):
+            now = time.monotonic()
+            if now > self.__deadline:
+                elapsed = now - self.__deadline + self.__timeout
+                raise LimitExceededError('Time', "{:.3f}s".format(elapsed), "{}s".format(self.__timeout))
+
+# Used whenever no interpreter has been entered in the current context,
+# which keeps the single program per process usage working unchanged.
+_DEFAULT_INTERPRETER = Interpreter()
+atexit.register(lambda: _DEFAULT_INTERPRETER.output.flush())
+
+_CURRENT_INTERPRETER = contextvars.ContextVar('cacti_interpreter', default=_DEFAULT_INTERPRETER)
+
+def get_interpreter():
+    return _CURRENT_INTERPRETER.get()
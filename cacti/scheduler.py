@@ -0,0 +1,195 @@
+import collections
+import math
+import threading
+import time
+from cacti.runtime import *
+from cacti.builtin import initialize_builtins, make_main
+from cacti.exceptions import TaskCancelledError
+
+__all__ = ['Scheduler', 'Task', 'percentile']
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+# A cacti program multiplexed by a Scheduler. The evaluator is recursive,
+# so a suspended program keeps its Python stack on a parked thread; the
+# scheduler hands control to exactly one task at a time, and a task only
+# gives it back every 'quantum' evaluation steps. A task holds its thread
+# from its first slice until it ends or is cancelled.
+class Task:
+    def __init__(self, name, program, quantum, interpreter):
+        self.__name = name
+        self.__program = program
+        self.__quantum = quantum
+        self.__remaining = quantum
+        self.__interpreter = interpreter
+        self.__resume = threading.Semaphore(0)
+        self.__scheduler_resume = None
+        self.__thread = None
+        self.__cancelled = False
+        self.__done = False
+        self.__error = None
+        self.__result = None
+        self.__slices = 0
+        self.__ready_since = None
+        self.__created = time.perf_counter()
+        self.__finished = None
+        self.__latencies = []
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def interpreter(self):
+        return self.__interpreter
+
+    @property
+    def done(self):
+        return self.__done
+
+    @property
+    def error(self):
+        return self.__error
+
+    @property
+    def result(self):
+        return self.__result
+
+    @property
+    def slices(self):
+        return self.__slices
+
+    # Time spent ready but waiting for a slice, one entry per slice
+    @property
+    def latencies(self):
+        return self.__latencies
+
+    @property
+    def turnaround(self):
+        if self.__finished is None:
+            return None
+        return self.__finished - self.__created
+
+    def latency_percentiles(self, percentiles=(50, 90, 99)):
+        return {p: percentile(self.__latencies, p) for p in percentiles}
+
+    def _mark_ready(self):
+        self.__ready_since = time.perf_counter()
+
+    def _run_slice(self, scheduler_resume):
+        self.__latencies.append(time.perf_counter() - self.__ready_since)
+        self.__slices += 1
+        self.__scheduler_resume = scheduler_resume
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, name='cacti-task-' + self.__name, daemon=True)
+            self.__thread.start()
+        else:
+            self.__resume.release()
+        scheduler_resume.acquire()
+
+    # Ends the task. A parked task is resumed to raise TaskCancelledError
+    # from its step hook, and its thread joined.
+    def _cancel(self):
+        if self.__done:
+            return
+        self.__cancelled = True
+        if self.__thread is None:
+            self.__error = TaskCancelledError(self.__name)
+            self.__done = True
+            self.__finished = time.perf_counter()
+        else:
+            self.__resume.release()
+            self.__thread.join()
+
+    def __step_hook(self, interpreter):
+        self.__remaining -= 1
+        if self.__remaining <= 0:
+            self.__remaining = self.__quantum
+            self.__scheduler_resume.release()
+            self.__resume.acquire()
+            if self.__cancelled:
+                raise TaskCancelledError(self.__name)
+
+    def __run(self):
+        try:
+            with self.__interpreter:
+                mainobj = make_main()
+                push_stack_frame(StackFrame(mainobj, mainobj.name))
+                self.__interpreter.add_step_hook(self.__step_hook)
+                self.__result = self.__program()
+        except Exception as err:
+            self.__error = err
+        finally:
+            self.__done = True
+            self.__finished = time.perf_counter()
+            self.__scheduler_resume.release()
+
+# Cancels the tasks left unfinished when it is closed, and when run() is
+# left by an error, so that no thread stays parked
+class Scheduler:
+    def __init__(self, quantum=1000):
+        self.__quantum = quantum
+        self.__tasks = []
+        self.__ready = collections.deque()
+
+    @property
+    def tasks(self):
+        return self.__tasks
+
+    # 'program' is called inside the task's interpreter with the main stack
+    # frame already pushed. Anything holding a lock shared between tasks
+    # (such as parsing) must happen before, as a task may yield at any step.
+    def spawn(self, program, name=None, interpreter=None):
+        if name is None:
+            name = str(len(self.__tasks))
+        if interpreter is None:
+            interpreter = Interpreter()
+            with interpreter:
+                initialize_builtins()
+        task = Task(name, program, self.__quantum, interpreter)
+        task._mark_ready()
+        self.__tasks.append(task)
+        self.__ready.append(task)
+        return task
+
+    def spawn_file(self, file_name, name=None):
+        from cacti.parse import parse_file
+        interpreter = Interpreter()
+        with interpreter:
+            initialize_builtins()
+            block = parse_file(file_name)
+        return self.spawn(block, file_name if name is None else name, interpreter)
+
+    def run(self):
+        scheduler_resume = threading.Semaphore(0)
+        try:
+            while self.__ready:
+                task = self.__ready.popleft()
+                task._run_slice(scheduler_resume)
+                if not task.done:
+                    task._mark_ready()
+                    self.__ready.append(task)
+        except BaseException:
+            self.close()
+            raise
+        return self.__tasks
+
+    def close(self):
+        self.__ready.clear()
+        for task in self.__tasks:
+            task._cancel()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def latency_percentiles(self, percentiles=(50, 90, 99)):
+        return {task.name: task.latency_percentiles(percentiles) for task in self.__tasks}
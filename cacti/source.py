@@ -0,0 +1,67 @@
+__all__ = ['SourceBuffer', 'SourceLocation']
+
+# The text of a parsed file or string. The nodes parsed from it share it
+# and keep only the offset where they start; lines and columns are worked
+# out from the offset when they are asked for.
+class SourceBuffer:
+    __slots__ = ('__text', '__name')
+
+    def __init__(self, text, name=''):
+        self.__text = text
+        self.__name = name
+
+    @property
+    def text(self):
+        return self.__text
+
+    @property
+    def name(self):
+        return self.__name
+
+    # The line containing 'offset', without its line break, as
+    # pyparsing.line() gives it
+    def line(self, offset):
+        text = self.__text
+        start = text.rfind('\n', 0, offset) + 1
+        end = text.find('\n', offset)
+        return text[start:] if end < 0 else text[start:end]
+
+    def lineno(self, offset):
+        return self.__text.count('\n', 0, offset) + 1
+
+    def column(self, offset):
+        return offset - self.__text.rfind('\n', 0, offset)
+
+# An offset into a SourceBuffer, made when a location is asked for
+class SourceLocation:
+    __slots__ = ('__buffer', '__offset')
+
+    def __init__(self, buffer, offset):
+        self.__buffer = buffer
+        self.__offset = offset
+
+    @property
+    def buffer(self):
+        return self.__buffer
+
+    @property
+    def offset(self):
+        return self.__offset
+
+    @property
+    def line(self):
+        return self.__buffer.line(self.__offset)
+
+    @property
+    def lineno(self):
+        return self.__buffer.lineno(self.__offset)
+
+    @property
+    def column(self):
+        return self.__buffer.column(self.__offset)
+
+    def __str__(self):
+        return "{}:{}:{}".format(self.__buffer.name or '<string>', self.lineno, self.column)
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, str(self))
@@ -0,0 +1,87 @@
+from cacti.ast import GeneratorBody, PropertyFieldDeclaration
+from cacti.ast import _LoopValueHolder, _fatal_error
+from cacti.runtime import *
+from cacti.lang import Closure, Function, MethodDefinition, PropertyDefinition, ValDefinition, VarDefinition
+from cacti.exceptions import ExecutionError
+from cacti.builtin import (
+        get_builtin, initialize_builtins, iterate, make_class, make_float, make_integer, make_list, make_main, make_string,
+        primitive_operation_function
+    )
+from cacti.codegen import get_property, hook_call
+from cacti.debug import configure_logging
+
+# The names the modules written by 'cacti compile' import: the names of
+# codegen.RUNTIME_NAMES and the helpers for the nodes evaluated there
+__all__ = [
+    'Closure', 'CompiledGeneratorBody', 'ConstantValueHolder', 'ExecutionError', 'LoopValueHolder', 'MethodDefinition',
+    'PropertyDefinition', 'SymbolTable', 'ValDefinition', 'ValueHolder', 'VarDefinition',
+    'declare_class', 'declare_function', 'fatal_error', 'get_builtin', 'get_interpreter', 'get_property', 'hook_call',
+    'iterate', 'make_float', 'make_integer', 'make_list', 'make_string', 'primitive_operation', 'property_field',
+    'run_module'
+]
+
+LoopValueHolder = _LoopValueHolder
+fatal_error = _fatal_error
+
+# The content of a callable whose body yields, written as a Python
+# generator function
+class CompiledGeneratorBody(GeneratorBody):
+    __slots__ = ()
+
+    def steps(self):
+        return self.block()
+
+# As FunctionDeclarationStatement.eval()
+def declare_function(name, content, *params):
+    function = Function(name, content, *params)
+    if name:
+        table = peek_stack_frame().symbol_stack.peek()
+        table.add_symbol(name, ConstantValueHolder(function))
+    return function
+
+# As ClassDeclarationStatement.eval(), with the parts already made into
+# definitions
+def declare_class(name, superclass_name, *, hooks=(), methods=(), properties=(), vals=(), vars=()):
+    klass = make_class(name, superclass_name)
+    for hook_def in hooks:
+        klass.add_hook_definition(hook_def)
+    for method_def in methods:
+        klass.add_method_definition(method_def)
+    for prop_def in properties:
+        klass.add_property_definition(prop_def)
+    for val_def in vals:
+        klass.add_val_definition(val_def)
+    for var_def in vars:
+        klass.add_var_definition(var_def)
+    table = peek_stack_frame().symbol_stack.peek()
+    table.add_symbol(name, ConstantValueHolder(klass))
+    return klass
+
+def property_field(property_name, field_name):
+    return PropertyFieldDeclaration(property_name, field_name).eval()
+
+# As PrimitiveOperationExpression.eval(), for the builtins of the current
+# interpreter
+def primitive_operation(operand_type_name, operation, param_type_name):
+    function = primitive_operation_function(operand_type_name, operation, param_type_name)
+    operand_type = get_builtin(operand_type_name)
+    param_type = get_builtin(param_type_name)
+    def operate(target, param):
+        if target.typeobj is operand_type and param.typeobj is param_type:
+            return function(target, param)
+        return target.hook_table[operation].call(param)
+    return operate
+
+# Runs a compiled program as main.run_file() runs a parsed one: 'load'
+# creates its literals once the builtins exist and 'main' evaluates it on
+# the main stack frame
+def run_module(load, main, limits=None):
+    configure_logging()
+    with Interpreter() as interpreter:
+        initialize_builtins()
+        mainobj = make_main()
+        push_stack_frame(StackFrame(mainobj, mainobj.name))
+        load()
+        if limits:
+            limits.attach(interpreter)
+        main()
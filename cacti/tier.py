@@ -0,0 +1,278 @@
+import collections
+import os
+import weakref
+from cacti.ast import *
+from cacti.ast import Evaluable
+from cacti.runtime import *
+from cacti.builtin import primitive_operation_function
+from cacti.codegen import RUNTIME_NAMES, CodeWriter
+from cacti.debug import get_logger
+
+__all__ = ['TierStats', 'TieredBody', 'tier_callables', 'tier_stats']
+
+# How a callable body has been executed: the calls and loop iterations
+# counted, the times it was compiled with the types seen and the times a
+# guard failed and sent it back to the generic evaluator
+TierStats = collections.namedtuple('TierStats', ['name', 'calls', 'iterations', 'promotions', 'deopts', 'compiled'])
+
+# Every body that can be promoted, for tier_stats()
+_tiered_bodies = weakref.WeakSet()
+
+# The body of a function, method or closure. Its calls and the iterations
+# of its loops are counted, and while it is cold it is evaluated with the
+# operand types of its operations recorded. Once it is hot it is compiled
+# to a Python function that applies the builtin operations directly where
+# a single pair of builtin types was seen. If other types show up there,
+# the operation goes through the hook and the body is deoptimized: it is
+# evaluated generically again, and recompiled when it gets hot again,
+# until it has been deoptimized 'max_deopts' times.
+class TieredBody(Evaluable):
+    __slots__ = (
+            '__body', '__name', '__feedback', '__profiled', '__compiled',
+            '__calls', '__iterations', '__heat', '__promotions', '__deopts', '__weakref__'
+        )
+
+    logger = get_logger(__name__ + '.TieredBody')
+    threshold = int(os.environ.get('CACTI_TIER_THRESHOLD', 100))
+    max_deopts = 4
+
+    def __init__(self, body, name):
+        self.__body = body
+        self.__name = name
+        self.__feedback = collections.defaultdict(set)
+        self.__profiled = _Profiler(self, self.__feedback)(body)
+        self.__compiled = None
+        self.__calls = 0
+        self.__iterations = 0
+        self.__heat = 0
+        self.__promotions = 0
+        self.__deopts = 0
+        _tiered_bodies.add(self)
+
+    @property
+    def body(self):
+        return self.__body
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def may_exit(self):
+        return self.__body.may_exit
+
+    @property
+    def stats(self):
+        return TierStats(self.__name, self.__calls, self.__iterations, self.__promotions, self.__deopts, self.__compiled is not None)
+
+    def count_iterations(self, iterations):
+        self.__iterations += iterations
+        self.__heat += iterations
+
+    def eval(self):
+        self.__calls += 1
+        compiled = self.__compiled
+        if compiled is None:
+            self.__heat += 1
+            if self.__heat < self.threshold or self.__deopts >= self.max_deopts:
+                return self.__profiled()
+            compiled = self.__promote()
+        return compiled()
+
+    def __promote(self):
+        self.__compiled = _BodyCompiler(self, self.__feedback).compile(self.__body)
+        self.__promotions += 1
+        self.logger.debug("Promoted {} after {} call(s) and {} iteration(s)".format(self.__name, self.__calls, self.__iterations))
+        return self.__compiled
+
+    # Called by a guard that failed on operands of other types: they are
+    # recorded so that the operation stays generic once recompiled
+    def deoptimize(self, expr, types):
+        self.__feedback[expr].add(types)
+        if self.__compiled is None:
+            return
+        self.__compiled = None
+        self.__heat = 0
+        self.__deopts += 1
+        self.logger.debug("Deoptimized {}: {} on {}".format(self.__name, expr.operation, [t.name for t in types]))
+
+    def transform_children(self, transform):
+        body = transform(self.__body)
+        if body is self.__body:
+            return self
+        return self.rebuild(body, self.__name)
+
+    def __repr__(self):
+        return "{}({}, {})".format(self.__class__.__name__, repr(self.__body), repr(self.__name))
+
+_OPAQUE_NODES = (
+        TieredBody, ClassDeclarationStatement, ClosureDeclarationStatement, FunctionDeclarationStatement,
+        MethodDefinitionDeclarationStatement, GetMethodDefinitionStatement, SetMethodDefinitionStatement
+    )
+
+def _is_binary_operation(expr):
+    return isinstance(expr, OperationExpression) and expr.operation != '()' and len(expr.operation_expr_params) == 1
+
+class _ProfiledOperation(Evaluable):
+    __slots__ = ('__expr', '__operand_expr', '__param_expr', '__feedback')
+
+    def __init__(self, expr, operand_expr, param_expr, feedback):
+        self.__expr = expr
+        self.__operand_expr = operand_expr
+        self.__param_expr = param_expr
+        self.__feedback = feedback[expr]
+        self.copy_source(expr)
+
+    def eval(self):
+        target = self.__operand_expr()
+        param = self.__param_expr()
+        self.__feedback.add((target.typeobj, param.typeobj))
+        return target.hook_table[self.__expr.operation].call(param)
+
+class _ProfiledProperty(Evaluable):
+    __slots__ = ('__expr', '__obj_expr', '__feedback')
+
+    def __init__(self, expr, obj_expr, feedback):
+        self.__expr = expr
+        self.__obj_expr = obj_expr
+        self.__feedback = feedback[expr]
+        self.copy_source(expr)
+
+    def eval(self):
+        value = self.__obj_expr()
+        for p in self.__expr.prop_names:
+            self.__feedback.add(value.typeobj)
+            value = value[p]
+        return value
+
+# A loop body counting its iterations for the body it belongs to
+class _CountedBody(Evaluable):
+    __slots__ = ('__body', '__tiered')
+
+    def __init__(self, body, tiered):
+        self.__body = body
+        self.__tiered = tiered
+
+    @property
+    def has_yield(self):
+        return self.__body.has_yield
+
+    @property
+    def may_exit(self):
+        return self.__body.may_exit
+
+    def eval(self):
+        self.__tiered.count_iterations(1)
+        return self.__body()
+
+# Builds the tree evaluated while a body is cold. The bodies of callables
+# declared in it are left alone, as they are tiered on their own.
+class _Profiler:
+    def __init__(self, tiered, feedback):
+        self.__tiered = tiered
+        self.__feedback = feedback
+
+    def __call__(self, node):
+        if isinstance(node, _OPAQUE_NODES):
+            return node
+        if _is_binary_operation(node):
+            return _ProfiledOperation(node, self(node.operand_expr), self(node.operation_expr_params[0]), self.__feedback)
+        if isinstance(node, PropertyExpression):
+            return _ProfiledProperty(node, self(node.obj_expr), self.__feedback)
+        node = node.transform_children(self)
+        if isinstance(node, ForStatement):
+            return node.rebuild(node.symbol, node.iterable_expr, _CountedBody(node.body, self.__tiered))
+        return node
+
+# A guarded operation of compiled code, for a single pair of operand types
+def _specialized_operation(tiered, expr, left_type, right_type, function):
+    operation = expr.operation
+    def specialized(left, right):
+        if left.typeobj is left_type and right.typeobj is right_type:
+            return function(left, right)
+        tiered.deoptimize(expr, (left.typeobj, right.typeobj))
+        return left.hook_table[operation].call(right)
+    return specialized
+
+def _builtin_type_name(typeobj):
+    name = getattr(typeobj, 'name', None)
+    builtins = get_interpreter().builtins
+    if name and name in builtins and builtins[name] is typeobj:
+        return name
+    return None
+
+# Compiles a body to a Python function. Statements and expressions the
+# CodeWriter has no code for are called as nodes.
+class _BodyCompiler(CodeWriter):
+    iteration_counter = 'tiered'
+
+    def __init__(self, tiered, feedback):
+        super().__init__()
+        self.__tiered = tiered
+        self.__feedback = feedback
+        self.__namespace = dict(RUNTIME_NAMES, tiered=tiered)
+
+    def __constant(self, value):
+        name = 'k{}'.format(len(self.__namespace))
+        self.__namespace[name] = value
+        return name
+
+    def compile(self, body):
+        self.function('compiled', body)
+        exec(self.source, self.__namespace)
+        return self.__namespace['compiled']
+
+    def value(self, value):
+        return self.__constant(value)
+
+    def node(self, expr):
+        return '{}()'.format(self.__constant(expr))
+
+    def operation(self, expr, operands):
+        specialized = self.__specialized_operation(expr) if _is_binary_operation(expr) else None
+        if specialized:
+            return '{}({})'.format(self.__constant(specialized), ', '.join(operands))
+        return super().operation(expr, operands)
+
+    def __specialized_operation(self, expr):
+        types = self.__feedback.get(expr)
+        if not types or len(types) != 1:
+            return None
+        left_type, right_type = next(iter(types))
+        left_name = _builtin_type_name(left_type)
+        right_name = _builtin_type_name(right_type)
+        function = primitive_operation_function(left_name, expr.operation, right_name)
+        if function is None:
+            return None
+        return _specialized_operation(self.__tiered, expr, left_type, right_type, function)
+
+def _signature(name, params):
+    return '{}({})'.format(name, ', '.join(params))
+
+# Makes the bodies of the functions, methods and closures of a program
+# TieredBody nodes. Generator bodies are left generic.
+def tier_callables(node):
+    tiered = 0
+    def tier_body(body, name):
+        nonlocal tiered
+        if isinstance(body, TieredBody) or body.has_yield:
+            return body
+        tiered += 1
+        return TieredBody(body, name)
+
+    def rewrite(node):
+        if isinstance(node, FunctionDeclarationStatement):
+            return node.transform_children(lambda b: tier_body(b, _signature(node.name or 'function', node.params)))
+        if isinstance(node, ClosureDeclarationStatement):
+            return node.transform_children(lambda b: tier_body(b, _signature('closure', node.params)))
+        if isinstance(node, MethodDefinitionDeclarationStatement):
+            return node.transform_children(lambda b: tier_body(b, _signature(node.name, node.params)))
+        return node
+
+    def visit(child):
+        return rewrite(child.transform_children(visit))
+    return visit(node), tiered
+
+# The state of every body that can be promoted and has been called
+def tier_stats():
+    return [body.stats for body in list(_tiered_bodies) if body.stats.calls]
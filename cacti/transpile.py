@@ -0,0 +1,187 @@
+import argparse
+import os
+import py_compile
+import sys
+from cacti.ast import *
+from cacti.lang import ValDefinition, VarDefinition
+from cacti.runtime import *
+from cacti.builtin import get_builtin, initialize_builtins
+from cacti.codegen import CodeWriter
+from cacti.optimize import PassManager
+
+__all__ = ['compile_file', 'main', 'transpile']
+
+_CONSTANT_NAMES = ('true', 'false', 'nothing')
+
+_LITERAL_FACTORIES = {'Integer': 'make_integer', 'Float': 'make_float', 'String': 'make_string'}
+
+# The source of an expression making a literal value again, or None for a
+# value that cannot be written as source
+def _literal_source(value):
+    type_name = getattr(value.typeobj, 'name', None)
+    if type_name not in _LITERAL_FACTORIES or value.typeobj is not get_builtin(type_name):
+        return None
+    primitive = value.primitive
+    if type_name == 'Float':
+        # repr() of an infinity or NaN is not a Python literal
+        primitive = "float('{}')".format(repr(primitive))
+    else:
+        primitive = repr(primitive)
+    return '{}({})'.format(_LITERAL_FACTORIES[type_name], primitive)
+
+# Writes the functions of one body of a program
+class _FunctionWriter(CodeWriter):
+    def __init__(self, module):
+        super().__init__()
+        self.__module = module
+
+    def value(self, value):
+        return self.__module.literal(value)
+
+    def operation(self, expr, operands):
+        if isinstance(expr, PrimitiveOperationExpression):
+            return '{}({})'.format(self.__module.primitive_operation(expr), ', '.join(operands))
+        return super().operation(expr, operands)
+
+    def node(self, expr):
+        module = self.__module
+        if isinstance(expr, ListExpression):
+            return 'make_list([{}])'.format(', '.join(map(self.expression, expr.item_exprs)))
+        if isinstance(expr, FormatExpression):
+            parts = [repr(p) if isinstance(p, str) else '{}.to_string()'.format(self.expression(p)) for p in expr.parts]
+            return "make_string(''.join([{}]))".format(', '.join(parts))
+        if isinstance(expr, ClosureDeclarationStatement):
+            return 'Closure({})'.format(', '.join(['frame', module.content(expr.block, 'closure')] + list(map(repr, expr.params))))
+        if isinstance(expr, FunctionDeclarationStatement):
+            content = module.content(expr.block, 'function_' + (expr.name or 'anonymous'))
+            return 'declare_function({})'.format(', '.join([repr(expr.name), content] + list(map(repr, expr.params))))
+        if isinstance(expr, ClassDeclarationStatement):
+            return module.class_declaration(expr)
+        raise ValueError("Cannot compile {}".format(expr.__class__.__name__))
+
+# Writes a program as a Python module: its literals are made by 'load()',
+# once the builtins exist, its callable bodies become Python functions and
+# the program itself the function 'main()'
+class _ModuleWriter:
+    def __init__(self):
+        self.__literals = {}
+        self.__globals = []
+        self.__functions = []
+        self.__count = 0
+
+    def __unique_name(self, prefix):
+        self.__count += 1
+        return '{}_{}'.format(prefix, self.__count)
+
+    def __add_global(self, prefix, source):
+        name = self.__unique_name(prefix)
+        self.__globals.append((name, source))
+        return name
+
+    # The same object for every evaluation, as a ValueExpression gives
+    def literal(self, value):
+        for name in _CONSTANT_NAMES:
+            if value is get_builtin(name):
+                return 'get_builtin({})'.format(repr(name))
+        if id(value) not in self.__literals:
+            source = _literal_source(value)
+            if source is None:
+                raise ValueError("Cannot compile the value {}".format(value.to_string()))
+            self.__literals[id(value)] = (value, self.__add_global('literal', source))
+        return self.__literals[id(value)][1]
+
+    def primitive_operation(self, expr):
+        args = map(repr, [expr.operand_type_name, expr.operation, expr.param_type_name])
+        return self.__add_global('operation', 'primitive_operation({})'.format(', '.join(args)))
+
+    def function(self, body, prefix, name=None):
+        name = name or self.__unique_name(prefix)
+        writer = _FunctionWriter(self)
+        writer.function(name, body)
+        self.__functions.append(writer.source)
+        return name
+
+    # The content of a callable with 'body', as _callable_content() makes it
+    def content(self, body, prefix):
+        name = self.function(body, prefix)
+        return 'CompiledGeneratorBody({})'.format(name) if body.has_yield else name
+
+    def class_declaration(self, expr):
+        parts = {'hooks': [], 'methods': [], 'properties': [], 'vals': [], 'vars': []}
+        prefix = 'class_' + expr.name
+        for p in expr.parts:
+            if isinstance(p, HookDefinitionDeclarationStatement):
+                parts['hooks'].append(self.__method_definition(p.name, p.block, p.params, prefix + '_hook'))
+            elif isinstance(p, MethodDefinitionDeclarationStatement):
+                parts['methods'].append(self.__method_definition(p.name, p.block, p.params, prefix + '_' + p.name))
+            elif isinstance(p, PropertyFieldDeclaration):
+                parts['properties'].append('property_field({}, {})'.format(repr(p.property_name), repr(p.field_name)))
+            elif isinstance(p, PropertyGetSetDeclaration):
+                parts['properties'].append(self.__property_definition(p, prefix + '_' + p.property_name))
+            elif isinstance(p, (ValDefinition, VarDefinition)):
+                init = self.function(p.init_expr, prefix + '_' + p.name)
+                parts['vals' if isinstance(p, ValDefinition) else 'vars'].append('{}({}, {})'.format(p.__class__.__name__, repr(p.name), init))
+        args = [repr(expr.name), repr(expr.superclass_name)]
+        args += ['{}=[{}]'.format(kind, ', '.join(defs)) for kind, defs in parts.items() if defs]
+        return 'declare_class({})'.format(', '.join(args))
+
+    def __method_definition(self, name, body, params, prefix):
+        args = [repr(name), self.content(body, prefix)] + list(map(repr, params))
+        return 'MethodDefinition({})'.format(', '.join(args))
+
+    def __property_definition(self, expr, prefix):
+        getter = 'MethodDefinition({}, {})'.format(repr('get'), self.function(expr.get_def.content, prefix + '_get'))
+        setter = 'None'
+        if expr.set_def:
+            setter_content = self.function(expr.set_def.content, prefix + '_set')
+            setter = 'MethodDefinition({}, {}, {})'.format(repr('set'), setter_content, repr(expr.set_def.param))
+        return 'PropertyDefinition({}, {}, {})'.format(repr(expr.property_name), getter, setter)
+
+    def source(self, file_name):
+        lines = ["# Written by 'cacti compile' from {}".format(file_name or 'a program'), 'from cacti.support import *', '']
+        lines.append('def load():')
+        if self.__globals:
+            lines.append('    global {}'.format(', '.join(name for name, _ in self.__globals)))
+        for name, source in self.__globals:
+            lines.append('    {} = {}'.format(name, source))
+        if not self.__globals:
+            lines.append('    pass')
+        lines.append('')
+        for function in self.__functions:
+            lines.append(function)
+        lines += ["if __name__ == '__main__':", '    run_module(load, main)', '']
+        return '\n'.join(lines)
+
+# The source of a Python module running 'program' when run as a script.
+# The literals of the program must belong to the current interpreter.
+def transpile(program, file_name=''):
+    writer = _ModuleWriter()
+    writer.function(program, 'main', name='main')
+    return writer.source(file_name)
+
+# Parses a program as parse_file() does, without making its callables
+# tiered, and writes it as a module to 'output_name', by default the name
+# of the program with a '.py' extension. The module is byte-compiled too.
+def compile_file(file_name, output_name=None):
+    from cacti.parse import parse_file
+    pass_manager = PassManager.default()
+    pass_manager.disable('tier_callables')
+    with Interpreter():
+        initialize_builtins()
+        program = parse_file(file_name, pass_manager)
+        source = transpile(program, file_name)
+    if output_name is None:
+        output_name = os.path.splitext(file_name)[0] + '.py'
+    with open(output_name, 'w', encoding='utf-8') as output:
+        output.write(source)
+    py_compile.compile(output_name, doraise=True)
+    return output_name
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='cacti compile', description='Compile a cacti program to a Python module')
+    parser.add_argument('file', help='program file')
+    parser.add_argument('-o', '--output', default=None, help="module file, by default the program file with a '.py' extension")
+    args = parser.parse_args(argv)
+    output_name = compile_file(args.file, args.output)
+    sys.stderr.write("{}: wrote {}\n".format(args.file, output_name))
+    return 0
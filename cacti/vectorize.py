@@ -0,0 +1,125 @@
+import collections
+from cacti.ast import Block, Evaluable, OperationExpression, ReferenceExpression, ReturnStatement, ValueExpression
+from cacti.lang import Closure, Function
+from cacti.builtin import get_builtin
+from cacti.tier import TieredBody
+
+__all__ = ['Kernel', 'compile_kernel']
+
+# A callback compiled to a Python function over unboxed primitives, and
+# the name of the builtin type of its result
+Kernel = collections.namedtuple('Kernel', ['function', 'type_name'])
+
+_KERNEL_OPERATORS = {
+        '*': '*',
+        '/': '//',
+        '+': '+',
+        '-': '-'
+    }
+
+_KERNEL_PRIMITIVE_TYPES = {
+        'Integer': int,
+        'Float': float
+    }
+
+# Comparisons yield a Boolean, which can only be the kernel's result
+_KERNEL_COMPARISONS = {
+        '==': '=='
+    }
+
+class _NotVectorizable(Exception): pass
+
+def _callback_expr(callback):
+    if type(callback) not in (Closure, Function):
+        return None
+    content = callback.content
+    if isinstance(content, TieredBody):
+        content = content.body
+    if isinstance(content, Block):
+        if len(content.exprs) != 1:
+            return None
+        expr = content.exprs[0]
+    elif isinstance(content, Evaluable):
+        # A body the optimizer reduced to its one statement
+        expr = content
+    else:
+        return None
+    if isinstance(expr, ReturnStatement):
+        expr = expr.value_expr
+    return expr
+
+class _KernelCompiler:
+    def __init__(self, param_types):
+        self.__param_types = param_types
+        self.__param_names = {name: 'a{}'.format(i) for i, name in enumerate(param_types)}
+        self.__constants = {}
+
+    @property
+    def constants(self):
+        return self.__constants
+
+    @property
+    def arguments(self):
+        return list(self.__param_names.values())
+
+    # Returns the Python source of the expression, the builtin type name of
+    # its value and the Python type of its primitive
+    def compile(self, expr):
+        if isinstance(expr, ReferenceExpression):
+            if expr.symbol not in self.__param_types:
+                raise _NotVectorizable()
+            type_name = self.__param_types[expr.symbol]
+            return self.__param_names[expr.symbol], type_name, _KERNEL_PRIMITIVE_TYPES[type_name]
+
+        if isinstance(expr, ValueExpression):
+            value = expr.value
+            type_name = getattr(value.typeobj, 'name', None)
+            if type_name not in _KERNEL_PRIMITIVE_TYPES or value.typeobj is not get_builtin(type_name):
+                raise _NotVectorizable()
+            name = 'c{}'.format(len(self.__constants))
+            self.__constants[name] = value.primitive
+            return name, type_name, type(value.primitive)
+
+        if isinstance(expr, OperationExpression) and expr.operation in _KERNEL_COMPARISONS:
+            if len(expr.operation_expr_params) != 1:
+                raise _NotVectorizable()
+            left, left_type, left_py_type = self.compile(expr.operand_expr)
+            right, right_type, right_py_type = self.compile(expr.operation_expr_params[0])
+            if 'Boolean' in (left_type, right_type):
+                raise _NotVectorizable()
+            return "({} {} {})".format(left, _KERNEL_COMPARISONS[expr.operation], right), 'Boolean', bool
+            
+        if isinstance(expr, OperationExpression):
+            operator = _KERNEL_OPERATORS.get(expr.operation)
+            if operator is None or len(expr.operation_expr_params) != 1:
+                raise _NotVectorizable()
+            left, left_type, left_py_type = self.compile(expr.operand_expr)
+            right, right_type, right_py_type = self.compile(expr.operation_expr_params[0])
+            if 'Boolean' in (left_type, right_type):
+                raise _NotVectorizable()
+            # The builtin hooks box the result in the type of the left operand
+            py_type = float if float in (left_py_type, right_py_type) else int
+            if _KERNEL_PRIMITIVE_TYPES[left_type] is not py_type:
+                raise _NotVectorizable()
+            return "({} {} {})".format(left, operator, right), left_type, py_type
+
+        raise _NotVectorizable()
+
+# Compiles a Closure or Function whose body is a single arithmetic expression,
+# or an '==' between two, over its parameters and Integer/Float literals. Returns None when the
+# callback must be called through the generic evaluator.
+def compile_kernel(callback, *param_type_names):
+    expr = _callback_expr(callback)
+    if expr is None or len(callback.param_names) != len(param_type_names):
+        return None
+    if any(t not in _KERNEL_PRIMITIVE_TYPES for t in param_type_names):
+        return None
+
+    compiler = _KernelCompiler(dict(zip(callback.param_names, param_type_names)))
+    try:
+        source, type_name, py_type = compiler.compile(expr)
+    except _NotVectorizable:
+        return None
+
+    function = eval("lambda {}: {}".format(', '.join(compiler.arguments), source), dict(compiler.constants))
+    return Kernel(function, type_name)
@@ -0,0 +1,5 @@
+from cacti.parse import block
+
+# The program parsed from 'source', before any optimization pass
+def parse_program(source):
+    return block.parseString(source, parseAll=True)[0]
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+
+from cacti.aio import *
+from cacti.ast import *
+from cacti.builtin import make_string
+
+class TestAsyncExecution:
+    def test_awaits_async_builtin(self, tmpdir, capsys):
+        async def shout(value):
+            await asyncio.sleep(0)
+            return value.primitive.upper()
+        
+        path = tmpdir.join('shout.cacti')
+        path.write('print(shout("hello"))\n')
+        asyncio.run(run_file(str(path), async_builtins={'shout': shout}))
+        out, err = capsys.readouterr()
+        assert "HELLO\n" == out
+        
+    def test_scripts_run_concurrently_on_one_loop(self, tmpdir):
+        async def main():
+            ready = asyncio.Event()
+            
+            async def wait_for_other():
+                await asyncio.wait_for(ready.wait(), 5)
+                return 1
+            
+            async def release_other():
+                ready.set()
+                return 2
+            
+            waiting = tmpdir.join('waiting.cacti')
+            waiting.write('wait_for_other()\n')
+            releasing = tmpdir.join('releasing.cacti')
+            releasing.write('release_other()\n')
+            
+            return await asyncio.gather(
+                run_file(str(waiting), async_builtins={'wait_for_other': wait_for_other}),
+                run_file(str(releasing), async_builtins={'release_other': release_other}))
+        
+        first, second = asyncio.run(main())
+        assert [1, 2] == [first.primitive, second.primitive]
+        
+    def test_programs_do_not_queue_for_threads(self, tmpdir):
+        count = 40
+        async def main():
+            started = []
+            all_started = asyncio.Event()
+            
+            async def wait_for_all():
+                started.append(1)
+                if count == len(started):
+                    all_started.set()
+                await asyncio.wait_for(all_started.wait(), 10)
+                return 1
+            
+            path = tmpdir.join('wait.cacti')
+            path.write('wait_for_all()\n')
+            return await asyncio.gather(*[
+                run_file(str(path), async_builtins={'wait_for_all': wait_for_all}) for i in range(count)])
+        
+        assert [1] * count == [result.primitive for result in asyncio.run(main())]
+        
+    def test_program_callable(self):
+        async def main():
+            return await run_program(lambda: OperationExpression(
+                ValueExpression(make_string('a')), '+', ValueExpression(make_string('b')))())
+        
+        assert 'ab' == asyncio.run(main()).primitive
+
+@pytest.mark.usefixtures('set_up_env')
+class TestAwaitHost:
+    def test_runs_outside_event_loop(self):
+        async def compute():
+            await asyncio.sleep(0)
+            return 42
+        
+        assert 42 == await_host(compute())
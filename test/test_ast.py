@@ -104,4 +104,8 @@ class TestBlock:
         assert len(exprs) == len(evals)
         
         
-                
\ No newline at end of file
+    def test_may_exit_only_with_return(self):
+        value_expr = ValueExpression(make_integer(1))
+        assert not Block(value_expr).may_exit
+        assert Block(value_expr, ReturnStatement(value_expr)).may_exit
+        assert Block(ForStatement('i', value_expr, Block(ReturnStatement(value_expr)))).may_exit
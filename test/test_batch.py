@@ -0,0 +1,37 @@
+import pytest
+
+from cacti.batch import *
+
+@pytest.fixture
+def scripts(tmpdir):
+    sources = [
+        ('a.cacti', 'print("first")\nprint(1 + 2)\n'),
+        ('b.cacti', 'print("second")\nundefined_symbol\n'),
+        ('c.cacti', 'var x = 5\nprint(x * 4)\n')
+    ]
+    file_names = []
+    for name, source in sources:
+        path = tmpdir.join(name)
+        path.write(source)
+        file_names += [str(path)]
+    return file_names
+
+class TestRunScript:
+    def test_captures_output(self, scripts):
+        result = run_script(scripts[0])
+        assert "first\n3\n" == result.output
+        assert result.error is None
+        
+    def test_reports_fatal_error_with_source(self, scripts):
+        result = run_script(scripts[1])
+        assert "second\n" == result.output
+        assert "Unknown symbol 'undefined_symbol'" in result.error
+        assert result.error.endswith('at: undefined_symbol')
+
+class TestRunMany:
+    def test_results_in_input_order(self, scripts):
+        results = run_many(reversed(scripts), workers=2)
+        assert ["20\n", "second\n", "first\n3\n"] == [r.output for r in results]
+        
+    def test_expands_globs(self, scripts, tmpdir):
+        assert scripts == expand_file_names([str(tmpdir.join('*.cacti'))])
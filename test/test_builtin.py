@@ -1,9 +1,14 @@
 import pytest
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from cacti.ast import *
 from cacti.builtin import *
 from cacti.lang import *
-from cacti.runtime import peek_stack_frame, ConstantValueHolder
+from cacti.runtime import get_interpreter, peek_stack_frame, ConstantValueHolder
 
 
 @pytest.mark.usefixtures('set_up_env')
@@ -87,6 +92,7 @@ class TestPrint:
     def test_sends_output_to_stdout(self, capsys):
         fn = OperationExpression(ReferenceExpression('print'), '()', ValueExpression(make_string("Hello World!")))
         fn()
+        get_interpreter().output.flush()
         out, err = capsys.readouterr()
         assert "Hello World!\n" == out
     
@@ -96,6 +102,7 @@ class TestPrint:
                 return "This is the custom string"
         fn = OperationExpression(ReferenceExpression('print'), '()', ValueExpression(CustomStringOperation(None)))
         fn()
+        get_interpreter().output.flush()
         out, err = capsys.readouterr()
         assert "This is the custom string\n" == out
 
@@ -110,4 +117,617 @@ class TestClass:
         class_type = get_type('Class').typeobj
         type_type = get_type('Type')
         assert id(class_type) == id(type_type)
-        
\ No newline at end of file
+        
+@pytest.mark.usefixtures('set_up_env')
+class TestList:
+    def test_integers_use_array_storage(self):
+        import array
+        l = make_list([make_integer(1), make_integer(2)])
+        assert isinstance(l.primitive, array.array)
+        assert 'q' == l.primitive.typecode
+        
+    def test_floats_use_array_storage(self):
+        l = make_list([make_float(1.5), make_float(2.5)])
+        assert 'd' == l.primitive.typecode
+        
+    def test_mixed_items_use_boxed_storage(self):
+        s = make_string('x')
+        l = make_list([make_integer(1), s])
+        assert isinstance(l.primitive, list)
+        assert 1 == l.primitive[0].primitive
+        assert s is l.primitive[1]
+        
+    def test_index(self):
+        l = make_list([make_integer(5), make_integer(6), make_integer(7)])
+        assert 6 == l.hook_table['[]'](make_integer(1)).primitive
+        assert 7 == l.hook_table['[]'](make_integer(-1)).primitive
+        
+    def test_index_out_of_range(self):
+        from cacti.exceptions import IndexOutOfRangeError
+        l = make_list([make_integer(5)])
+        with pytest.raises(IndexOutOfRangeError):
+            l.hook_table['[]'](make_integer(1))
+            
+    def test_index_must_be_integer(self):
+        from cacti.exceptions import InvalidTypeError
+        l = make_list([make_integer(5)])
+        with pytest.raises(InvalidTypeError):
+            l.hook_table['[]'](make_string('0'))
+            
+    def test_append_and_length(self):
+        l = make_list()
+        for i in range(3):
+            l['append'](make_integer(i))
+        assert 3 == l['length'].primitive
+        assert [0, 1, 2] == list(l.primitive)
+        
+    def test_append_other_type_converts_storage(self):
+        l = make_list([make_integer(1)])
+        l['append'](make_string('a'))
+        assert ['1', 'a'] == [item.to_string() for item in l.primitive]
+        
+    def test_set(self):
+        l = make_list([make_integer(1), make_integer(2)])
+        l['set'](make_integer(0), make_integer(9))
+        assert [9, 2] == list(l.primitive)
+        
+    def test_slice_keeps_compact_storage(self):
+        l = make_list([make_integer(i) for i in range(5)])
+        sliced = l['slice'](make_integer(1), make_integer(4))
+        assert 'q' == sliced.primitive.typecode
+        assert [1, 2, 3] == list(sliced.primitive)
+        
+    def test_to_string(self):
+        l = make_list([make_integer(1), make_string('a')])
+        assert '[1, a]' == l.to_string()
+
+@pytest.mark.skipif(numpy is None, reason='requires numpy')
+@pytest.mark.usefixtures('set_up_env')
+class TestNumericArray:
+    def make_ints(self, *values):
+        return get_builtin('numeric_array').call(make_list([make_integer(v) for v in values]))
+        
+    def test_from_list(self):
+        a = self.make_ints(1, 2, 3)
+        assert get_builtin('NumericArray') is a.typeobj
+        assert [1, 2, 3] == a.primitive.tolist()
+        
+    def test_from_list_copies(self):
+        l = make_list([make_integer(1)])
+        a = get_builtin('numeric_array').call(l)
+        a.primitive[0] = 5
+        assert 1 == l.primitive[0]
+        
+    def test_from_mixed_list(self):
+        from cacti.exceptions import InvalidTypeError
+        with pytest.raises(InvalidTypeError):
+            get_builtin('numeric_array').call(make_list([make_integer(1), make_string('x')]))
+        
+    def test_array_array_operations(self):
+        a = self.make_ints(6, 8)
+        b = self.make_ints(2, 3)
+        assert [12, 24] == a.hook_table['*'](b).primitive.tolist()
+        assert [3, 2] == a.hook_table['/'](b).primitive.tolist()
+        assert [8, 11] == a.hook_table['+'](b).primitive.tolist()
+        assert [4, 5] == a.hook_table['-'](b).primitive.tolist()
+        
+    def test_array_scalar_operations(self):
+        a = self.make_ints(1, 2)
+        assert [3, 4] == a.hook_table['+'](make_integer(2)).primitive.tolist()
+        assert [0.5, 1.0] == a.hook_table['*'](make_float(0.5)).primitive.tolist()
+        
+    def test_scalar_array_operations(self):
+        a = self.make_ints(1, 2)
+        result = make_integer(10).hook_table['-'](a)
+        assert get_builtin('NumericArray') is result.typeobj
+        assert [9, 8] == result.primitive.tolist()
+        
+    def test_length_mismatch(self):
+        from cacti.exceptions import ShapeMismatchError
+        with pytest.raises(ShapeMismatchError):
+            self.make_ints(1, 2).hook_table['+'](self.make_ints(1))
+            
+    def test_invalid_operand(self):
+        from cacti.exceptions import InvalidTypeError
+        with pytest.raises(InvalidTypeError):
+            self.make_ints(1).hook_table['+'](make_string('x'))
+        
+    def test_division_by_zero(self):
+        from cacti.exceptions import InvalidValueError
+        with pytest.raises(InvalidValueError):
+            self.make_ints(4, 6).hook_table['/'](make_integer(0))
+        with pytest.raises(InvalidValueError):
+            self.make_ints(4, 6).hook_table['/'](self.make_ints(2, 0))
+        with pytest.raises(InvalidValueError):
+            self.make_ints(4).hook_table['/'](make_float(0.0))
+        
+    def test_integer_overflow(self):
+        from cacti.exceptions import InvalidValueError
+        largest = 2 ** 63 - 1
+        with pytest.raises(InvalidValueError):
+            self.make_ints(largest).hook_table['+'](make_integer(1))
+        with pytest.raises(InvalidValueError):
+            self.make_ints(-largest - 1).hook_table['-'](make_integer(1))
+        with pytest.raises(InvalidValueError):
+            self.make_ints(1, 2 ** 62).hook_table['*'](make_integer(2))
+        with pytest.raises(InvalidValueError):
+            self.make_ints(-largest - 1).hook_table['/'](make_integer(-1))
+        with pytest.raises(InvalidValueError):
+            self.make_ints(1).hook_table['+'](make_integer(2 ** 64))
+        assert [largest] == self.make_ints(largest - 1).hook_table['+'](make_integer(1)).primitive.tolist()
+        assert [-15, -63] == self.make_ints(3, -7).hook_table['*'](self.make_ints(-5, 9)).primitive.tolist()
+        
+    def test_reductions(self):
+        a = self.make_ints(4, 1, 7)
+        assert 12 == a['sum']().primitive
+        assert 1 == a['min']().primitive
+        assert 7 == a['max']().primitive
+        assert 4.0 == a['mean']().primitive
+        assert get_builtin('Integer') is a['sum']().typeobj
+        assert get_builtin('Float') is a['mean']().typeobj
+        
+    def test_empty_reductions(self):
+        a = self.make_ints()
+        assert 0 == a['sum']().primitive
+        assert get_builtin('nothing') is a['max']()
+        
+    def test_slice_is_a_view(self):
+        a = self.make_ints(1, 2, 3, 4)
+        s = a['slice'](make_integer(1), make_integer(3))
+        assert [2, 3] == s.primitive.tolist()
+        assert numpy.shares_memory(a.primitive, s.primitive)
+        
+    def test_index(self):
+        a = self.make_ints(5, 6)
+        assert 6 == a.hook_table['[]'](make_integer(-1)).primitive
+        
+    def test_to_string(self):
+        assert '[1, 2]' == self.make_ints(1, 2).to_string()
+
+@pytest.mark.usefixtures('set_up_env')
+class TestEquals:
+    def test_object_identity(self):
+        o = make_object()
+        assert get_builtin('true') is o.hook_table['=='](o)
+        assert get_builtin('false') is o.hook_table['=='](make_object())
+        
+    def test_numbers_compare_by_value(self):
+        assert get_builtin('true') is make_integer(2).hook_table['=='](make_integer(2))
+        assert get_builtin('true') is make_integer(2).hook_table['=='](make_float(2.0))
+        assert get_builtin('false') is make_integer(2).hook_table['=='](make_string('2'))
+        
+    def test_strings_compare_by_value(self):
+        assert get_builtin('true') is make_string('a').hook_table['=='](make_string('a'))
+        
+    def test_hash_of_primitive(self):
+        assert hash('abc') == make_string('abc').hook_table['hash']().primitive
+
+@pytest.mark.usefixtures('set_up_env')
+class TestMap:
+    def make_map(self):
+        return get_builtin('Map').hook_table['()'].call()
+        
+    def test_put_get(self):
+        m = self.make_map()
+        v = make_string('one')
+        m['put'](make_integer(1), v)
+        assert v is m['get'](make_integer(1))
+        assert v is m.hook_table['[]'](make_integer(1))
+        
+    def test_get_missing(self):
+        m = self.make_map()
+        assert get_builtin('nothing') is m['get'](make_string('x'))
+        
+    def test_index_missing(self):
+        from cacti.exceptions import KeyNotFoundError
+        with pytest.raises(KeyNotFoundError):
+            self.make_map().hook_table['[]'](make_string('x'))
+            
+    def test_put_replaces(self):
+        m = self.make_map()
+        m['put'](make_string('k'), make_integer(1))
+        m['put'](make_string('k'), make_integer(2))
+        assert 1 == m['length'].primitive
+        assert 2 == m['get'](make_string('k')).primitive
+        
+    def test_delete(self):
+        m = self.make_map()
+        m['put'](make_string('k'), make_integer(1))
+        assert get_builtin('true') is m['delete'](make_string('k'))
+        assert get_builtin('false') is m['delete'](make_string('k'))
+        assert get_builtin('false') is m['contains'](make_string('k'))
+        assert 0 == m['length'].primitive
+        
+    def test_insertion_order(self):
+        m = self.make_map()
+        for key in ['c', 'a', 'b']:
+            m['put'](make_string(key), make_integer(0))
+        m['delete'](make_string('a'))
+        m['put'](make_string('a'), make_integer(0))
+        assert ['c', 'b', 'a'] == [key.primitive for key in m['keys']().primitive]
+        
+    def test_many_keys_with_deletes(self):
+        from cacti.builtin import _MapStorage
+        storage = _MapStorage()
+        keys = [make_integer(i) for i in range(200)]
+        for key in keys:
+            storage.put(key, key)
+        for key in keys[::2]:
+            assert storage.delete(key)
+        assert 100 == len(storage)
+        assert all(storage.get(make_integer(i)) is None for i in range(0, 200, 2))
+        assert all(storage.get(make_integer(i)) is keys[i] for i in range(1, 200, 2))
+        
+    def test_put_delete_cycles(self):
+        from cacti.builtin import _MapStorage
+        storage = _MapStorage()
+        key = make_integer(1)
+        for i in range(300):
+            storage.put(key, make_integer(i))
+            assert storage.delete(key)
+        storage.put(key, key)
+        assert 1 == len(storage)
+        assert key is storage.get(key)
+        
+    def test_object_keys_use_identity(self):
+        m = self.make_map()
+        o = make_object()
+        m['put'](o, make_integer(1))
+        assert 1 == m['get'](o).primitive
+        assert get_builtin('nothing') is m['get'](make_object())
+        
+    def test_to_string(self):
+        m = self.make_map()
+        m['put'](make_string('a'), make_integer(1))
+        assert '{a: 1}' == m.to_string()
+
+@pytest.mark.usefixtures('set_up_env')
+class TestIteration:
+    def test_range_is_lazy(self):
+        r = get_builtin('range').call(make_integer(0), make_integer(10 ** 15))
+        assert 10 ** 15 == r['length'].primitive
+        assert 5 == r.hook_table['[]'](make_integer(5)).primitive
+        import itertools
+        assert [0, 1, 2] == [item.primitive for item in itertools.islice(iterate(r), 3)]
+        
+    def test_range_bounds_must_be_integers(self):
+        from cacti.exceptions import InvalidTypeError
+        with pytest.raises(InvalidTypeError):
+            get_builtin('range').call(make_integer(0), make_string('x'))
+            
+    def test_iterate_list(self):
+        l = make_list([make_integer(1), make_string('a')])
+        assert [1, 'a'] == [item.primitive for item in iterate(l)]
+        
+    def test_iterator_is_iterable(self):
+        iterator = make_iterator([make_integer(1)])
+        assert iterator is iterator.hook_table['iter']()
+        assert 1 == iterator.hook_table['next']().primitive
+        assert get_builtin('done') is iterator.hook_table['next']()
+        
+    def test_next_hook_protocol(self):
+        items = [make_integer(1), make_integer(2)]
+        remaining = list(items)
+        classdef = make_class('Countdown')
+        classdef.add_hook_definition(MethodDefinition('iter', lambda: peek_stack_frame().symbol_stack['self']))
+        classdef.add_hook_definition(MethodDefinition('next', lambda: remaining.pop(0) if remaining else get_builtin('done')))
+        assert items == list(iterate(classdef.hook_table['()'].call()))
+        
+    def test_not_iterable(self):
+        from cacti.exceptions import OperationNotSupportedError
+        with pytest.raises(OperationNotSupportedError):
+            iterate(make_object())
+
+@pytest.mark.usefixtures('set_up_env')
+class TestString:
+    def test_concat_is_lazy(self):
+        s = make_string('ab').hook_table['+'](make_string('cd'))
+        assert not isinstance(s.rope, str)
+        assert 4 == s['length'].primitive
+        assert 'abcd' == s.primitive
+        
+    def test_concat_leaves_operands(self):
+        a = make_string('ab')
+        a.hook_table['+'](make_string('cd'))
+        assert 'ab' == a.primitive
+        
+    def test_concat_non_string(self):
+        with pytest.raises(TypeError):
+            make_string('a').hook_table['+'](make_integer(1))
+            
+    def test_equals_flattens(self):
+        s = make_string('a').hook_table['+'](make_string('b'))
+        assert get_builtin('true') is s.hook_table['=='](make_string('ab'))
+            
+    def test_slice_is_a_view(self):
+        s = make_string('hello world')
+        view = s['slice'](make_integer(6), make_integer(11))
+        assert s.primitive is view.text_bounds[0]
+        assert 5 == view['length'].primitive
+        assert 'world' == view.primitive
+        
+    def test_find_in_view(self):
+        view = make_string('abcabc')['slice'](make_integer(1), make_integer(6))
+        assert 1 == view['find'](make_string('ca')).primitive
+        assert -1 == view['find'](make_string('bcabc!')).primitive
+        
+    def test_startswith(self):
+        s = make_string('hello')
+        assert get_builtin('true') is s['startswith'](make_string('he'))
+        assert get_builtin('false') is s['slice'](make_integer(1), make_integer(5))['startswith'](make_string('he'))
+        
+    def test_split(self):
+        s = make_string('a,,b')
+        pieces = s['split'](make_string(','))
+        assert s.primitive is pieces.primitive[2].text_bounds[0]
+        assert ['a', '', 'b'] == [piece.primitive for piece in pieces.primitive]
+        
+    def test_split_empty_separator(self):
+        from cacti.exceptions import InvalidValueError
+        with pytest.raises(InvalidValueError):
+            make_string('a')['split'](make_string(''))
+            
+    def test_join(self):
+        items = make_list([make_string('a'), make_string('b')])
+        assert 'a-b' == make_string('-')['join'](items).primitive
+        
+    def test_join_requires_strings(self):
+        from cacti.exceptions import InvalidTypeError
+        with pytest.raises(InvalidTypeError):
+            make_string('-')['join'](make_list([make_integer(1)]))
+            
+    def test_replace_upper_lower(self):
+        s = make_string('aBa')
+        assert 'xBx' == s['replace'](make_string('a'), make_string('x')).primitive
+        assert 'ABA' == s['upper']().primitive
+        assert 'aba' == s['lower']().primitive
+        
+@pytest.mark.usefixtures('set_up_env')
+class TestBytes:
+    def test_shares_host_data(self):
+        data = bytearray(b'abc')
+        b = make_bytes(data)
+        data[0] = ord('x')
+        assert b'xbc' == b.primitive.tobytes()
+        
+    def test_index(self):
+        b = make_bytes(b'abc')
+        assert ord('c') == b.hook_table['[]'](make_integer(-1)).primitive
+        
+    def test_index_out_of_range(self):
+        from cacti.exceptions import IndexOutOfRangeError
+        with pytest.raises(IndexOutOfRangeError):
+            make_bytes(b'abc').hook_table['[]'](make_integer(3))
+            
+    def test_slice_is_a_view(self):
+        data = b'hello world'
+        view = make_bytes(data)['slice'](make_integer(6), make_integer(11))
+        assert data is view.primitive.obj
+        assert 5 == view['length'].primitive
+        
+    def test_concat(self):
+        b = make_bytes(b'ab').hook_table['+'](make_bytes(b'cd'))
+        assert b'abcd' == b.primitive.tobytes()
+        
+    def test_concat_is_a_map_key(self):
+        b = make_bytes(b'ab').hook_table['+'](make_bytes(b'c'))
+        assert hash(b'abc') == get_builtin('hash').call(b).primitive
+        m = get_builtin('Map').hook_table['()'].call()
+        m['put'](b, make_integer(1))
+        assert 1 == m['get'](make_bytes(b'abc')).primitive
+        
+    def test_mutable_host_data_is_a_map_key(self):
+        b = make_bytes(bytearray(b'ab'))
+        assert hash(b'ab') == b.hook_table['hash']().primitive
+        m = get_builtin('Map').hook_table['()'].call()
+        m['put'](b, make_integer(1))
+        assert 1 == m['get'](make_bytes(b'ab')).primitive
+        
+    def test_encode_decode(self):
+        b = make_string('hé')['encode'](make_string('utf-8'))
+        assert b'h\xc3\xa9' == b.primitive.tobytes()
+        assert 'hé' == b['decode'](make_string('utf-8')).primitive
+        
+    def test_invalid_encoding(self):
+        from cacti.exceptions import InvalidValueError
+        with pytest.raises(InvalidValueError):
+            make_bytes(b'\xff')['decode'](make_string('utf-8'))
+        with pytest.raises(InvalidValueError):
+            make_string('a')['encode'](make_string('no-such-encoding'))
+            
+    def test_equals_and_hash(self):
+        b = make_bytes(b'xab')['slice'](make_integer(1), make_integer(3))
+        assert get_builtin('true') is b.hook_table['=='](make_bytes(b'ab'))
+        assert hash(b'ab') == b.hook_table['hash']().primitive
+        
+    def test_buffer_append(self):
+        buf = get_builtin('Buffer').hook_table['()']()
+        buf['append'](make_bytes(b'ab'))
+        buf['append'](make_integer(ord('c')))
+        snapshot = buf['bytes']
+        buf['append'](make_bytes(b'd'))
+        assert b'abc' == snapshot.primitive.tobytes()
+        assert 4 == buf['length'].primitive
+        
+    def test_buffer_append_invalid_byte(self):
+        from cacti.exceptions import InvalidValueError
+        with pytest.raises(InvalidValueError):
+            get_builtin('Buffer').hook_table['()']()['append'](make_integer(256))
+        
+@pytest.mark.usefixtures('set_up_env')
+class TestFile:
+    def read_lines(self, source):
+        return [line.primitive for line in iterate(get_builtin('read_lines').call(source))]
+    
+    def test_read_lines_from_path(self, tmp_path):
+        path = tmp_path / 'f.txt'
+        path.write_bytes(b'a\r\nb\nc')
+        assert ['a', 'b', 'c'] == self.read_lines(make_string(str(path)))
+        
+    def test_read_lines_is_lazy(self, tmp_path):
+        path = tmp_path / 'f.txt'
+        path.write_text('a\nb\n')
+        lines = iterate(get_builtin('read_lines').call(make_string(str(path))))
+        assert 'a' == next(lines).primitive
+        
+    def test_binary_lines_are_bytes(self, tmp_path):
+        path = tmp_path / 'f.bin'
+        path.write_bytes(b'a\r\nb\n')
+        file = get_builtin('open').call(make_string(str(path)), make_string('rb'))
+        assert [b'a', b'b'] == [line.primitive.tobytes() for line in iterate(file)]
+        
+    def test_mapped_lines_are_views(self, tmp_path):
+        path = tmp_path / 'f.txt'
+        path.write_bytes(b'ab\r\ncd\n\nef')
+        mapped = get_builtin('map_file').call(make_string(str(path)))
+        lines = list(iterate(get_builtin('read_lines').call(mapped)))
+        assert [b'ab', b'cd', b'', b'ef'] == [line.primitive.tobytes() for line in lines]
+        assert mapped.primitive.obj is lines[1].primitive.obj
+        
+    def test_map_empty_file(self, tmp_path):
+        path = tmp_path / 'f.txt'
+        path.write_bytes(b'')
+        assert 0 == get_builtin('map_file').call(make_string(str(path)))['length'].primitive
+        
+    def test_write(self, tmp_path):
+        path = tmp_path / 'f.txt'
+        file = get_builtin('open').call(make_string(str(path)), make_string('w'))
+        get_builtin('write').call(file, make_string('hello\n'))
+        file['close']()
+        assert 'hello\n' == path.read_text()
+        
+    def test_write_bytes_to_text_file(self, tmp_path):
+        from cacti.exceptions import InvalidTypeError
+        file = get_builtin('open').call(make_string(str(tmp_path / 'f.txt')), make_string('w'))
+        with pytest.raises(InvalidTypeError):
+            get_builtin('write').call(file, make_bytes(b'a'))
+            
+    def test_closed_file(self, tmp_path):
+        from cacti.exceptions import InvalidValueError
+        path = tmp_path / 'f.txt'
+        path.write_text('a\n')
+        file = get_builtin('open').call(make_string(str(path)), make_string('r'))
+        file['close']()
+        with pytest.raises(InvalidValueError):
+            self.read_lines(file)
+            
+    def test_write_to_file_open_for_reading(self, tmp_path):
+        from cacti.exceptions import InvalidValueError
+        path = tmp_path / 'f.txt'
+        path.write_text('a\n')
+        file = get_builtin('open').call(make_string(str(path)), make_string('r'))
+        with pytest.raises(InvalidValueError):
+            get_builtin('write').call(file, make_string('z'))
+            
+    def test_read_lines_of_file_open_for_writing(self, tmp_path):
+        from cacti.exceptions import InvalidValueError
+        file = get_builtin('open').call(make_string(str(tmp_path / 'f.txt')), make_string('w'))
+        with pytest.raises(InvalidValueError):
+            self.read_lines(file)
+        with pytest.raises(InvalidValueError):
+            list(iterate(file))
+            
+    def test_closed_while_reading(self, tmp_path):
+        from cacti.exceptions import InvalidValueError
+        path = tmp_path / 'f.txt'
+        path.write_text('a\nb\n')
+        file = get_builtin('open').call(make_string(str(path)), make_string('r'))
+        lines = iterate(get_builtin('read_lines').call(file))
+        assert 'a' == next(lines).primitive
+        file['close']()
+        with pytest.raises(InvalidValueError):
+            next(lines)
+            
+    def test_missing_file(self, tmp_path):
+        from cacti.exceptions import FileAccessError
+        with pytest.raises(FileAccessError):
+            get_builtin('open').call(make_string(str(tmp_path / 'missing')), make_string('r'))
+            
+    def test_invalid_mode(self, tmp_path):
+        from cacti.exceptions import InvalidValueError
+        with pytest.raises(InvalidValueError):
+            get_builtin('open').call(make_string(str(tmp_path / 'f.txt')), make_string('x'))
+        
+@pytest.mark.usefixtures('set_up_env')
+class TestMemoize:
+    def memoize(self, content, capacity=10, *param_names):
+        return get_builtin('memoize').call(Function('f', content, *(param_names or ('x',))), make_integer(capacity))
+    
+    def counting(self):
+        calls = []
+        def content():
+            x = peek_stack_frame().symbol_stack['x']
+            calls.append(x)
+            return x
+        return calls, content
+    
+    def test_caches_by_primitive(self):
+        calls, content = self.counting()
+        f = self.memoize(content)
+        first = f(make_integer(2))
+        assert first is f(make_integer(2))
+        assert 1 == len(calls)
+        assert 1 == f['hits'].primitive
+        assert 1 == f['misses'].primitive
+        
+    def test_caches_by_mutable_bytes(self):
+        calls, content = self.counting()
+        f = self.memoize(content)
+        f(make_bytes(bytearray(b'ab')))
+        f(make_bytes(b'ab'))
+        assert 1 == len(calls)
+        
+    def test_integer_and_float_are_separate(self):
+        calls, content = self.counting()
+        f = self.memoize(content)
+        f(make_integer(1))
+        f(make_float(1.0))
+        assert 2 == len(calls)
+        
+    def test_strings_by_value(self):
+        calls, content = self.counting()
+        f = self.memoize(content)
+        f(make_string('ab'))
+        f(make_string('a').hook_table['+'](make_string('b')))
+        assert 1 == len(calls)
+        
+    def test_objects_by_identity(self):
+        calls, content = self.counting()
+        f = self.memoize(content)
+        obj = make_object()
+        f(obj)
+        f(obj)
+        f(make_object())
+        assert 2 == len(calls)
+        
+    def test_lru_eviction(self):
+        calls, content = self.counting()
+        f = self.memoize(content, 2)
+        f(make_integer(1))
+        f(make_integer(2))
+        f(make_integer(1))
+        f(make_integer(3))
+        f(make_integer(1))
+        assert [1, 2, 3] == [c.primitive for c in calls]
+        assert 1 == f['evictions'].primitive
+        assert 2 == f['size'].primitive
+        assert 2 == f['capacity'].primitive
+        
+    def test_recursive_calls_hit(self):
+        calls = []
+        def content():
+            n = peek_stack_frame().symbol_stack['n'].primitive
+            calls.append(n)
+            if n < 2:
+                return make_integer(n)
+            return make_integer(fib(make_integer(n - 1)).primitive + fib(make_integer(n - 2)).primitive)
+        fib = self.memoize(content, 100, 'n')
+        assert 55 == fib(make_integer(10)).primitive
+        assert list(range(10, -1, -1)) == calls
+        
+    def test_invalid_arguments(self):
+        from cacti.exceptions import InvalidTypeError, InvalidValueError
+        with pytest.raises(InvalidTypeError):
+            get_builtin('memoize').call(make_integer(1), make_integer(1))
+        with pytest.raises(InvalidValueError):
+            self.memoize(lambda: None, 0)
@@ -0,0 +1,107 @@
+import pytest
+
+from cacti.ast import *
+from cacti.builtin import *
+from cacti.infer import *
+from cacti.parse import parse_file, parse_string
+from test.helpers import parse_program
+
+def operations(node):
+    found = []
+    def walk(child):
+        if isinstance(child, OperationExpression):
+            found.append(child)
+        return child.transform_children(walk)
+    walk(node)
+    return found
+
+@pytest.mark.usefixtures('set_up_env')
+class TestInferTypes:
+    def test_literal_bindings(self):
+        types = infer_types(parse_program('val a = 1\nvar s = "x"\ns = s + "y"\nval b = 2 * a\nval c = a == b\n'))
+        assert {'a': 'Integer', 's': 'String', 'b': 'Integer', 'c': 'Boolean'} == types
+
+    def test_float_operands_box_as_left_operand(self):
+        program = Block(ValDeclarationStatement('f', ValueExpression(make_float(1.5))),
+                        ValDeclarationStatement('g', OperationExpression(ReferenceExpression('f'), '*', ValueExpression(make_integer(2)))),
+                        ValDeclarationStatement('h', OperationExpression(ValueExpression(make_integer(2)), '*', ReferenceExpression('f'))))
+        assert {'f': 'Float', 'g': 'Float', 'h': 'Integer'} == infer_types(program)
+
+    def test_mixed_bindings_are_unknown(self):
+        types = infer_types(parse_program('var a = 1\na = "x"\n'))
+        assert 'a' not in types
+
+    def test_range_loop_variable(self):
+        assert 'Integer' == infer_types(parse_program('for i in range(0, 3) { print(i) }\n'))['i']
+
+    def test_shadowed_range(self):
+        types = infer_types(parse_program('val range = closure(a, b) { [a, b] }\nfor i in range(0, 3) { print(i) }\n'))
+        assert 'i' not in types
+
+    def test_parameters_from_call_sites(self):
+        program = parse_program('function g(b) { return b * 2 }\nval f = closure(a) { return a + 1 }\nprint(f(3))\nprint(g(4))\n')
+        types = infer_types(program)
+        assert 'Integer' == types['a']
+        assert 'Integer' == types['b']
+
+    def test_recursive_calls(self):
+        types = infer_types(parse_program('function f(n) { return f(n - 1) }\nf(10)\n'))
+        assert 'Integer' == types['n']
+
+    def test_immediately_invoked_closure(self):
+        assert 'String' == infer_types(parse_string('closure(s) { s + "!" }("hi")')[0])['s']
+
+    def test_escaping_callable_parameters_are_unknown(self):
+        types = infer_types(parse_program('val f = closure(a) { return a + 1 }\nf(1)\nprint(map(f, [1, 2]))\n'))
+        assert 'a' not in types
+
+    def test_arity_mismatch_is_unknown(self):
+        assert 'a' not in infer_types(parse_program('function f(a) { a }\nf(1, 2)\n'))
+
+    def test_method_parameters_are_unknown(self):
+        types = infer_types(parse_program('class Foo {\n    method m(x) { x + 1 }\n}\nval x = 1\n'))
+        assert 'x' not in types
+
+@pytest.mark.usefixtures('set_up_env')
+class TestSpecializeOperations:
+    def test_specializes_typed_operations(self):
+        node, specialized = specialize_operations(parse_program('val a = 1\nval b = a * 2 + a\nprint(b == 3)\n'))
+        assert 3 == specialized
+        assert all(isinstance(o, PrimitiveOperationExpression) for o in operations(node) if o.operation != '()')
+
+    def test_leaves_unknown_operands(self):
+        expr = parse_string('closure(x) { x * 2 }')[0]
+        node, specialized = specialize_operations(expr)
+        assert 0 == specialized
+        assert expr is node
+
+    def test_leaves_string_and_number(self):
+        assert 0 == specialize_operations(parse_program('val a = "x"\nprint(a + 1)\n'))[1]
+
+    @pytest.mark.parametrize('source', ['closure(a) { a * 3 - 1 }(7)', 'closure(a) { a / 2 }(7)', 'closure(s) { s + "b" + s }("a")', 'closure(a) { a == 2 }(2)'])
+    def test_matches_evaluation(self, source):
+        expected = parse_string(source)[0]()
+        node, specialized = specialize_operations(parse_string(source)[0])
+        assert specialized
+        value = node()
+        assert expected.typeobj is value.typeobj
+        assert expected.to_string() == value.to_string()
+
+    def test_keeps_source(self):
+        expr = parse_string('closure(a) { a * 2 }(1)')[0]
+        operation = expr.operand_expr.block.exprs[0]
+        operation.source = 'a * 2'
+        node = specialize_operations(expr)[0]
+        assert 'a * 2' == node.operand_expr.block.exprs[0].source
+
+    def test_guard_calls_user_hook(self):
+        meters_class = parse_string('class Meters {\n    operation +(b) { return "meters" }\n}')[0]()
+        meters = meters_class.hook_table['()'].call()
+        expr = PrimitiveOperationExpression(ValueExpression(meters), '+', ValueExpression(make_integer(2)), 'Integer', 'Integer')
+        assert 'meters' == expr().primitive
+
+    def test_parse_file_specializes(self, tmp_path):
+        path = tmp_path / 'f.cacti'
+        path.write_text('for i in range(0, 3) {\n    print(i * i)\n}\n')
+        program = parse_file(str(path))
+        assert any(isinstance(o, PrimitiveOperationExpression) for o in operations(program))
@@ -77,6 +77,13 @@ class TestClosure:
     def test_type_type(self):
         c = Closure(peek_stack_frame(), 'test', self.dmy)
         assert get_type('Type') is c.typeobj.typeobj
+        
+    def test_call_binds_params(self):
+        from cacti.builtin import make_integer
+        content = lambda: peek_stack_frame().symbol_stack['x']
+        c = Closure(peek_stack_frame(), content, 'x')
+        i = make_integer(3)
+        assert i is c.call(i)
 
 @pytest.mark.usefixtures('set_up_env')
 class TestFunction:
@@ -119,4 +126,69 @@ class TestMethod:
     def test_eq(self, owner1, owner2, name1, name2, content1, content2, param_names1, param_names2):
         data1 = [owner1, name1, content1, param_names1]
         data2 = [owner2, name2, content2, param_names2]
-        assert (Method(owner1, name1, content1, *param_names1) == Method(owner2, name2, content2, *param_names2)) == (data1 == data2)
\ No newline at end of file
+        assert (Method(owner1, name1, content1, *param_names1) == Method(owner2, name2, content2, *param_names2)) == (data1 == data2)
+
+class TestRope:
+    def test_concat(self):
+        rope = rope_concat(rope_concat('ab', 'c'), 'de')
+        assert 5 == rope_length(rope)
+        
+    def test_concat_empty(self):
+        assert 'ab' == rope_concat('ab', '')
+        assert 'ab' == rope_concat('', 'ab')
+
+@pytest.mark.usefixtures('set_up_env')
+class TestPrimitiveObjectDefinition:
+    def test_has_fixed_layout(self):
+        for obj in [make_object(), make_integer(1), make_string('a'), get_type('Type'), make_integer(1).hook_table['()']]:
+            assert not hasattr(obj, '__dict__')
+        with pytest.raises(AttributeError):
+            make_integer(1).extra = 1
+        
+    def test_primitive_unset_until_made(self):
+        obj = PrimitiveObjectDefinition(None)
+        assert not hasattr(obj, 'primitive')
+        obj.primitive = 5
+        assert 5 == obj.primitive
+        
+    def test_string_function(self):
+        obj = PrimitiveObjectDefinition(None)
+        obj.primitive = 5
+        assert obj.to_string().startswith('<UNKNOWN>')
+        obj.set_string_function(lambda o: 'five {}'.format(o.primitive))
+        assert 'five 5' == obj.to_string()
+        
+    def test_native_repr(self):
+        assert 'make_integer(5)' == repr(make_integer(5))
+        assert "make_string('a')" == repr(make_string('a'))
+
+@pytest.mark.usefixtures('set_up_env')
+class TestStringObjectDefinition:
+    def test_flattens_on_read(self):
+        s = make_string('a')
+        s.set_rope(rope_concat(s.rope, 'b'))
+        assert not isinstance(s.rope, str)
+        assert 'ab' == s.primitive
+        assert isinstance(s.rope, str)
+        
+    def test_deep_rope(self):
+        s = make_string()
+        rope = ''
+        for i in range(100000):
+            rope = rope_concat(rope, 'x')
+        s.set_rope(rope)
+        assert 100000 == len(s.primitive)
+        
+    def test_slice(self):
+        view = rope_slice('hello', 1, 4)
+        assert 3 == rope_length(view)
+        assert 'll' == _flatten(rope_slice(view, 1, 10))
+        
+    def test_slice_whole_and_empty(self):
+        assert 'hello' == rope_slice('hello', 0, 100)
+        assert '' == rope_slice('hello', 3, 1)
+        
+def _flatten(rope):
+    s = make_string()
+    s.set_rope(rope)
+    return s.primitive
@@ -0,0 +1,175 @@
+import pytest
+
+from cacti.ast import *
+from cacti.builtin import *
+from cacti.optimize import *
+from cacti.parse import parse_file, parse_string
+from test.helpers import parse_program
+
+def fold(source):
+    return fold_constants(parse_string(source)[0])
+
+@pytest.mark.usefixtures('set_up_env')
+class TestFoldConstants:
+    def test_folds_nested_operations(self):
+        result = fold('60 * 60 * 24')
+        assert isinstance(result.node, ValueExpression)
+        assert 86400 == result.node.value.primitive
+        assert 2 == result.folded
+        
+    @pytest.mark.parametrize('source', ['7 / 2', '2 - 5 * 3', '(1 + 2) * 3', '"a" + "b" + "c"', '1 + 1 == 2', '"a" == 1'])
+    def test_matches_evaluation(self, source):
+        expected = parse_string(source)[0]()
+        value = fold(source).node.value
+        assert expected.typeobj is value.typeobj
+        assert getattr(expected, 'primitive', None) == getattr(value, 'primitive', None)
+        
+    def test_mixed_types_box_as_left_operand(self):
+        expr = OperationExpression(ValueExpression(make_integer(1)), '+', ValueExpression(make_float(0.5)))
+        value = fold_constants(expr).node.value
+        assert get_builtin('Integer') is value.typeobj
+        assert 1.5 == value.primitive
+        
+    def test_leaves_division_by_zero(self):
+        result = fold('1 / 0')
+        assert isinstance(result.node, OperationExpression)
+        assert 0 == result.folded
+        
+    def test_leaves_references(self):
+        result = fold('closure(x) { x * 2 }')
+        assert 0 == result.folded
+        
+    def test_folds_inside_closures(self):
+        result = fold('closure(x) { x * (2 + 3) }')
+        assert 1 == result.folded
+        assert 10 == result.node()(make_integer(2)).primitive
+        
+    def test_leaves_string_and_number(self):
+        assert 0 == fold('"a" + 1').folded
+        
+    def test_interns_equal_literals(self):
+        result = fold('[5, 5, 2 + 3, "a", "a"]')
+        items = result.node.item_exprs
+        assert items[0].value is items[1].value
+        assert items[0].value is items[2].value
+        assert items[3].value is items[4].value
+        assert 3 == result.interned
+        
+    def test_keeps_integer_and_float_apart(self):
+        block = Block(ValueExpression(make_integer(1)), ValueExpression(make_float(1.0)))
+        result = fold_constants(block)
+        assert 0 == result.interned
+        
+    def test_keeps_source(self):
+        expr = parse_string('2 * 3')[0]
+        expr.source = 'val x = 2 * 3'
+        assert 'val x = 2 * 3' == fold_constants(expr).node.source
+        
+    def test_unchanged_tree_is_kept(self):
+        expr = parse_string('closure(x) { x }')[0]
+        assert expr is fold_constants(expr).node
+        
+    def test_parse_file_folds(self, tmp_path):
+        path = tmp_path / 'f.cacti'
+        path.write_text('val day = 60 * 60 * 24\nprint(day)\n')
+        program = parse_file(str(path))
+        assert isinstance(program.exprs[0].init_expr, ValueExpression)
+        
+    def test_folds_class_members(self, tmp_path):
+        path = tmp_path / 'f.cacti'
+        path.write_text('class Foo {\n    val x = 2 * 3\n    method m() { 4 * 5 }\n}\nFoo().m()\n')
+        from cacti.parse import block
+        program = block.parseFile(str(path), parseAll=True)[0]
+        result = fold_constants(program)
+        assert 2 == result.folded
+        assert 20 == result.node().primitive
+
+@pytest.mark.usefixtures('set_up_env')
+class TestEliminateDeadCode:
+    def test_drops_statements_after_return(self):
+        node, removed = eliminate_dead_code(parse_string('closure() { return 1; print(2); print(3) }')[0])
+        assert 2 == removed
+        assert 1 == len(node.block.exprs)
+        
+    def test_keeps_statements_without_return(self):
+        expr = parse_string('closure() { print(2); 3 }')[0]
+        node, removed = eliminate_dead_code(expr)
+        assert 0 == removed
+        assert expr is node
+
+@pytest.mark.usefixtures('set_up_env')
+class TestFlattenBlocks:
+    def test_unwraps_single_statement_body(self):
+        node, flattened = flatten_blocks(parse_string('closure(x) { return x * 2 }')[0])
+        assert 1 == flattened
+        assert isinstance(node.block, OperationExpression)
+        assert 6 == node()(make_integer(3)).primitive
+        
+    def test_keeps_generator_body(self):
+        expr = parse_string('closure() { yield 1 }')[0]
+        assert expr is flatten_blocks(expr)[0]
+        
+    def test_keeps_loop_body(self):
+        expr = parse_string('closure() { for i in range(0, 2) { i } }')[0]
+        node, flattened = flatten_blocks(expr)
+        assert isinstance(node.block.body, Block)
+        
+    def test_splices_nested_blocks(self):
+        node, flattened = flatten_blocks(Block(Block(ValueExpression(make_integer(1))), ValueExpression(make_integer(2))))
+        assert 1 == flattened
+        assert 2 == len(node.exprs)
+
+@pytest.mark.usefixtures('set_up_env')
+class TestRemoveUnusedVals:
+    def test_removes_unused_val(self):
+        node, removed = remove_unused_vals(parse_program('val a = 1\nval b = 2\nprint(b)\n'))
+        assert 1 == removed
+        assert 2 == len(node.exprs)
+        
+    def test_keeps_initializer_with_effects(self):
+        node, removed = remove_unused_vals(parse_program('val a = print(1)\nprint(2)\n'))
+        assert 1 == removed
+        assert isinstance(node.exprs[0], OperationExpression)
+        
+    def test_keeps_value_of_last_statement(self):
+        node, removed = remove_unused_vals(parse_string('closure() { val a = 1 }')[0])
+        assert 1 == removed
+        assert 1 == node()().primitive
+        
+    def test_keeps_val_used_in_closure(self):
+        expr = parse_program('val a = 1\nval f = closure() { a }\nf()\n')
+        assert 0 == remove_unused_vals(expr)[1]
+
+@pytest.mark.usefixtures('set_up_env')
+class TestPassManager:
+    def test_runs_enabled_passes(self):
+        manager = PassManager.default()
+        manager.disable('fold_constants')
+        node = manager.run(parse_program('val a = 1 + 2\nprint(a)\n'))
+        assert isinstance(node.exprs[0].init_expr, OperationExpression)
+        assert 'fold_constants' not in [t.name for t in manager.timings]
+        assert all(t.seconds >= 0 for t in manager.timings)
+        
+    def test_reports_changes(self):
+        manager = PassManager.default()
+        manager.run(parse_program('val a = 1 + 2\n'))
+        changes = {t.name: t.changes for t in manager.timings}
+        assert 1 == changes['fold_constants']
+        assert 1 == changes['remove_unused_vals']
+        
+    def test_disabled_by_environment(self, monkeypatch):
+        monkeypatch.setenv('CACTI_DISABLE_PASSES', 'flatten_blocks, remove_unused_vals')
+        manager = PassManager.default()
+        assert not manager.is_enabled('flatten_blocks')
+        assert not manager.is_enabled('remove_unused_vals')
+        assert manager.is_enabled('fold_constants')
+        
+    def test_unknown_pass(self):
+        with pytest.raises(ValueError):
+            PassManager.default().disable('no_such_pass')
+            
+    def test_add_pass(self):
+        manager = PassManager()
+        manager.add_pass('count', lambda node: (node, 7))
+        manager.run(Block())
+        assert [('count', 7)] == [(t.name, t.changes) for t in manager.timings]
@@ -0,0 +1,264 @@
+import pytest
+
+from cacti.builtin import *
+from cacti.parse import parse_string
+
+def evaluate(source):
+    return parse_string(source)[0]()
+
+@pytest.mark.usefixtures('set_up_env')
+class TestList:
+    def test_literal(self):
+        assert [1, 2, 3] == list(evaluate('[1, 2, 3]').primitive)
+        
+    def test_empty_literal(self):
+        assert 0 == len(evaluate('[]').primitive)
+        
+    def test_index(self):
+        assert 'b' == evaluate('["a", "b"][1]').primitive
+        
+    def test_nested_index(self):
+        assert 4 == evaluate('[[1, 2], [3, 4]][1][1]').primitive
+        
+    def test_index_expression(self):
+        assert 30 == evaluate('[10, 20, 30][1 + 1]').primitive
+        
+    def test_map(self):
+        assert [11, 21, 31] == list(evaluate('[1, 2, 3] <<- closure(x) { x * 10 + 1 }').primitive)
+        
+    def test_map_generic_callback(self):
+        result = evaluate('["a", "b"] <<- closure(s) { s + "!" }')
+        assert ['a!', 'b!'] == [item.primitive for item in result.primitive]
+        
+    def test_map_closure_with_return(self):
+        assert [2, 4] == list(evaluate('[1, 2] <<- closure(x) { return x + x }').primitive)
+        
+    def test_filter(self):
+        assert [1, 2] == list(evaluate('[1, 2] <<= closure(x) { true }').primitive)
+        assert 0 == len(evaluate('[1, 2] <<= closure(x) { false }').primitive)
+        
+    def test_reduce(self):
+        assert 10 == evaluate('[1, 2, 3, 4] <-- closure(a, b) { a + b }').primitive
+        
+    def test_reduce_empty_list(self):
+        assert 'nothing' == evaluate('[] <-- closure(a, b) { a }').name
+        
+    def test_chained_operators(self):
+        assert 384 == evaluate('[1, 2, 3, 4] <<- closure(x) { x * 2 } <-- closure(a, b) { a * b }').primitive
+
+@pytest.mark.usefixtures('set_up_env')
+class TestEquals:
+    def test_equals(self):
+        assert 'true' == evaluate('1 + 1 == 2').name
+        assert 'false' == evaluate('"a" == "b"').name
+        
+    def test_filter_with_equals(self):
+        assert [2, 2] == list(evaluate('[1, 2, 3, 2] <<= closure(v) { v == 2 }').primitive)
+        
+    def test_class_hooks(self):
+        source = """class Key {
+            operation ==(other) { return true }
+            operation hash() { return 1 }
+        }"""
+        key_class = evaluate(source)
+        m = get_builtin('Map').hook_table['()'].call()
+        m['put'](key_class.hook_table['()'].call(), make_integer(5))
+        assert 5 == m['get'](key_class.hook_table['()'].call()).primitive
+        
+    def test_memoize_uses_class_hooks(self):
+        source = """class Key {
+            operation ==(other) { return true }
+            operation hash() { return 1 }
+        }"""
+        key_class = evaluate(source)
+        f = get_builtin('memoize').call(evaluate('closure(k) { k }'), make_integer(4))
+        first = f(key_class.hook_table['()'].call())
+        assert first is f(key_class.hook_table['()'].call())
+        assert 1 == f['hits'].primitive
+
+@pytest.mark.usefixtures('set_up_env')
+class TestFor:
+    def test_sum_range(self):
+        source = """function f() {
+            var total = 0
+            for i in range(1, 5) { total = total + i }
+            return total
+        }"""
+        assert 10 == evaluate(source).call().primitive
+        
+    def test_list_items(self):
+        source = """function f() {
+            var total = 0
+            for x in [10, 20, 30] { total = total + x }
+            return total
+        }"""
+        assert 60 == evaluate(source).call().primitive
+        
+    def test_return_from_loop(self):
+        source = """function f() {
+            for x in range(7, 1000000000) { return x }
+            return 0
+        }"""
+        assert 7 == evaluate(source).call().primitive
+        
+    def test_body_declarations_are_scoped_to_loop(self):
+        source = """function f() {
+            for x in [1, 2] { val y = x }
+            return y
+        }"""
+        from cacti.exceptions import FatalError
+        with pytest.raises(FatalError):
+            evaluate(source).call()
+            
+    def test_done_is_reserved(self):
+        with pytest.raises(Exception):
+            parse_string('val done = 1')
+
+@pytest.mark.usefixtures('set_up_env')
+class TestGenerator:
+    def items(self, iterable):
+        return [item.primitive for item in iterate(iterable)]
+        
+    def test_yield(self):
+        generator = evaluate('function() { yield 1; yield "a" }').call()
+        assert [1, 'a'] == self.items(generator)
+        
+    def test_yield_in_loop(self):
+        function = evaluate('function(n) { for i in range(0, n) { yield i * i } }')
+        assert [0, 1, 4] == self.items(function.call(make_integer(3)))
+        
+    def test_each_call_has_its_own_frame(self):
+        function = evaluate('function(n) { yield n; yield n + 1 }')
+        first = iterate(function.call(make_integer(1)))
+        second = iterate(function.call(make_integer(10)))
+        assert [1, 10, 2, 11] == [next(first).primitive, next(second).primitive,
+                                  next(first).primitive, next(second).primitive]
+        
+    def test_return_ends_generator(self):
+        assert [1] == self.items(evaluate('closure() { yield 1; return 0; yield 2 }').call())
+        
+    def test_is_lazy(self):
+        source = """closure() {
+            for i in range(0, 1000000000) { yield i }
+        }() <<- closure(x) { x * 2 } <<= closure(x) { x == 6 }"""
+        assert 6 == next(iterate(evaluate(source))).primitive
+        
+    def test_reduce(self):
+        assert 6 == evaluate('range(1, 4) <-- closure(a, b) { a * b }').primitive
+        
+    def test_iter_hook_generator(self):
+        klass = evaluate('class Pair { operation iter() { yield 1; yield 2 } }')
+        assert [1, 2] == self.items(klass.hook_table['()'].call())
+        
+    def test_yield_outside_generator(self):
+        from cacti.exceptions import FatalError, YieldOutsideGeneratorError
+        with pytest.raises(FatalError) as info:
+            import cacti.parse
+            cacti.parse.block.parseString('for x in [1] { yield x }', parseAll=True)[0]()
+        assert isinstance(info.value.cause, YieldOutsideGeneratorError)
+
+@pytest.mark.usefixtures('set_up_env')
+class TestFormatString:
+    def test_interpolation(self):
+        assert 'a 3 [1, 2] b' == evaluate('f"a {1 + 2} {[1, 2]} b"').primitive
+        
+    def test_single_node(self):
+        import cacti.ast
+        expr = parse_string('f"x{1}y{2}"')[0]
+        assert isinstance(expr, cacti.ast.FormatExpression)
+        assert 4 == len(expr.parts)
+        
+    def test_literal_braces(self):
+        assert '{x}' == evaluate('f"{{x}}"').primitive
+        
+    def test_nested_braces(self):
+        assert '6' == evaluate('f"{[1, 2, 3] <-- closure(a, b) { a + b }}"').primitive
+        
+    def test_escaped_quotes(self):
+        assert 'ab' == evaluate('f"{\\"a\\" + \\"b\\"}"').primitive
+        
+    def test_escaped_quotes_outside_format_string(self):
+        from pyparsing import ParseException
+        with pytest.raises(ParseException):
+            parse_string('val s = \\"hi\\"\n')
+        
+    def test_empty(self):
+        assert '' == evaluate('f""').primitive
+        
+    def test_unclosed_brace(self):
+        with pytest.raises(SyntaxError):
+            parse_string('f"{1"')
+            
+    def test_single_closing_brace_in_block(self):
+        import cacti.parse
+        with pytest.raises(SyntaxError):
+            cacti.parse.block.parseString('print(f"{1}}")\n', parseAll=True)
+            
+    def test_escapes(self):
+        assert '"q" {}\t|' == evaluate('f"\\"q\\" {{}}\\t|"').primitive
+        
+    def test_keeps_packrat_cache(self, monkeypatch):
+        from pyparsing import ParserElement
+        resets = []
+        reset_cache = ParserElement.reset_cache
+        monkeypatch.setattr(ParserElement, 'reset_cache', staticmethod(lambda: resets.append(reset_cache())))
+        parse_string('f"{1} {2} {3}"')
+        assert 1 == len(resets)
+            
+    def test_identifier_starting_with_f(self):
+        assert 2 == evaluate('closure(foo) { foo }(2)').primitive
+
+@pytest.mark.usefixtures('set_up_env')
+class TestNesting:
+    def test_nested_calls(self):
+        expr = 's.length'
+        for i in range(8):
+            expr = 's.slice(0, {}).length'.format(expr)
+        assert 3 == evaluate('closure(s) { ' + expr + ' }').call(make_string('abc')).primitive
+
+@pytest.mark.usefixtures('set_up_env')
+class TestSourceLocation:
+    def nodes(self, node):
+        found = []
+        def walk(child):
+            found.append(child)
+            return child.transform_children(walk)
+        walk(node)
+        return found
+        
+    def test_nodes_share_buffer(self):
+        from cacti.parse import parse_file
+        from cacti.optimize import PassManager
+        import tempfile, os
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'p.cacti')
+            with open(path, 'w') as f:
+                f.write('val a = 1\nprint(a + 2)\n')
+            program = parse_file(path, PassManager())
+        located = [n for n in self.nodes(program) if n.source_location]
+        assert len({id(n.source_location.buffer) for n in located}) == 1
+        assert 'print(a + 2)' == program.exprs[1].source
+        assert not any(hasattr(n, '__dict__') for n in self.nodes(program))
+        
+    def test_error_location(self):
+        from cacti.exceptions import FatalError
+        import cacti.parse
+        program = cacti.parse.block.parseString('val a = 1\n  print(a.length)\n', parseAll=True)[0]
+        with pytest.raises(FatalError) as info:
+            program()
+        assert 'print(a.length)' == info.value.source
+        assert (2, 9) == (info.value.lineno, info.value.column)
+        
+    def test_format_string_error_location(self):
+        from cacti.exceptions import FatalError
+        import cacti.parse
+        program = cacti.parse.block.parseString('val a = 1\nprint(a)\nprint(f"x {nope + 1}")\n', parseAll=True)[0]
+        with pytest.raises(FatalError) as info:
+            program()
+        assert 'print(f"x {nope + 1}")' == info.value.source
+        assert (3, 12) == (info.value.lineno, info.value.column)
+        
+    def test_rebuilt_node_keeps_location(self):
+        expr = parse_string('1 + 2')[0]
+        rebuilt = expr.rebuild(expr.operand_expr, '-', *expr.operation_expr_params)
+        assert expr.source_location.offset == rebuilt.source_location.offset
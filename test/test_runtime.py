@@ -1,3 +1,5 @@
+import copy
+import sys
 import pytest
 from cacti.exceptions import *
 from cacti.runtime import *
@@ -309,4 +311,209 @@ class TestSymbolTableStack:
         stack.push(t1)
         stack.push(t2)
         stack.push(t3)
-        assert False == ('c' in stack)
\ No newline at end of file
+        assert False == ('c' in stack)
+        
+    def test_peek_and_pop_from_top(self):
+        t1 = SymbolTable()
+        t2 = SymbolTable()
+        stack = SymbolTableStack(t1)
+        stack.push(t2)
+        assert t2 is stack.peek()
+        assert t2 is stack.pop()
+        assert t1 is stack.peek()
+        
+    def test_copy_keeps_order(self):
+        stack = SymbolTableStack(SymbolTable({'x': ValueHolder(4)}), SymbolTable({'x': ValueHolder(2)}))
+        stack_copy = copy.copy(stack)
+        stack_copy['x'] = 3
+        assert [2, 3] == [stack['x'], stack_copy['x']]
+        stack_copy.pop()
+        assert 4 == stack_copy['x']
+
+class TestFixedLayout:
+    def test_runtime_objects_have_no_dict(self):
+        table = SymbolTable()
+        objects = [
+                ValueHolder(1), ConstantValueHolder(1), PropertyGetValueHolder(lambda: 1),
+                PropertyGetSetValueHolder(lambda: 1, lambda value: None), Callable(lambda: None),
+                table, SymbolTableChain(table), SymbolTableStack(table)
+            ]
+        for obj in objects:
+            assert not hasattr(obj, '__dict__')
+            
+    @pytest.mark.usefixtures('set_up_env')
+    def test_stack_frame_has_no_dict(self):
+        assert not hasattr(StackFrame(make_object(), 'f'), '__dict__')
+
+class TestInterpreter:
+    def test_separate_stacks(self):
+        first = Interpreter()
+        second = Interpreter()
+        with first:
+            initialize_builtins()
+            push_stack_frame(StackFrame(make_object(), 'first'))
+            with second:
+                initialize_builtins()
+                assert peek_stack_frame() is None
+            assert 'first' == peek_stack_frame().name
+        
+    def test_separate_builtins(self):
+        with Interpreter():
+            initialize_builtins()
+            integer_class = get_builtin('Integer')
+        assert integer_class is not get_builtin('Integer')
+        
+    def test_restores_previous_interpreter(self):
+        outer = get_interpreter()
+        with Interpreter() as inner:
+            assert inner is get_interpreter()
+        assert outer is get_interpreter()
+        
+    def test_threads_run_independent_programs(self):
+        from concurrent.futures import ThreadPoolExecutor
+        
+        def run(n):
+            with Interpreter():
+                initialize_builtins()
+                push_stack_frame(StackFrame(make_object(), 'thread'))
+                def content():
+                    x = peek_stack_frame().symbol_stack['x']
+                    return x.hook_table['*'](x)
+                square = Function('square', content, 'x')
+                total = make_integer(0)
+                for i in range(10):
+                    total = total.hook_table['+'](square(make_integer(n)))
+                depth = len(get_interpreter().stack)
+                return total.primitive, depth
+        
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(run, range(8)))
+        
+        assert [(10 * n * n, 1) for n in range(8)] == results
+
+class TestExecutionLimits:
+    def run_limited(self, limits):
+        from cacti.ast import Block, ReferenceExpression, OperationExpression, ValueExpression, AssignmentStatement
+        with Interpreter() as interpreter:
+            initialize_builtins()
+            push_stack_frame(StackFrame(make_object(), 'limited'))
+            table = peek_stack_frame().symbol_stack.peek()
+            table.add_symbol('x', ValueHolder(make_integer(0)))
+            statement = AssignmentStatement('x', OperationExpression(ReferenceExpression('x'), '+', ValueExpression(make_integer(1))))
+            statement.source = 'x = x + 1\n'
+            block = Block(*([statement] * 100))
+            limits.attach(interpreter)
+            try:
+                block()
+            finally:
+                limits.detach()
+            return peek_stack_frame().symbol_stack['x'].primitive
+    
+    def test_unlimited(self):
+        assert 100 == self.run_limited(ExecutionLimits())
+        
+    def test_step_limit(self):
+        with pytest.raises(FatalError) as info:
+            self.run_limited(ExecutionLimits(max_steps=50))
+        assert isinstance(info.value.cause, LimitExceededError)
+        assert 'Step' == info.value.cause.limit
+        assert 'x = x + 1' == info.value.cause.source
+        assert 'x = x + 1' == info.value.source
+        
+    def test_depth_limit(self):
+        with pytest.raises(FatalError) as info:
+            self.run_limited(ExecutionLimits(max_depth=2))
+        assert 'Stack depth' == info.value.cause.limit
+        
+    def test_object_limit(self):
+        with pytest.raises(FatalError) as info:
+            self.run_limited(ExecutionLimits(max_objects=10))
+        assert 'Object' == info.value.cause.limit
+        
+    def test_byte_limit(self):
+        with pytest.raises(FatalError) as info:
+            self.run_limited(ExecutionLimits(max_bytes=100))
+        assert 'Memory' == info.value.cause.limit
+        
+    def test_timeout(self):
+        with pytest.raises(FatalError) as info:
+            self.run_limited(ExecutionLimits(timeout=0))
+        assert 'Time' == info.value.cause.limit
+        
+class TestOutputSink:
+    def test_buffers_until_full(self):
+        import io
+        stream = io.StringIO()
+        sink = OutputSink(stream, buffer_size=4)
+        sink.write('ab')
+        assert '' == stream.getvalue()
+        sink.write('cd')
+        assert 'abcd' == stream.getvalue()
+        
+    def test_flush(self):
+        import io
+        stream = io.StringIO()
+        sink = OutputSink(stream)
+        sink.write('ab')
+        sink.flush()
+        assert 'ab' == stream.getvalue()
+        
+    def test_defaults_to_stdout(self, capsys):
+        sink = OutputSink()
+        sink.write('ab')
+        sink.flush()
+        assert 'ab' == capsys.readouterr().out
+        
+    def test_to_file(self, tmp_path):
+        path = tmp_path / 'out.txt'
+        sink = OutputSink.to_file(str(path))
+        sink.write('ab')
+        sink.close()
+        assert 'ab' == path.read_text()
+        
+    def test_to_socket(self):
+        import socket
+        left, right = socket.socketpair()
+        with left, right:
+            sink = OutputSink.to_socket(left)
+            sink.write('ab')
+            sink.flush()
+            assert b'ab' == right.recv(2)
+            
+    def test_interpreter_flushes_on_exit(self):
+        import io
+        stream = io.StringIO()
+        interpreter = Interpreter()
+        interpreter.set_output(OutputSink(stream))
+        with interpreter:
+            get_interpreter().output.write('ab')
+        assert 'ab' == stream.getvalue()
+        
+    def test_getvalue_requires_memory(self, tmp_path):
+        sink = OutputSink.to_file(str(tmp_path / 'out.txt'))
+        with pytest.raises(TypeError):
+            sink.getvalue()
+        sink.close()
+        
+    def test_main_flushes_before_error(self, tmp_path, monkeypatch, capsys):
+        from cacti.exceptions import FatalError
+        from cacti.main import main
+        program = tmp_path / 'program.cacti'
+        program.write_text('print("before")\nprint(nope)\n')
+        monkeypatch.setattr(sys, 'argv', ['cacti', str(program)])
+        with Interpreter():
+            with pytest.raises(FatalError):
+                main()
+            assert 'before\n' == capsys.readouterr().out
+        
+    def test_print_writes_primitives(self):
+        sink = OutputSink.to_memory()
+        with Interpreter() as interpreter:
+            initialize_builtins()
+            interpreter.set_output(sink)
+            push_stack_frame(StackFrame(make_object(), 'test'))
+            s = make_string('a').hook_table['+'](make_string('b'))
+            for value in [make_integer(1), make_float(2.5), s]:
+                get_builtin('print')(value)
+        assert '1\n2.5\nab\n' == sink.getvalue()
+        assert not isinstance(s.rope, str)
@@ -0,0 +1,103 @@
+import itertools
+import threading
+import pytest
+
+from cacti.exceptions import TaskCancelledError
+from cacti.runtime import get_interpreter
+from cacti.scheduler import *
+
+def make_program(name, log, steps):
+    def program():
+        for i in range(steps):
+            get_interpreter().step()
+            log.append(name)
+    return program
+
+class TestScheduler:
+    def test_round_robins_tasks(self):
+        log = []
+        scheduler = Scheduler(quantum=2)
+        scheduler.spawn(make_program('a', log, 6), 'a')
+        scheduler.spawn(make_program('b', log, 6), 'b')
+        scheduler.run()
+        runs = [len(list(g)) for k, g in itertools.groupby(log)]
+        assert 6 == log.count('a') == log.count('b')
+        assert len(runs) > 2
+        assert max(runs) <= 2
+        
+    def test_long_task_does_not_starve_short_task(self):
+        log = []
+        scheduler = Scheduler(quantum=10)
+        long_task = scheduler.spawn(make_program('long', log, 1000))
+        short_task = scheduler.spawn(make_program('short', log, 5))
+        scheduler.run()
+        assert log.index('short') < 20
+        assert long_task.slices > short_task.slices
+        assert all(t.done for t in scheduler.tasks)
+        
+    def test_records_error(self):
+        def program():
+            raise ValueError('broken')
+        scheduler = Scheduler()
+        task = scheduler.spawn(program)
+        scheduler.run()
+        assert isinstance(task.error, ValueError)
+        
+    def test_runs_files(self, tmpdir, capsys):
+        path = tmpdir.join('count.cacti')
+        path.write('var x = 1\nx = x + 1\nprint(x)\n')
+        scheduler = Scheduler(quantum=5)
+        tasks = [scheduler.spawn_file(str(path)) for i in range(3)]
+        scheduler.run()
+        out, err = capsys.readouterr()
+        assert "2\n2\n2\n" == out
+        assert all(t.slices > 1 for t in tasks)
+        
+    def test_latency_percentiles(self):
+        scheduler = Scheduler(quantum=3)
+        scheduler.spawn(make_program('a', [], 30), 'a')
+        scheduler.run()
+        percentiles = scheduler.latency_percentiles((50, 99))
+        assert [50, 99] == sorted(percentiles['a'])
+        assert percentiles['a'][50] <= percentiles['a'][99]
+
+    def test_close_cancels_parked_task(self):
+        log = []
+        scheduler = Scheduler(quantum=2)
+        task = scheduler.spawn(make_program('a', log, 100), 'parked')
+        task._run_slice(threading.Semaphore(0))
+        assert not task.done
+        scheduler.close()
+        assert task.done
+        assert isinstance(task.error, TaskCancelledError)
+        assert len(log) < 100
+        assert not any(t.name == 'cacti-task-parked' for t in threading.enumerate())
+        
+    def test_context_manager_cancels_unstarted_tasks(self):
+        with Scheduler() as scheduler:
+            task = scheduler.spawn(make_program('a', [], 10))
+        assert task.done
+        assert isinstance(task.error, TaskCancelledError)
+        assert 0 == task.slices
+        
+    def test_run_cancels_tasks_when_interrupted(self, monkeypatch):
+        scheduler = Scheduler(quantum=2)
+        task = scheduler.spawn(make_program('a', [], 100), 'interrupted')
+        def interrupt(self):
+            raise KeyboardInterrupt()
+        monkeypatch.setattr(Task, '_mark_ready', interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            scheduler.run()
+        assert task.done
+        assert isinstance(task.error, TaskCancelledError)
+        assert not any(t.name == 'cacti-task-interrupted' for t in threading.enumerate())
+
+class TestPercentile:
+    def test_nearest_rank(self):
+        values = [5, 1, 4, 2, 3]
+        assert 3 == percentile(values, 50)
+        assert 5 == percentile(values, 99)
+        assert 1 == percentile(values, 0)
+        
+    def test_empty(self):
+        assert percentile([], 50) is None
@@ -0,0 +1,17 @@
+import pytest
+
+from cacti.source import *
+
+class TestSourceBuffer:
+    def test_line(self):
+        buffer = SourceBuffer('a\n  bc\nd')
+        assert ['a', '  bc', '  bc', 'd'] == [buffer.line(o) for o in (0, 2, 4, 7)]
+        
+    def test_line_and_column(self):
+        buffer = SourceBuffer('a\n  bc\nd')
+        assert [(1, 1), (2, 3), (3, 1)] == [(buffer.lineno(o), buffer.column(o)) for o in (0, 4, 7)]
+        
+    def test_location(self):
+        location = SourceLocation(SourceBuffer('x\ny = 1', 'f.cacti'), 2)
+        assert 'y = 1' == location.line
+        assert 'f.cacti:2:1' == str(location)
@@ -0,0 +1,104 @@
+import pytest
+
+from cacti.ast import *
+from cacti.builtin import *
+from cacti.exceptions import FatalError
+from cacti.runtime import OutputSink, get_interpreter
+from cacti.tier import *
+from cacti.vectorize import compile_kernel
+from test.helpers import parse_program
+
+def tiered(source):
+    return tier_callables(parse_program(source))[0]
+
+def output(program):
+    sink = OutputSink.to_memory()
+    get_interpreter().set_output(sink)
+    value = program()
+    sink.flush()
+    return value, sink.getvalue()
+
+@pytest.fixture
+def threshold(monkeypatch):
+    monkeypatch.setattr(TieredBody, 'threshold', 2)
+
+@pytest.mark.usefixtures('set_up_env', 'threshold')
+class TestTierCallables:
+    def test_wraps_callable_bodies(self):
+        program, count = tier_callables(parse_program('function f(a) { a }\nval g = closure(b) { b }\n'))
+        assert 2 == count
+        assert isinstance(program.exprs[0].block, TieredBody)
+        assert 'f(a)' == program.exprs[0].block.name
+
+    def test_leaves_generator_bodies(self):
+        program, count = tier_callables(parse_program('function f() { yield 1 }\n'))
+        assert 0 == count
+
+    def test_promotes_hot_function(self):
+        program = tiered('function f(a) { return a * 2 }\nf(1)\nf(2)\nf(3)\n')
+        assert 6 == program().primitive
+        stats = program.exprs[0].block.stats
+        assert 3 == stats.calls
+        assert 1 == stats.promotions
+        assert stats.compiled
+
+    def test_loop_iterations_make_function_hot(self):
+        program = tiered('function f(n) {\n    for i in range(0, n) { i }\n}\nf(5)\n')
+        program()
+        stats = program.exprs[0].block.stats
+        assert 5 == stats.iterations
+        assert not stats.compiled
+        program.exprs[1]()
+        assert program.exprs[0].block.stats.compiled
+
+    @pytest.mark.parametrize('source', [
+        'function f(n) {\n    var t = 0\n    for i in range(0, n) {\n        for j in range(0, 3) {\n            t = t + i * j\n        }\n    }\n    return t\n}\n',
+        'function f(n) {\n    for i in range(0, n) {\n        val x = i * 2\n        return x + 1\n    }\n    return 0\n}\n',
+        'function f(n) {\n    val s = "a"\n    s.length + n\n}\n',
+        'function f(n) {\n    for i in range(0, n) { }\n}\n'])
+    def test_compiled_matches_generic(self, source):
+        generic = parse_program(source + 'print(f(0))\nprint(f(3))\nprint(f(4))\nprint(f(2))\n')
+        assert output(generic)[1] == output(tier_callables(generic)[0])[1]
+
+    def test_guard_failure_deoptimizes(self):
+        program = tiered('function k(a, b) { return a + b }\nk(1, 2)\nk(1, 2)\nk("x", "y")\n')
+        assert 'xy' == program().primitive
+        stats = program.exprs[0].block.stats
+        assert 1 == stats.deopts
+        assert not stats.compiled
+
+    def test_deoptimized_operation_stays_generic(self):
+        program = tiered('function k(a, b) { return a + b }\nk(1, 2)\nk(1, 2)\nk("x", "y")\nk(1, 2)\nk("x", "y")\nk(1, 2)\n')
+        assert 3 == program().primitive
+        stats = program.exprs[0].block.stats
+        assert 1 == stats.deopts
+        assert 2 == stats.promotions
+
+    def test_stops_promoting_after_max_deopts(self, monkeypatch):
+        monkeypatch.setattr(TieredBody, 'max_deopts', 1)
+        program = tiered('function k(a, b) { return a + b }\nk(1, 2)\nk(1, 2)\nk("x", "y")\nk(1, 2)\nk(1, 2)\n')
+        program()
+        stats = program.exprs[0].block.stats
+        assert 1 == stats.promotions
+        assert not stats.compiled
+
+    def test_compiled_error_keeps_source(self):
+        program = tiered('function f(a) {\n    val x = a.length\n    x\n}\nf("ab")\nf(1)\n')
+        program.exprs[0].block.body.exprs[0].source = 'val x = a.length'
+        program.exprs[0]()
+        program.exprs[1]()
+        with pytest.raises(FatalError) as err:
+            program.exprs[2]()
+        assert 'val x = a.length' == err.value.source
+        assert program.exprs[0].block.stats.compiled
+
+    def test_stats_list_called_bodies(self):
+        program = tiered('function hot_function(a) { a }\nhot_function(1)\nhot_function(2)\n')
+        program()
+        stats = [s for s in tier_stats() if s.name == 'hot_function(a)']
+        assert [(2, 1, 0)] == [(s.calls, s.promotions, s.deopts) for s in stats]
+
+    def test_tiered_callback_vectorizes(self):
+        closure = tiered('closure(x) { x * 2 }')()
+        kernel = compile_kernel(closure, 'Integer')
+        assert 6 == kernel.function(3)
@@ -0,0 +1,59 @@
+import glob
+import os
+import re
+import runpy
+import pytest
+
+from cacti.exceptions import FatalError
+from cacti.main import run_file
+from cacti.runtime import ExecutionLimits
+from cacti.support import run_module
+from cacti.transpile import *
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'examples', '*.cacti')))
+
+def compiled(source, tmp_path):
+    program = tmp_path / 'program.cacti'
+    program.write_text(source)
+    return runpy.run_path(compile_file(str(program)))
+
+def run_compiled(file_name, tmp_path, limits=None):
+    module = runpy.run_path(compile_file(file_name, str(tmp_path / 'program.py')))
+    run_module(module['load'], module['main'], limits)
+
+# The output, with object ids masked, and the error of running 'function'
+def outcome(capsys, function, *args):
+    error = None
+    try:
+        function(*args)
+    except Exception as err:
+        error = "{}: {}".format(err.__class__.__name__, str(err))
+    return re.sub(r'[0-9]{8,}', 'ID', capsys.readouterr().out), error
+
+class TestCompileFile:
+    @pytest.mark.parametrize('file_name', EXAMPLES, ids=os.path.basename)
+    def test_example_matches_interpreter(self, file_name, tmp_path, capsys):
+        assert outcome(capsys, run_file, file_name) == outcome(capsys, run_compiled, file_name, tmp_path)
+
+    def test_writes_module_next_to_program(self, tmp_path):
+        program = tmp_path / 'hello.cacti'
+        program.write_text('print("hello")\n')
+        assert str(tmp_path / 'hello.py') == compile_file(str(program))
+        assert (tmp_path / '__pycache__').is_dir()
+
+    def test_generator_body(self, tmp_path, capsys):
+        module = compiled('function g(n) {\n    for i in range(0, n) {\n        yield i * 2\n    }\n}\nfor x in g(3) { print(x) }\n', tmp_path)
+        run_module(module['load'], module['main'])
+        assert '0\n2\n4\n' == capsys.readouterr().out
+
+    def test_error_keeps_source(self, tmp_path):
+        module = compiled('val a = 1\nprint(a.length)\n', tmp_path)
+        with pytest.raises(FatalError) as err:
+            run_module(module['load'], module['main'])
+        assert 'print(a.length)' == err.value.source
+
+    def test_limits_count_steps(self, tmp_path, capsys):
+        module = compiled('for i in range(0, 100) {\n    print(i)\n}\n', tmp_path)
+        with pytest.raises(FatalError) as err:
+            run_module(module['load'], module['main'], ExecutionLimits(max_steps=20))
+        assert 'Step' in str(err.value)
@@ -0,0 +1,47 @@
+import pytest
+
+from cacti.parse import parse_string
+from cacti.vectorize import *
+
+def closure(source):
+    return parse_string(source)[0]()
+
+@pytest.mark.usefixtures('set_up_env')
+class TestCompileKernel:
+    def test_arithmetic_closure(self):
+        kernel = compile_kernel(closure('closure(x) { x * 10 + 1 }'), 'Integer')
+        assert 'Integer' == kernel.type_name
+        assert 21 == kernel.function(2)
+        
+    def test_return_statement(self):
+        kernel = compile_kernel(closure('closure(a, b) { return a - b }'), 'Integer', 'Integer')
+        assert 3 == kernel.function(5, 2)
+        
+    def test_integer_division_truncates(self):
+        kernel = compile_kernel(closure('closure(x) { x / 2 }'), 'Integer')
+        assert 3 == kernel.function(7)
+        
+    def test_float_parameter(self):
+        kernel = compile_kernel(closure('closure(x) { x * 2 }'), 'Float')
+        assert 'Float' == kernel.type_name
+        assert 3.0 == kernel.function(1.5)
+        
+    def test_captured_symbol_is_not_vectorized(self):
+        assert compile_kernel(closure('closure(x) { x * y }'), 'Integer') is None
+        
+    def test_multiple_statements_are_not_vectorized(self):
+        assert compile_kernel(closure('closure(x) { print(x); x }'), 'Integer') is None
+        
+    def test_parameter_count_mismatch(self):
+        assert compile_kernel(closure('closure(x) { x }'), 'Integer', 'Integer') is None
+        
+    def test_non_numeric_type(self):
+        assert compile_kernel(closure('closure(x) { x }'), 'String') is None
+        
+    def test_equals(self):
+        kernel = compile_kernel(closure('closure(x) { x * 2 == 4 }'), 'Integer')
+        assert 'Boolean' == kernel.type_name
+        assert kernel.function(2) and not kernel.function(3)
+        
+    def test_arithmetic_on_comparison_is_not_vectorized(self):
+        assert compile_kernel(closure('closure(x) { (x == 1) + 1 }'), 'Integer') is None